@@ -0,0 +1,194 @@
+import base64
+import binascii
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from resample import CANONICAL_SAMPLE_RATE
+
+# Audio arrives as little-endian 16-bit PCM, at this rate unless the client says otherwise,
+# and is resampled to mono CANONICAL_SAMPLE_RATE before any analysis
+DEFAULT_SAMPLE_RATE = 16000
+FRAME_LENGTH = 256  # 32 ms at 8 kHz
+HOP_LENGTH = 128
+
+# Base64 is decoded in slices of this many characters (must be a multiple of 4)
+DECODE_CHUNK_CHARS = 64 * 1024
+
+# Frames per vectorized block; bounds feature-extraction temporaries to a few MB
+FEATURE_BLOCK_FRAMES = 1024
+
+# Screams and shouts concentrate energy in this band relative to the whole spectrum
+SCREAM_BAND_HZ = (1000.0, 4000.0)
+# Floor on band power before its log in the flatness measure, so empty bins stay finite
+FLATNESS_POWER_FLOOR = 1e-20
+
+# Loudness is mapped from dBFS onto 0..1 so it can stand in for the client volume_level
+LOUDNESS_FLOOR_DB = -60.0
+LOUDNESS_PERCENTILE = 95
+
+
+class AudioPayloadTooLarge(ValueError):
+    """Raised when the decoded audio would exceed the configured payload limit."""
+
+
+def decoded_base64_length(audio_data_base64):
+    """Exact decoded size of a padded base64 string, computed without decoding it."""
+    length = len(audio_data_base64)
+    if length % 4:
+        raise binascii.Error('Incorrect base64 padding')
+    padding = 0
+    if length:
+        padding = 2 if audio_data_base64.endswith('==') else 1 if audio_data_base64.endswith('=') else 0
+    return length // 4 * 3 - padding
+
+
+def decode_pcm16(audio_data_base64, max_bytes=None):
+    """
+    Decodes base64 PCM into an int16 array backed by a single preallocated buffer.
+    The string is decoded slice by slice straight into that buffer, so the only
+    temporaries are DECODE_CHUNK_CHARS-sized and the returned array is a zero-copy view.
+    """
+    decoded_length = decoded_base64_length(audio_data_base64)
+    if max_bytes is not None and decoded_length > max_bytes:
+        raise AudioPayloadTooLarge(f'Decoded audio is {decoded_length} bytes, limit is {max_bytes}')
+    if decoded_length % 2:
+        # Not whole 16-bit samples; truncating would silently drop the last byte
+        raise ValueError(f'Decoded audio is {decoded_length} bytes, not a whole number of 16-bit samples')
+
+    buffer = bytearray(decoded_length)
+    view = memoryview(buffer)
+    offset = 0
+    for start in range(0, len(audio_data_base64), DECODE_CHUNK_CHARS):
+        chunk = base64.b64decode(audio_data_base64[start:start + DECODE_CHUNK_CHARS], validate=True)
+        view[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    if offset != decoded_length:
+        raise binascii.Error('Unexpected padding inside base64 payload')
+
+    return np.frombuffer(buffer, dtype='<i2', count=decoded_length // 2)
+
+
+def frame_signal(samples, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Returns a (n_frames, frame_length) strided view over the samples.
+    Clips shorter than one frame are zero-padded to a single frame.
+    """
+    if len(samples) < frame_length:
+        samples = np.pad(samples, (0, frame_length - len(samples)))
+    return sliding_window_view(samples, frame_length)[::hop_length]
+
+
+@lru_cache(maxsize=8)
+def get_window(frame_length):
+    window = np.hanning(frame_length).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+@lru_cache(maxsize=8)
+def get_fft_frequencies(frame_length, sample_rate):
+    freqs = np.fft.rfftfreq(frame_length, d=1.0 / sample_rate).astype(np.float32)
+    freqs.setflags(write=False)
+    return freqs
+
+
+@lru_cache(maxsize=8)
+def get_band_mask(frame_length, sample_rate, low_hz=SCREAM_BAND_HZ[0], high_hz=SCREAM_BAND_HZ[1]):
+    freqs = get_fft_frequencies(frame_length, sample_rate)
+    mask = (freqs >= low_hz) & (freqs <= high_hz)
+    mask.setflags(write=False)
+    return mask
+
+
+def compute_frame_features(samples, sample_rate=CANONICAL_SAMPLE_RATE, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Computes per-frame RMS, peak, zero-crossing rate, spectral centroid, the fraction of
+    spectral energy in SCREAM_BAND_HZ and the spectral flatness within that band (geometric
+    over arithmetic mean power: near 0 for the harmonics of a voice, about 0.56 for white
+    noise), from one windowed rfft per frame.
+    Frames are processed FEATURE_BLOCK_FRAMES at a time so the float and spectrum
+    temporaries stay bounded regardless of clip length; returns a dict of 1-D arrays.
+    """
+    frames = frame_signal(samples, frame_length, hop_length)
+    n_frames = len(frames)
+    window = get_window(frame_length)
+    freqs = get_fft_frequencies(frame_length, sample_rate)
+    band_mask = get_band_mask(frame_length, sample_rate)
+
+    rms = np.empty(n_frames, dtype=np.float32)
+    peak = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32)
+    centroid = np.zeros(n_frames, dtype=np.float32)
+    scream_ratio = np.zeros(n_frames, dtype=np.float32)
+    # Frames without power in the band count as flat, i.e. not tonal
+    scream_flatness = np.ones(n_frames, dtype=np.float32)
+
+    for start in range(0, n_frames, FEATURE_BLOCK_FRAMES):
+        block_slice = slice(start, start + FEATURE_BLOCK_FRAMES)
+        block = frames[block_slice].astype(np.float32) / 32768.0
+
+        rms[block_slice] = np.sqrt(np.einsum('ij,ij->i', block, block) / frame_length)
+        peak[block_slice] = np.abs(block).max(axis=1)
+        signs = np.signbit(block)
+        zcr[block_slice] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+
+        block *= window
+        magnitude = np.abs(np.fft.rfft(block, axis=1))
+        magnitude_sum = magnitude.sum(axis=1)
+        np.divide(magnitude @ freqs, magnitude_sum, out=centroid[block_slice], where=magnitude_sum > 0)
+
+        power = np.square(magnitude, out=magnitude)
+        power_sum = power.sum(axis=1)
+        band_power = power[:, band_mask]
+        band_sum = band_power.sum(axis=1)
+        np.divide(band_sum, power_sum, out=scream_ratio[block_slice], where=power_sum > 0)
+        geometric_mean = np.exp(np.log(np.maximum(band_power, FLATNESS_POWER_FLOOR)).mean(axis=1))
+        np.divide(geometric_mean * band_power.shape[1], band_sum, out=scream_flatness[block_slice], where=band_sum > 0)
+
+    return {
+        'rms': rms,
+        'peak': peak,
+        'zcr': zcr,
+        'spectral_centroid': centroid,
+        'scream_ratio': scream_ratio,
+        'scream_flatness': scream_flatness
+    }
+
+
+def loudness_from_rms(rms):
+    """Maps RMS (0..1 full scale) to a 0..1 loudness value via dBFS."""
+    db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    return np.clip((db - LOUDNESS_FLOOR_DB) / -LOUDNESS_FLOOR_DB, 0.0, 1.0)
+
+
+def summarize_frame_features(frame_features):
+    """Reduces per-frame features to the clip-level values used for scoring and storage."""
+    rms = frame_features['rms']
+    loudness = loudness_from_rms(rms)
+    return {
+        'volume_level': float(np.percentile(loudness, LOUDNESS_PERCENTILE)),
+        'rms_mean': float(rms.mean()),
+        'rms_max': float(rms.max()),
+        'peak': float(frame_features['peak'].max()),
+        'zcr_mean': float(frame_features['zcr'].mean()),
+        'spectral_centroid_mean': float(frame_features['spectral_centroid'].mean()),
+        'scream_ratio_mean': float(frame_features['scream_ratio'].mean()),
+        'frame_loudness': loudness,
+        'frame_zcr': frame_features['zcr'],
+        'frame_centroid': frame_features['spectral_centroid'],
+        'frame_scream_ratio': frame_features['scream_ratio'],
+        'frame_scream_flatness': frame_features['scream_flatness'],
+        'frame_count': int(len(rms))
+    }
+
+
+def extract_audio_features(samples, sample_rate=CANONICAL_SAMPLE_RATE):
+    """Full feature pipeline for one decoded clip."""
+    return summarize_frame_features(compute_frame_features(samples, sample_rate))
+
+
+# Build the default window and band mask at import so the first request does not pay for them
+get_window(FRAME_LENGTH)
+get_band_mask(FRAME_LENGTH, CANONICAL_SAMPLE_RATE)
@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+import numpy as np
+
+from audio_features import FRAME_LENGTH, HOP_LENGTH, compute_frame_features, loudness_from_rms
+from keyword_spotting import TEMPLATE_FRAMES
+
+# Recent frame features kept per session: 512 frames of 16 ms hop is ~8 s of context
+SESSION_RING_FRAMES = 512
+# Columns of the ring buffer, stored as float16
+RING_COLUMNS = ('loudness', 'zcr', 'centroid', 'rms', 'scream_ratio', 'scream_flatness')
+
+# Running sums carried across chunks; everything else is derived from these
+RUNNING_STAT_KEYS = ('frame_count', 'rms_sq_sum', 'centroid_sum', 'centroid_sq_sum', 'peak_max')
+
+# Active samples carried into the next chunk's keyword spotting, one sample short of a
+# full template window: a word straddling two chunks is matched, one already inside the
+# previous chunk is not matched again
+KEYWORD_CONTEXT_SAMPLES = (TEMPLATE_FRAMES - 1) * HOP_LENGTH + FRAME_LENGTH - 1
+
+
+def new_session_state(sample_rate):
+    return {
+        'sample_rate': sample_rate,
+        'last_sequence': -1,
+        'frame_count': 0,
+        'rms_sq_sum': 0.0,
+        'centroid_sum': 0.0,
+        'centroid_sq_sum': 0.0,
+        'peak_max': 0.0,
+        'alerted': False,
+        'ring': np.zeros((SESSION_RING_FRAMES, len(RING_COLUMNS)), dtype=np.float16),
+        'ring_head': 0,
+        'ring_count': 0,
+        'tail': np.zeros(0, dtype='<i2'),
+        'keyword_context': np.zeros(0, dtype='<i2')
+    }
+
+
+def update_session_state(state, samples):
+    """
+    Folds one chunk of int16 samples into the session state in place.
+    Samples left over after the last full frame are carried to the next chunk,
+    so frames straddling chunk boundaries are analysed exactly once.
+    Returns the number of new frames.
+    """
+    signal = np.concatenate((state['tail'], samples)) if len(state['tail']) else samples
+    if len(signal) < FRAME_LENGTH:
+        state['tail'] = np.array(signal, dtype='<i2')
+        return 0
+
+    n_frames = (len(signal) - FRAME_LENGTH) // HOP_LENGTH + 1
+    consumed = (n_frames - 1) * HOP_LENGTH + FRAME_LENGTH
+    frame_features = compute_frame_features(signal[:consumed], state['sample_rate'])
+    state['tail'] = np.array(signal[n_frames * HOP_LENGTH:], dtype='<i2')
+
+    rms = frame_features['rms'].astype(np.float64)
+    centroid = frame_features['spectral_centroid'].astype(np.float64)
+    state['frame_count'] += n_frames
+    state['rms_sq_sum'] += float(np.dot(rms, rms))
+    state['centroid_sum'] += float(centroid.sum())
+    state['centroid_sq_sum'] += float(np.dot(centroid, centroid))
+    state['peak_max'] = max(state['peak_max'], float(frame_features['peak'].max()))
+
+    new_rows = np.column_stack((
+        loudness_from_rms(frame_features['rms']),
+        frame_features['zcr'],
+        centroid,
+        rms,
+        frame_features['scream_ratio'],
+        frame_features['scream_flatness']
+    ))[-SESSION_RING_FRAMES:]
+    positions = (state['ring_head'] + np.arange(len(new_rows))) % SESSION_RING_FRAMES
+    state['ring'][positions] = new_rows
+    state['ring_head'] = int((state['ring_head'] + len(new_rows)) % SESSION_RING_FRAMES)
+    state['ring_count'] = min(SESSION_RING_FRAMES, state['ring_count'] + len(new_rows))
+    return n_frames
+
+
+def session_features(state, loudness_percentile=95):
+    """
+    Builds the feature dict used by calculate_audio_threat_score from the session:
+    frame-level arrays come from the recent-frame ring buffer, running statistics
+    cover the whole recording so far.
+    """
+    if state['ring_count'] == 0:
+        return None
+    recent = state['ring'][:state['ring_count']].astype(np.float32)
+    frame_count = state['frame_count']
+    centroid_mean = state['centroid_sum'] / frame_count
+    return {
+        'volume_level': float(np.percentile(recent[:, 0], loudness_percentile)),
+        'frame_loudness': recent[:, 0],
+        'frame_zcr': recent[:, 1],
+        'frame_centroid': recent[:, 2],
+        'frame_scream_ratio': recent[:, 4],
+        'frame_scream_flatness': recent[:, 5],
+        'frame_count': frame_count,
+        'running_rms': float(np.sqrt(state['rms_sq_sum'] / frame_count)),
+        'spectral_centroid_mean': float(centroid_mean),
+        'spectral_centroid_std': float(np.sqrt(max(0.0, state['centroid_sq_sum'] / frame_count - centroid_mean ** 2))),
+        'peak': state['peak_max']
+    }
+
+
+def session_state_to_item(state):
+    """Serializes the session into compact DynamoDB attributes (binary for the arrays)."""
+    item = {key: Decimal(str(state[key])) for key in RUNNING_STAT_KEYS}
+    item.update({
+        'sample_rate': state['sample_rate'],
+        'last_sequence': state['last_sequence'],
+        'alerted': state['alerted'],
+        'ring': state['ring'].tobytes(),
+        'ring_head': state['ring_head'],
+        'ring_count': state['ring_count'],
+        'tail': state['tail'].tobytes(),
+        'keyword_context': state['keyword_context'].tobytes()
+    })
+    return item
+
+
+def session_state_from_item(item):
+    state = new_session_state(int(item['sample_rate']))
+    for key in RUNNING_STAT_KEYS:
+        state[key] = float(item[key])
+    state['frame_count'] = int(item['frame_count'])
+    state['last_sequence'] = int(item['last_sequence'])
+    state['alerted'] = bool(item.get('alerted', False))
+    # boto3 returns Binary attributes as a Binary wrapper; .value is the raw bytes
+    ring = np.frombuffer(bytes(item['ring'].value), dtype=np.float16).reshape(SESSION_RING_FRAMES, -1)
+    # Sessions stored before the flatness column keep scoring frames on the band ratio alone
+    state['ring'][:, :ring.shape[1]] = ring
+    state['ring_head'] = int(item['ring_head'])
+    state['ring_count'] = int(item['ring_count'])
+    state['tail'] = np.frombuffer(bytes(item['tail'].value), dtype='<i2').copy()
+    if 'keyword_context' in item:
+        state['keyword_context'] = np.frombuffer(bytes(item['keyword_context'].value), dtype='<i2').copy()
+    return state
@@ -0,0 +1,85 @@
+import math
+import uuid
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+AUDIO_UPLOAD_PREFIX = 'uploads/'
+# S3 rejects multipart parts under 5 MiB (except the last) and uploads over 10,000 parts
+MULTIPART_MIN_PART_BYTES = 5 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+
+
+def upload_key(user_id):
+    """Object key for a new upload; the user id prefix lets completion check ownership."""
+    return f"{AUDIO_UPLOAD_PREFIX}{quote(str(user_id), safe='')}/{uuid.uuid4().hex}.pcm"
+
+
+def key_belongs_to_user(key, user_id):
+    return key.startswith(f"{AUDIO_UPLOAD_PREFIX}{quote(str(user_id), safe='')}/")
+
+
+def start_multipart_upload(s3, bucket, key, metadata, content_length, part_bytes, expires_in):
+    """
+    Creates a multipart upload and presigns one upload_part URL per part, so the client
+    PUTs the raw PCM straight to S3. Returns the upload description sent to the client.
+    """
+    part_bytes = max(part_bytes, MULTIPART_MIN_PART_BYTES)
+    part_count = max(1, math.ceil(content_length / part_bytes))
+    if part_count > MULTIPART_MAX_PARTS:
+        raise ValueError(f"{content_length} bytes needs {part_count} parts; the limit is {MULTIPART_MAX_PARTS}")
+
+    response = s3.create_multipart_upload(
+        Bucket=bucket, Key=key, Metadata=metadata, ContentType='application/octet-stream'
+    )
+    upload_id = response['UploadId']
+    part_urls = [
+        s3.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expires_in
+        )
+        for part_number in range(1, part_count + 1)
+    ]
+    return {
+        'key': key,
+        'upload_id': upload_id,
+        'part_bytes': part_bytes,
+        'part_urls': part_urls,
+        'expires_in': expires_in
+    }
+
+
+def complete_multipart_upload(s3, bucket, key, upload_id, parts):
+    """Completes the upload from the client's [{'part_number', 'etag'}] list; this fires the S3 trigger."""
+    ordered = sorted(parts, key=lambda part: int(part['part_number']))
+    s3.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': [{'PartNumber': int(part['part_number']), 'ETag': part['etag']} for part in ordered]}
+    )
+
+
+def iter_object_ranges(s3, bucket, key, range_bytes):
+    """
+    Streams an object with ranged GETs of range_bytes, yielding (metadata, data) per range,
+    so only one range is ever held in memory. range_bytes should be even so 16-bit samples
+    never straddle two ranges. An empty object yields nothing.
+    """
+    start = 0
+    total = None
+    while total is None or start < total:
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{start + range_bytes - 1}")
+        except ClientError as e:
+            # S3 answers a range request on an empty object with 416 InvalidRange
+            if e.response['Error']['Code'] == 'InvalidRange':
+                return
+            raise
+        total = int(response['ContentRange'].rsplit('/', 1)[1])
+        data = response['Body'].read()
+        if not data:
+            return
+        yield response.get('Metadata', {}), data
+        start += len(data)
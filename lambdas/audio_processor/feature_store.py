@@ -0,0 +1,65 @@
+import numpy as np
+
+from mfcc import N_MFCC
+
+# Clip-level values packed, in this order and followed by the MFCC means and standard
+# deviations, into the stored feature vector
+FEATURE_VECTOR_FIELDS = (
+    'volume_level',
+    'rms_mean',
+    'rms_max',
+    'peak',
+    'zcr_mean',
+    'spectral_centroid_mean',
+    'scream_ratio_mean'
+)
+# Per-frame columns kept for the loudest frames of each clip; items stored before the
+# flatness column was added hold only the first four
+FRAME_COLUMNS = ('frame_loudness', 'frame_zcr', 'frame_centroid', 'frame_scream_ratio', 'frame_scream_flatness')
+
+# Little-endian float16: 2 bytes per value, ~3 significant digits, enough for 0..1 ratios and Hz
+PACKED_DTYPE = '<f2'
+
+
+def pack_feature_vector(features):
+    """Clip summary and MFCC statistics as float16 bytes, for a DynamoDB Binary attribute."""
+    mfcc = features['mfcc']
+    vector = np.concatenate((
+        [features[field] for field in FEATURE_VECTOR_FIELDS],
+        mfcc.mean(axis=0),
+        mfcc.std(axis=0)
+    ))
+    return vector.astype(PACKED_DTYPE).tobytes()
+
+
+def unpack_feature_vector(data):
+    vector = np.frombuffer(bytes(data), dtype=PACKED_DTYPE).astype(np.float32)
+    n_fields = len(FEATURE_VECTOR_FIELDS)
+    unpacked = {field: float(value) for field, value in zip(FEATURE_VECTOR_FIELDS, vector)}
+    unpacked['mfcc_mean'] = vector[n_fields:n_fields + N_MFCC]
+    unpacked['mfcc_std'] = vector[n_fields + N_MFCC:n_fields + 2 * N_MFCC]
+    return unpacked
+
+
+def pack_loudest_frames(features, max_frames):
+    """
+    The max_frames loudest frames, in time order, as a float16 (frames, FRAME_COLUMNS) matrix.
+    Frame-level score terms only count loud frames, so together with the clip's frame_count
+    this replays them exactly for any loudness threshold above the quietest stored frame.
+    """
+    loudness = features['frame_loudness']
+    if len(loudness) > max_frames:
+        keep = np.sort(np.argpartition(loudness, len(loudness) - max_frames)[-max_frames:])
+    else:
+        keep = np.arange(len(loudness))
+    matrix = np.column_stack([features[column][keep] for column in FRAME_COLUMNS])
+    return matrix.astype(PACKED_DTYPE).tobytes()
+
+
+def unpack_frames(data, columns=FRAME_COLUMNS):
+    """
+    Inverse of pack_loudest_frames: a dict of per-frame arrays keyed like `columns`
+    (FRAME_COLUMNS[:4] for items stored before the flatness column).
+    """
+    matrix = np.frombuffer(bytes(data), dtype=PACKED_DTYPE).reshape(-1, len(columns)).astype(np.float32)
+    return {column: matrix[:, index] for index, column in enumerate(columns)}
@@ -1,10 +1,60 @@
 import json
 import os
+import binascii
 import boto3
 import logging
+import time
 from datetime import datetime
 from decimal import Decimal
-# import numpy # Uncomment if you actually use numpy in your audio processing logic
+from urllib.parse import unquote_plus
+import numpy as np
+from botocore.exceptions import ClientError
+
+from dynamo_utils import batch_put_items
+from idempotency import (
+    STATUS_COMPLETED,
+    ResponseCache,
+    claim_request,
+    complete_request,
+    content_digest,
+    release_request
+)
+from metrics import emit_metrics
+from safe_logging import log_payload
+from sampling import SAMPLING_ACTIVE, SAMPLING_ESCALATED, SAMPLING_IDLE, SamplingPolicy
+
+from audio_features import (
+    DEFAULT_SAMPLE_RATE,
+    FRAME_LENGTH,
+    HOP_LENGTH,
+    AudioPayloadTooLarge,
+    decode_pcm16,
+    extract_audio_features
+)
+from audio_session import (
+    KEYWORD_CONTEXT_SAMPLES,
+    SESSION_RING_FRAMES,
+    new_session_state,
+    session_features,
+    session_state_from_item,
+    session_state_to_item,
+    update_session_state
+)
+from audio_upload import (
+    complete_multipart_upload,
+    iter_object_ranges,
+    key_belongs_to_user,
+    start_multipart_upload,
+    upload_key
+)
+from keyword_spotting import DEFAULT_TEMPLATES_PATH, load_template_library, spot_keywords
+from feature_store import pack_feature_vector, pack_loudest_frames
+from local_bucket import LocalDirectoryS3
+from loudness_baseline import add_loudness_levels, read_loudness_baseline
+from mfcc import compute_mfcc, compute_mfcc_parallel
+from prosody import estimate_prosody
+from resample import CANONICAL_SAMPLE_RATE, SUPPORTED_CHANNELS, SUPPORTED_SAMPLE_RATES, StreamingResampler, downmix, to_canonical
+from vad import drop_silent_blocks, voice_activity_mask
 
 # Configure logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
@@ -14,13 +64,16 @@ logger.setLevel(LOG_LEVEL)
 
 # AWS Clients
 dynamodb = boto3.resource('dynamodb')
-# s3 = boto3.client('s3') # Uncomment if you need to interact with S3 directly in this Lambda
-# comprehend = boto3.client('comprehend') # Uncomment if you use Comprehend here
+# AUDIO_LOCAL_BUCKET_DIR swaps S3 for a directory-backed stand-in so uploads can be exercised offline
+AUDIO_LOCAL_BUCKET_DIR = os.environ.get('AUDIO_LOCAL_BUCKET_DIR')
+s3 = LocalDirectoryS3(AUDIO_LOCAL_BUCKET_DIR) if AUDIO_LOCAL_BUCKET_DIR else boto3.client('s3')
 lambda_client = boto3.client('lambda')
 
 # DynamoDB Table Names from Environment Variables
 AUDIO_ANALYSIS_TABLE_NAME = os.environ.get('AUDIO_ANALYSIS_TABLE_NAME')
 audio_analysis_table = dynamodb.Table(AUDIO_ANALYSIS_TABLE_NAME)
+USER_STATE_TABLE_NAME = os.environ.get('USER_STATE_TABLE_NAME')
+user_state_table = dynamodb.Table(USER_STATE_TABLE_NAME)
 
 # S3 Bucket Name
 AUDIO_TEMP_BUCKET_NAME = os.environ.get('AUDIO_TEMP_BUCKET_NAME')
@@ -34,50 +87,991 @@ COMPREHEND_LANGUAGE_CODE = os.environ.get('COMPREHEND_LANGUAGE_CODE', 'en')
 COMPREHEND_SENTIMENT_THRESHOLD = float(os.environ.get('COMPREHEND_SENTIMENT_THRESHOLD', '0.2'))
 COMPREHEND_VOLUME_THRESHOLD = float(os.environ.get('COMPREHEND_VOLUME_THRESHOLD', '0.7'))
 
+# Server-side PCM analysis settings
+AUDIO_SAMPLE_RATE = int(os.environ.get('AUDIO_SAMPLE_RATE', str(DEFAULT_SAMPLE_RATE)))
+SHOUT_CENTROID_HZ = float(os.environ.get('SHOUT_CENTROID_HZ', '1000'))
+# Zero crossings per sample at CANONICAL_SAMPLE_RATE (0.5 is ~2 kHz)
+SHOUT_MAX_ZCR = float(os.environ.get('SHOUT_MAX_ZCR', '0.5'))
+SHOUT_FRAME_BONUS = float(os.environ.get('SHOUT_FRAME_BONUS', '0.4'))
+SCREAM_BAND_RATIO_THRESHOLD = float(os.environ.get('SCREAM_BAND_RATIO_THRESHOLD', '0.6'))
+# At 8 kHz the 1-4 kHz band is 3/4 of the spectrum, so white noise has a ratio of ~0.75.
+# Shout and scream frames must also be harmonic within the band: spectral flatness below
+# this (white noise is ~0.56, pink ~0.5, a voice mostly under 0.1)
+SCREAM_MAX_FLATNESS = float(os.environ.get('SCREAM_MAX_FLATNESS', '0.3'))
+SCREAM_FRAME_BONUS = float(os.environ.get('SCREAM_FRAME_BONUS', '0.4'))
+
+# Upper bound on decoded audio per request; the raw body may be up to ~4/3 of this plus metadata
+MAX_AUDIO_PAYLOAD_BYTES = int(os.environ.get('MAX_AUDIO_PAYLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_REQUEST_BODY_CHARS = MAX_AUDIO_PAYLOAD_BYTES * 4 // 3 + 64 * 1024
+
+# MFCC stage; more than one worker enables the process-pool path for long clips
+MFCC_WORKERS = int(os.environ.get('MFCC_WORKERS', '1'))
+MFCC_PARALLEL_MIN_SECONDS = float(os.environ.get('MFCC_PARALLEL_MIN_SECONDS', '30'))
+
+# Offline distress keyword spotting (template library deployed with the function)
+KEYWORD_TEMPLATES_PATH = os.environ.get('KEYWORD_TEMPLATES_PATH', DEFAULT_TEMPLATES_PATH)
+KEYWORD_MATCH_BONUS = float(os.environ.get('KEYWORD_MATCH_BONUS', '0.5'))
+# Share of prosody valence when a clip also carries a client-sent sentiment_score
+PROSODY_SENTIMENT_WEIGHT = float(os.environ.get('PROSODY_SENTIMENT_WEIGHT', '0.5'))
+# Load the templates during init so requests never pay for it
+keyword_library = load_template_library(KEYWORD_TEMPLATES_PATH)
+if keyword_library is None:
+    # Once per cold start, so a deployment without the library shows up on the dashboards
+    emit_metrics({'KeywordLibraryMissing': 1})
+
+# Loudest frames stored per clip for replaying frame-level thresholds (8 bytes each)
+AUDIO_STORED_FRAMES = int(os.environ.get('AUDIO_STORED_FRAMES', '64'))
+
+# Per-user loudness baseline: once enough readings are in, loudness is scored as a z-score
+# against the user's own history instead of the global COMPREHEND_VOLUME_THRESHOLD
+LOUDNESS_BASELINE_MIN_SAMPLES = int(os.environ.get('LOUDNESS_BASELINE_MIN_SAMPLES', '20'))
+LOUDNESS_BASELINE_MIN_STD = float(os.environ.get('LOUDNESS_BASELINE_MIN_STD', '0.05'))
+LOUDNESS_Z_THRESHOLD = float(os.environ.get('LOUDNESS_Z_THRESHOLD', '2.0'))
+LOUDNESS_Z_WEIGHT = float(os.environ.get('LOUDNESS_Z_WEIGHT', '0.1'))
+
+# Batched readings flushed by offline clients
+MAX_AUDIO_BATCH_SIZE = int(os.environ.get('MAX_AUDIO_BATCH_SIZE', '100'))
+
+# Chunked streaming sessions
+AUDIO_SESSION_TTL_SECONDS = int(os.environ.get('AUDIO_SESSION_TTL_SECONDS', '3600'))
+
+# Retried requests (same audio, or same metadata when there is no audio) replay the first response
+DEDUPE_TTL_SECONDS = int(os.environ.get('DEDUPE_TTL_SECONDS', '86400'))
+DEDUPE_CACHE_SIZE = int(os.environ.get('DEDUPE_CACHE_SIZE', '1024'))
+# Longer than the function timeout, so only claims left by a crashed invocation go stale
+DEDUPE_STALE_CLAIM_SECONDS = int(os.environ.get('DEDUPE_STALE_CLAIM_SECONDS', '60'))
+recent_responses = ResponseCache(DEDUPE_CACHE_SIZE)
+
+# Presigned multipart uploads to the temp bucket, analysed by the S3 ObjectCreated trigger
+AUDIO_UPLOAD_PATH = '/audio-upload'
+MAX_AUDIO_UPLOAD_BYTES = int(os.environ.get('MAX_AUDIO_UPLOAD_BYTES', str(200 * 1024 * 1024)))
+AUDIO_UPLOAD_PART_BYTES = int(os.environ.get('AUDIO_UPLOAD_PART_BYTES', str(8 * 1024 * 1024)))
+AUDIO_UPLOAD_URL_EXPIRES_SECONDS = int(os.environ.get('AUDIO_UPLOAD_URL_EXPIRES_SECONDS', '900'))
+# One ranged GET holds at most a session ring of frames once resampled (exactly one for 8 kHz mono),
+# so scoring after each range covers every frame
+AUDIO_UPLOAD_RANGE_BYTES = SESSION_RING_FRAMES * HOP_LENGTH * 2
+
+# Recommended sampling returned with every response: seconds between clips and clips per
+# request, from a batch every few minutes when calm to a clip every second once escalated
+SAMPLING_IDLE_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_IDLE_INTERVAL_SECONDS', '30'))
+SAMPLING_IDLE_BATCH_SIZE = int(os.environ.get('SAMPLING_IDLE_BATCH_SIZE', '6'))
+SAMPLING_ACTIVE_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_ACTIVE_INTERVAL_SECONDS', '5'))
+SAMPLING_ACTIVE_BATCH_SIZE = int(os.environ.get('SAMPLING_ACTIVE_BATCH_SIZE', '6'))
+SAMPLING_ESCALATED_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_ESCALATED_INTERVAL_SECONDS', '1'))
+SAMPLING_ESCALATED_BATCH_SIZE = int(os.environ.get('SAMPLING_ESCALATED_BATCH_SIZE', '2'))
+SAMPLING_ACTIVE_SCORE = float(os.environ.get('SAMPLING_ACTIVE_SCORE', '0.3'))
+SAMPLING_HOLD_SECONDS = float(os.environ.get('SAMPLING_HOLD_SECONDS', '120'))
+sampling_policy = SamplingPolicy(
+    {
+        SAMPLING_IDLE: (SAMPLING_IDLE_INTERVAL_SECONDS, min(SAMPLING_IDLE_BATCH_SIZE, MAX_AUDIO_BATCH_SIZE)),
+        SAMPLING_ACTIVE: (SAMPLING_ACTIVE_INTERVAL_SECONDS, min(SAMPLING_ACTIVE_BATCH_SIZE, MAX_AUDIO_BATCH_SIZE)),
+        SAMPLING_ESCALATED: (SAMPLING_ESCALATED_INTERVAL_SECONDS, min(SAMPLING_ESCALATED_BATCH_SIZE, MAX_AUDIO_BATCH_SIZE))
+    },
+    SAMPLING_ACTIVE_SCORE, THREAT_SCORE_TRIGGER_THRESHOLD, SAMPLING_HOLD_SECONDS
+)
+
 
-def calculate_audio_threat_score(volume_level, sentiment_score):
+def loud_threshold(baseline=None):
+    """Loudness above which a level counts as loud: the global threshold, or z > LOUDNESS_Z_THRESHOLD for the user."""
+    if baseline is None:
+        return COMPREHEND_VOLUME_THRESHOLD
+    mean, std = baseline
+    return mean + LOUDNESS_Z_THRESHOLD * std
+
+
+def feature_threat_bonus(features, baseline=None):
+    """Score contribution from server-side clip features, on top of volume and sentiment."""
+    threshold = loud_threshold(baseline)
+    # Fraction of frames that look like a raised voice rather than broadband noise
+    shout_frames = (
+        (features['frame_loudness'] > threshold) &
+        (features['frame_centroid'] > SHOUT_CENTROID_HZ) &
+        (features['frame_zcr'] < SHOUT_MAX_ZCR) &
+        (features['frame_scream_flatness'] < SCREAM_MAX_FLATNESS)
+    )
+    bonus = float(np.mean(shout_frames)) * SHOUT_FRAME_BONUS
+
+    # Loud frames whose energy sits mostly in the 1-4 kHz scream band, as harmonics rather than noise
+    scream_frames = (
+        (features['frame_loudness'] > threshold) &
+        (features['frame_scream_ratio'] > SCREAM_BAND_RATIO_THRESHOLD) &
+        (features['frame_scream_flatness'] < SCREAM_MAX_FLATNESS)
+    )
+    bonus += float(np.mean(scream_frames)) * SCREAM_FRAME_BONUS
+
+    # A spoken distress keyword such as "help" or "bachao"
+    if features.get('keyword_matches'):
+        bonus += KEYWORD_MATCH_BONUS
+    return bonus
+
+
+def calculate_audio_threat_score(volume_level, sentiment_score, features=None, baseline=None):
     """
     Calculates a threat score based on audio analysis.
-    This is a simplified example. Real audio analysis would be more complex.
+    Scalars return a float; arrays of volume_level and sentiment_score (None entries allowed)
+    are scored in one vectorized pass and return an array. `features` is a feature dict for a
+    single clip, or a list of dicts/None aligned with the arrays. Server-side features replace
+    the client-supplied volume_level and add feature_threat_bonus.
+    `baseline` is the user's (mean, std) loudness; when given, loudness is scored by its
+    z-score against it rather than by the raw level.
     """
-    score = 0.0
+    is_batch = np.ndim(volume_level) > 0 or np.ndim(sentiment_score) > 0
 
-    # Handle None values
-    if volume_level is None:
-        volume_level = 0.0
-    if sentiment_score is None:
-        sentiment_score = 0.0
+    # Handle None values (they become NaN in a float array)
+    volume = np.nan_to_num(np.array(volume_level, dtype=np.float64), nan=0.0)
+    sentiment = np.nan_to_num(np.array(sentiment_score, dtype=np.float64), nan=0.0)
+    volume, sentiment = (np.array(arr) for arr in np.broadcast_arrays(volume, sentiment))
+    score = np.zeros(volume.shape)
 
-    # Increase score if volume is high (e.g., shouting)
-    if volume_level > COMPREHEND_VOLUME_THRESHOLD:
-        score += (volume_level - COMPREHEND_VOLUME_THRESHOLD) * 0.5 # Scale based on how much it exceeds threshold
+    clip_features = features if isinstance(features, list) else [features]
+    for index, clip in enumerate(clip_features):
+        if clip:
+            volume.flat[index] = clip['volume_level']
+            score.flat[index] += feature_threat_bonus(clip, baseline)
+
+    if baseline is None:
+        # Increase score if volume is high (e.g., shouting)
+        # Scale based on how much it exceeds threshold
+        score += np.where(volume > COMPREHEND_VOLUME_THRESHOLD, (volume - COMPREHEND_VOLUME_THRESHOLD) * 0.5, 0.0)
+    else:
+        # Increase score if volume is unusually high for this user
+        mean, std = baseline
+        loudness_z = (volume - mean) / std
+        score += np.where(loudness_z > LOUDNESS_Z_THRESHOLD, (loudness_z - LOUDNESS_Z_THRESHOLD) * LOUDNESS_Z_WEIGHT, 0.0)
 
     # Increase score if sentiment is very negative
-    if sentiment_score < -COMPREHEND_SENTIMENT_THRESHOLD: # e.g., if sentiment is -0.7 and threshold is 0.2, -0.7 < -0.2
-        score += abs(sentiment_score) * 0.5 # Scale based on how negative it is
+    # e.g., if sentiment is -0.7 and threshold is 0.2, -0.7 < -0.2; scale based on how negative it is
+    score += np.where(sentiment < -COMPREHEND_SENTIMENT_THRESHOLD, np.abs(sentiment) * 0.5, 0.0)
 
     # Ensure score is between 0 and 1
-    return min(1.0, max(0.0, score))
+    score = np.clip(score, 0.0, 1.0)
+    return score if is_batch else float(score)
+
+
+def get_loudness_baseline(user_id):
+    """
+    The user's (mean, std) loudness, or None when there is no usable baseline yet.
+    A failure falls back to the global threshold rather than failing the request.
+    """
+    try:
+        return read_loudness_baseline(user_state_table, user_id, LOUDNESS_BASELINE_MIN_SAMPLES, LOUDNESS_BASELINE_MIN_STD)
+    except ClientError as e:
+        logger.warning(f"Could not read loudness baseline for user {user_id}: {e}")
+        return None
+
+
+def fold_loudness_levels(user_id, volume_levels):
+    """
+    Adds a succeeded request's loudness levels to the user's baseline. Only server-derived
+    levels belong here: the client's volume_level is on its own scale. A failure costs
+    the baseline these samples, never the request.
+    """
+    if not volume_levels:
+        return
+    try:
+        add_loudness_levels(user_state_table, user_id, volume_levels)
+    except ClientError as e:
+        logger.warning(f"Could not update loudness baseline for user {user_id}: {e}")
+
+
+def replay_response(body, hold_until=None):
+    """
+    A stored 200 response to send again. Its `sampling` object is recomputed for now and
+    the echoed `hold_until`, since the stored one may hold a hold that has since passed.
+    """
+    body_data = json.loads(body)
+    if 'sampling' in body_data:
+        threat_score = body_data.get('max_threat_score', body_data.get('threat_score', 0.0))
+        body_data['sampling'] = sampling_policy.recommend(threat_score, hold_until)
+        body = json.dumps(body_data)
+    return {'statusCode': 200, 'body': body}
+
+
+def check_duplicate(user_id, digest, hold_until=None):
+    """
+    Returns the response to replay when this request was already seen, or None once this
+    invocation has claimed it. The container cache answers repeats without any I/O;
+    otherwise the claim's conditional write doubles as the lookup.
+    """
+    cached_body = recent_responses.get(digest)
+    if cached_body is not None:
+        logger.info(f"Duplicate request {digest} from user {user_id} served from the container cache")
+        return replay_response(cached_body, hold_until)
+
+    existing = claim_request(user_state_table, user_id, digest, DEDUPE_TTL_SECONDS, DEDUPE_STALE_CLAIM_SECONDS)
+    if existing is None:
+        return None
+    if existing.get('status') == STATUS_COMPLETED:
+        recent_responses.put(digest, existing['response_body'])
+        logger.info(f"Duplicate request {digest} from user {user_id} replayed from the dedupe record")
+        return replay_response(existing['response_body'], hold_until)
+    logger.warning(f"Duplicate request {digest} from user {user_id} arrived while the original is in progress")
+    return {
+        'statusCode': 409,
+        'body': json.dumps({'error': 'Duplicate of a request that is still being processed; retry shortly'})
+    }
+
+
+def finish_request(user_id, digest, response):
+    """Records a successful response for replay, or releases the claim so a retry is processed."""
+    if response['statusCode'] == 200:
+        complete_request(user_state_table, user_id, digest, response['body'], DEDUPE_TTL_SECONDS)
+        recent_responses.put(digest, response['body'])
+    else:
+        release_request(user_state_table, user_id, digest)
+    return response
+
+
+def process_once(user_id, digest, hold_until, process, *args):
+    """
+    Runs process(*args) unless the request digest was already seen, in which case the
+    stored response is replayed with sampling for the echoed `hold_until`. The claim is also
+    released when processing raises, so a retry is processed instead of getting a 409
+    until the claim goes stale. `process` returns the response and the loudness levels
+    it measured; those reach the user's baseline only once the response is recorded,
+    so a retried request is never counted twice.
+    """
+    duplicate = check_duplicate(user_id, digest, hold_until)
+    if duplicate:
+        return duplicate
+    try:
+        response, loudness_levels = process(*args)
+    except Exception:
+        try:
+            release_request(user_state_table, user_id, digest)
+        except ClientError as e:
+            logger.warning(f"Could not release dedupe claim {digest} for user {user_id}: {e}")
+        raise
+    finish_request(user_id, digest, response)
+    if response['statusCode'] == 200:
+        fold_loudness_levels(user_id, loudness_levels)
+    return response
+
+
+def payload_too_large_response(message):
+    logger.error(message)
+    return {
+        'statusCode': 413,
+        'body': json.dumps({'error': f'Audio payload too large. Maximum {MAX_AUDIO_PAYLOAD_BYTES} bytes of decoded audio allowed.'})
+    }
+
+
+def invoke_risk_assessor(user_id, timestamp, threat_score, batch_size=None):
+    logger.info(f"Threat score {threat_score} >= threshold {THREAT_SCORE_TRIGGER_THRESHOLD}. Invoking Risk Assessor.")
+    payload = {
+        'user_id': user_id,
+        'trigger_type': 'audio_analysis',
+        'timestamp': timestamp,
+        'threat_score': threat_score
+    }
+    if batch_size is not None:
+        payload['batch_size'] = batch_size
+    lambda_client.invoke(
+        FunctionName=RISK_ASSESSMENT_LAMBDA_NAME,
+        InvocationType='Event',  # Asynchronous invocation
+        Payload=json.dumps(payload)
+    )
+    logger.info("Risk Assessor Lambda invoked.")
+
+
+def gate_silence(samples, sample_rate):
+    """
+    Runs voice activity detection and returns only the active samples, or None when
+    there is not even one analysis frame of activity. Reports skipped audio as metrics.
+    """
+    active_samples = drop_silent_blocks(samples, voice_activity_mask(samples, sample_rate))
+    is_silent = len(active_samples) < FRAME_LENGTH
+    skipped_seconds = (len(samples) - (0 if is_silent else len(active_samples))) / sample_rate
+    emit_metrics(
+        {'SilentClipsSkipped': int(is_silent), 'SilentAudioSecondsSkipped': skipped_seconds},
+        units={'SilentAudioSecondsSkipped': 'Seconds'}
+    )
+    return None if is_silent else active_samples
+
+
+def parse_audio_format(sample_rate, channels):
+    """
+    (sample_rate, channels) as ints from SUPPORTED_SAMPLE_RATES and SUPPORTED_CHANNELS, or
+    ValueError with a message for the client. Used for request bodies, batch readings and
+    upload metadata alike, since the rate sizes the resampling filter.
+    """
+    try:
+        sample_rate, channels = int(sample_rate), int(channels)
+    except (TypeError, ValueError):
+        raise ValueError('sample_rate and channels must be integers')
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise ValueError(f"sample_rate must be one of {', '.join(map(str, SUPPORTED_SAMPLE_RATES))}")
+    if channels not in SUPPORTED_CHANNELS:
+        raise ValueError(f"channels must be one of {', '.join(map(str, SUPPORTED_CHANNELS))}")
+    return sample_rate, channels
+
+
+def clip_sentiment(features, client_sentiment):
+    """
+    The client-sent sentiment_score blended with the clip's prosody valence, weighted by
+    PROSODY_SENTIMENT_WEIGHT. Either one alone when the other is missing. Returns
+    (sentiment, source) with source 'client', 'prosody' or 'blended'.
+    """
+    prosody = features.get('prosody') if features else None
+    if prosody is None:
+        return client_sentiment, 'client'
+    if client_sentiment is None:
+        return prosody['valence'], 'prosody'
+    blended = PROSODY_SENTIMENT_WEIGHT * prosody['valence'] + (1.0 - PROSODY_SENTIMENT_WEIGHT) * float(client_sentiment)
+    return blended, 'blended'
+
+
+def analyze_clip(samples, sample_rate):
+    """Frame features, MFCCs, prosody and distress keyword matches for one voice-active clip."""
+    features = extract_audio_features(samples, sample_rate)
+    features['mfcc'] = compute_mfcc_parallel(
+        samples, sample_rate, workers=MFCC_WORKERS, min_samples=int(MFCC_PARALLEL_MIN_SECONDS * sample_rate)
+    )
+    features['keyword_matches'] = spot_keywords(features['mfcc'], keyword_library)
+    features['prosody'] = estimate_prosody(samples, sample_rate)
+    if features['keyword_matches']:
+        logger.info(f"Distress keywords detected: {[match['keyword'] for match in features['keyword_matches']]}")
+    return features
+
+
+def build_analysis_item(user_id, timestamp, volume_level, sentiment_score, language_code, threat_score, features=None,
+                        sentiment_source='client'):
+    """AudioAnalysisTable item for one clip or reading - floats converted to Decimal"""
+    item = {
+        'user_id': user_id,
+        'timestamp': timestamp,
+        'volume_level': Decimal(str(volume_level)) if volume_level is not None else None,
+        'sentiment_score': Decimal(str(sentiment_score)) if sentiment_score is not None else None,
+        'language_code': language_code,
+        'threat_score': Decimal(str(threat_score)),
+        'analysis_time': datetime.utcnow().isoformat()
+    }
+    if features:
+        # Packed float16 rather than Decimal maps; see feature_store for the layouts
+        item['feature_vector'] = pack_feature_vector(features)
+        item['loud_frames'] = pack_loudest_frames(features, AUDIO_STORED_FRAMES)
+        item['frame_count'] = features['frame_count']
+        add_prosody_fields(item, features, sentiment_source)
+        if features['keyword_matches']:
+            item['keyword_matches'] = [match['keyword'] for match in features['keyword_matches']]
+    return item
+
+
+def add_prosody_fields(item, features, sentiment_source):
+    """Records where the stored sentiment_score came from, and the arousal behind a prosody estimate."""
+    prosody = features.get('prosody')
+    item['sentiment_source'] = sentiment_source
+    if prosody is not None:
+        item['arousal'] = Decimal(str(round(prosody['arousal'], 4)))
+
+
+def build_summary_item(user_id, timestamp, features, sentiment_score, threat_score):
+    """AudioAnalysisTable item summarising a streamed recording from its running session features"""
+    return {
+        'user_id': user_id,
+        'timestamp': timestamp,
+        'volume_level': Decimal(str(features['volume_level'])),
+        'sentiment_score': Decimal(str(sentiment_score)) if sentiment_score is not None else None,
+        'threat_score': Decimal(str(threat_score)),
+        'audio_features': {
+            'running_rms': Decimal(str(round(features['running_rms'], 6))),
+            'peak': Decimal(str(round(features['peak'], 6))),
+            'spectral_centroid_mean': Decimal(str(round(features['spectral_centroid_mean'], 6))),
+            'spectral_centroid_std': Decimal(str(round(features['spectral_centroid_std'], 6)))
+        },
+        'frame_count': features['frame_count'],
+        'analysis_time': datetime.utcnow().isoformat()
+    }
+
+
+def decode_batch_audio(readings):
+    """
+    Pops and decodes each reading's audio_data_base64. Returns (samples per reading, None),
+    with None for metadata-only readings, or (None, error response).
+    """
+    reading_samples = []
+    for index, reading in enumerate(readings):
+        audio_data_base64 = reading.pop('audio_data_base64', None) if isinstance(reading, dict) else None
+        if not audio_data_base64:
+            reading_samples.append(None)
+            continue
+        try:
+            reading_samples.append(decode_pcm16(audio_data_base64, MAX_AUDIO_PAYLOAD_BYTES))
+        except AudioPayloadTooLarge as e:
+            return None, payload_too_large_response(f"Reading {index}: {e}")
+        except (binascii.Error, ValueError) as e:
+            logger.error(f"Invalid audio_data_base64 in reading {index}: {e}")
+            return None, {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'Invalid audio_data_base64 in reading {index}'})
+            }
+    return reading_samples, None
+
+
+def batch_digest(user_id, body_data, readings, reading_samples):
+    """
+    Dedupe digest of a batch from per-reading digests of its metadata and decoded audio,
+    plus the batch-level fields (default sample_rate, channels) the readings inherit.
+    """
+    batch_fields = {key: value for key, value in body_data.items() if key != 'readings'}
+    reading_digests = [
+        content_digest(json.dumps(reading, sort_keys=True, default=str).encode(), samples if samples is not None else b'')
+        for reading, samples in zip(readings, reading_samples)
+    ]
+    return content_digest(
+        str(user_id).encode(), json.dumps(batch_fields, sort_keys=True, default=str).encode(),
+        *(reading_digest.encode() for reading_digest in reading_digests)
+    )
+
+
+def process_reading_batch(user_id, readings, reading_samples, sample_rate, channels, hold_until=None):
+    """
+    Scores a batch of buffered readings in one vectorized pass, stores them with
+    BatchWriteItem and invokes the Risk Assessor at most once, with the batch maximum.
+    `reading_samples` holds each reading's decoded audio (see decode_batch_audio) and
+    `hold_until` is the client's echoed sampling hold. Returns the response and the
+    server-derived loudness levels for the baseline (see process_once).
+    """
+    timestamps = []
+    features = []
+    silent_indexes = set()
+    for index, reading in enumerate(readings):
+        try:
+            timestamps.append(int(reading['timestamp']))
+        except (KeyError, TypeError, ValueError):
+            logger.error(f"Invalid or missing timestamp in reading {index}")
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'Reading {index} needs an integer epoch timestamp'})
+            }, []
+
+        clip_features = None
+        samples = reading_samples[index]
+        if samples is not None:
+            try:
+                reading_format = parse_audio_format(reading.get('sample_rate', sample_rate), reading.get('channels', channels))
+            except ValueError as e:
+                logger.error(f"Invalid audio format in reading {index}: {e}")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': f'Reading {index}: {e}'})
+                }, []
+            samples = to_canonical(samples, *reading_format)
+            samples = gate_silence(samples, CANONICAL_SAMPLE_RATE)
+            if samples is None:
+                silent_indexes.add(index)
+            else:
+                clip_features = analyze_clip(samples, CANONICAL_SAMPLE_RATE)
+        features.append(clip_features)
+
+    # Silent clips are neither scored nor stored
+    if silent_indexes:
+        keep = [index for index in range(len(readings)) if index not in silent_indexes]
+        readings = [readings[index] for index in keep]
+        timestamps = [timestamps[index] for index in keep]
+        features = [features[index] for index in keep]
+        logger.info(f"Skipped {len(silent_indexes)} silent readings for user {user_id}")
+        if not readings:
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Audio batch was silent; nothing stored',
+                    'readings_processed': 0,
+                    'readings_skipped': len(silent_indexes),
+                    'threat_scores': [],
+                    'max_threat_score': 0.0,
+                    'sampling': sampling_policy.recommend(0.0, hold_until)
+                })
+            }, []
+
+    volume_levels = [reading.get('volume_level') for reading in readings]
+    sentiments = [clip_sentiment(features[index], reading.get('sentiment_score')) for index, reading in enumerate(readings)]
+    sentiment_scores = [sentiment for sentiment, _ in sentiments]
+    # The baseline holds server-derived loudness, so readings without audio keep the global threshold
+    loudness_levels = [clip_features['volume_level'] for clip_features in features if clip_features]
+    threat_scores = calculate_audio_threat_score(volume_levels, sentiment_scores, features)
+    if loudness_levels:
+        baseline = get_loudness_baseline(user_id)
+        if baseline is not None:
+            has_audio = np.array([clip_features is not None for clip_features in features])
+            threat_scores = np.where(
+                has_audio, calculate_audio_threat_score(volume_levels, sentiment_scores, features, baseline), threat_scores
+            )
+
+    # One item per timestamp: BatchWriteItem rejects duplicate keys, the last reading wins
+    items = {}
+    for index, reading in enumerate(readings):
+        clip_features = features[index]
+        volume_level = clip_features['volume_level'] if clip_features else volume_levels[index]
+        items[timestamps[index]] = build_analysis_item(
+            user_id, timestamps[index], volume_level, sentiment_scores[index],
+            reading.get('language_code'), float(threat_scores[index]), clip_features, sentiments[index][1]
+        )
+    calls = batch_put_items(dynamodb, AUDIO_ANALYSIS_TABLE_NAME, list(items.values()))
+    logger.info(f"Stored {len(items)} audio readings for user {user_id} in {calls} BatchWriteItem calls")
+
+    max_index = int(np.argmax(threat_scores))
+    max_score = float(threat_scores[max_index])
+    if max_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
+        invoke_risk_assessor(user_id, timestamps[max_index], max_score, batch_size=len(readings))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Audio batch processed successfully',
+            'readings_processed': len(readings),
+            'readings_skipped': len(silent_indexes),
+            'threat_scores': [float(score) for score in threat_scores],
+            'max_threat_score': max_score,
+            'sampling': sampling_policy.recommend(max_score, hold_until)
+        })
+    }, loudness_levels
+
+
+def analyze_session_chunk(state, samples, sample_rate):
+    """
+    The streaming counterpart of analyze_clip: VAD-gates one chunk and folds its active
+    samples into the session state. Returns the session features with this chunk's prosody
+    and keyword matches, or None when the chunk was silent or completed no frame. Keywords
+    are spotted with the end of the previous chunk in front (state['keyword_context']).
+    """
+    samples = gate_silence(samples, sample_rate) if len(samples) else None
+    if samples is None:
+        return None
+    new_frames = update_session_state(state, samples)
+    context = np.concatenate((state['keyword_context'], samples))
+    state['keyword_context'] = context[-KEYWORD_CONTEXT_SAMPLES:].copy()
+    if not new_frames:
+        return None
+
+    features = session_features(state)
+    features['keyword_matches'] = spot_keywords(compute_mfcc(context, sample_rate), keyword_library)
+    # Prosody of this chunk alone: sentiment follows the latest speech, not the whole session
+    features['prosody'] = estimate_prosody(samples, sample_rate)
+    if features['keyword_matches']:
+        logger.info(f"Distress keywords detected: {[match['keyword'] for match in features['keyword_matches']]}")
+    return features
+
+
+def replay_chunk_response(item, session_id, sequence_number, hold_until=None):
+    """The stored response when this chunk is the one the session item last applied (a retry), else None."""
+    if int(item.get('last_sequence', -1)) != sequence_number or 'last_response' not in item:
+        return None
+    logger.info(f"Chunk {sequence_number} of audio session {session_id} already applied; replaying its response")
+    return replay_response(item['last_response'], hold_until)
+
+
+def process_session_chunk(user_id, timestamp, session_id, sequence_number, samples, sample_rate, sentiment_score, is_final, hold_until=None):
+    """
+    Folds one sequence-numbered chunk into the session's running features and rescores it
+    like a clip: silence gated out, keywords and prosody, loudness against the user's baseline.
+    Costs one consistent read and one conditional write of the compact session item;
+    the write only succeeds if no other chunk advanced the session in between. The item
+    keeps the last chunk's response, so a retry of that chunk replays it without folding
+    its loudness into the baseline again.
+    """
+    state_key = f"audio_session#{session_id}"
+    if sequence_number == 0:
+        state = new_session_state(sample_rate)
+        condition = 'attribute_not_exists(user_id)'
+        condition_values = {}
+    else:
+        response = user_state_table.get_item(Key={'user_id': user_id, 'state_key': state_key}, ConsistentRead=True)
+        if 'Item' not in response:
+            logger.error(f"Audio session {session_id} not found for chunk {sequence_number}")
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'Unknown audio session. Start with sequence_number 0.'})
+            }
+        replay = replay_chunk_response(response['Item'], session_id, sequence_number, hold_until)
+        if replay:
+            return replay
+        state = session_state_from_item(response['Item'])
+        condition = 'last_sequence = :previous_sequence'
+        condition_values = {':previous_sequence': sequence_number - 1}
+
+    if sequence_number != state['last_sequence'] + 1:
+        logger.error(f"Out-of-order chunk {sequence_number} for session {session_id}, expected {state['last_sequence'] + 1}")
+        return {
+            'statusCode': 409,
+            'body': json.dumps({'error': 'Out-of-order chunk', 'expected_sequence_number': state['last_sequence'] + 1})
+        }
+
+    features = analyze_session_chunk(state, samples, sample_rate)
+    state['last_sequence'] = sequence_number
+    sentiment_source = 'client'
+    if features:
+        sentiment_score, sentiment_source = clip_sentiment(features, sentiment_score)
+        threat_score = calculate_audio_threat_score(None, sentiment_score, features, get_loudness_baseline(user_id))
+    elif len(samples):
+        # A silent chunk, like a silent clip, scores nothing
+        threat_score = 0.0
+    else:
+        threat_score = calculate_audio_threat_score(None, sentiment_score)
+
+    should_alert = threat_score >= THREAT_SCORE_TRIGGER_THRESHOLD and not state['alerted']
+    state['alerted'] = state['alerted'] or should_alert
+
+    body = json.dumps({
+        'message': 'Audio chunk processed successfully',
+        'session_id': session_id,
+        'sequence_number': sequence_number,
+        'threat_score': threat_score,
+        'frames_processed': state['frame_count'],
+        'running_rms': features['running_rms'] if features else 0.0,
+        'sampling': sampling_policy.recommend(threat_score, hold_until)
+    })
+    item = session_state_to_item(state)
+    item.update({
+        'user_id': user_id,
+        'state_key': state_key,
+        'threat_score': Decimal(str(threat_score)),
+        'last_response': body,
+        'expires_at': int(time.time()) + AUDIO_SESSION_TTL_SECONDS
+    })
+    put_kwargs = {'Item': item, 'ConditionExpression': condition}
+    if condition_values:
+        put_kwargs['ExpressionAttributeValues'] = condition_values
+    try:
+        user_state_table.put_item(**put_kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Either a retry raced its original, or another chunk advanced the session
+        current = user_state_table.get_item(Key={'user_id': user_id, 'state_key': state_key}, ConsistentRead=True)
+        replay = replay_chunk_response(current.get('Item', {}), session_id, sequence_number, hold_until)
+        if replay:
+            return replay
+        logger.error(f"Concurrent update on audio session {session_id} at chunk {sequence_number}")
+        return {
+            'statusCode': 409,
+            'body': json.dumps({'error': 'Session advanced concurrently'})
+        }
+    logger.info(f"Audio session {session_id} chunk {sequence_number}: {state['frame_count']} frames so far, score {threat_score}")
+    # The conditional write applied this chunk exactly once; a retry replays before reaching here
+    if features:
+        fold_loudness_levels(user_id, [features['volume_level']])
+
+    # Only the session summary lands in the analysis table, not every chunk
+    summary_features = features or session_features(state)
+    if is_final and summary_features:
+        item = build_summary_item(user_id, timestamp, summary_features, sentiment_score, threat_score)
+        add_prosody_fields(item, summary_features, sentiment_source)
+        item['session_id'] = session_id
+        audio_analysis_table.put_item(Item=item)
+        logger.info(f"Audio session {session_id} summary stored for user {user_id}")
+
+    # Alert at most once per session, as soon as any chunk crosses the threshold
+    if should_alert:
+        invoke_risk_assessor(user_id, timestamp, threat_score)
+
+    return {'statusCode': 200, 'body': body}
+
+
+def start_audio_upload(body_data):
+    """Step one of the upload flow: a multipart upload with one presigned URL per part."""
+    user_id = body_data.get('user_id')
+    timestamp = body_data.get('timestamp')
+    content_length = body_data.get('content_length')
+    try:
+        timestamp = int(timestamp)
+        content_length = int(content_length)
+    except (TypeError, ValueError):
+        logger.error(f"Invalid upload request: timestamp={timestamp}, content_length={content_length}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Upload requests need user_id, an integer epoch timestamp and content_length'})
+        }
+    if not user_id or content_length <= 0:
+        logger.error("Validation Error: Upload requests need user_id and a positive content_length.")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Upload requests need user_id, an integer epoch timestamp and content_length'})
+        }
+    try:
+        sample_rate, channels = parse_audio_format(body_data.get('sample_rate', AUDIO_SAMPLE_RATE), body_data.get('channels', 1))
+    except ValueError as e:
+        logger.error(f"Invalid upload audio format: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': str(e)})
+        }
+    if content_length > MAX_AUDIO_UPLOAD_BYTES:
+        logger.error(f"Upload too large: {content_length} bytes")
+        return {
+            'statusCode': 413,
+            'body': json.dumps({'error': f'Audio upload too large. Maximum {MAX_AUDIO_UPLOAD_BYTES} bytes allowed.'})
+        }
+
+    # Everything the S3 trigger needs travels as object metadata, returned by the first ranged GET
+    metadata = {
+        'user-id': str(user_id),
+        'timestamp': str(timestamp),
+        'sample-rate': str(sample_rate),
+        'channels': str(channels)
+    }
+    if body_data.get('sentiment_score') is not None:
+        metadata['sentiment-score'] = str(float(body_data['sentiment_score']))
+    if body_data.get('language_code'):
+        metadata['language-code'] = str(body_data['language_code'])
+
+    upload = start_multipart_upload(
+        s3, AUDIO_TEMP_BUCKET_NAME, upload_key(user_id), metadata, content_length,
+        AUDIO_UPLOAD_PART_BYTES, AUDIO_UPLOAD_URL_EXPIRES_SECONDS
+    )
+    logger.info(f"Started audio upload {upload['upload_id']} for user {user_id}: {len(upload['part_urls'])} parts")
+    return {
+        'statusCode': 200,
+        'body': json.dumps(upload)
+    }
+
+
+def complete_audio_upload(body_data):
+    """Step two: the client reports its part ETags and S3 assembles the object, firing the trigger."""
+    user_id = body_data.get('user_id')
+    key = body_data.get('key')
+    upload_id = body_data.get('upload_id')
+    parts = body_data.get('parts')
+    if not all([user_id, key, upload_id]) or not isinstance(parts, list) or not parts:
+        logger.error("Validation Error: Upload completion needs user_id, key, upload_id and parts.")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Upload completion needs user_id, key, upload_id and a non-empty parts list'})
+        }
+    if not key_belongs_to_user(key, user_id):
+        logger.error(f"User {user_id} tried to complete an upload outside their prefix")
+        return {
+            'statusCode': 403,
+            'body': json.dumps({'error': 'Upload does not belong to this user'})
+        }
+    try:
+        complete_multipart_upload(s3, AUDIO_TEMP_BUCKET_NAME, key, upload_id, parts)
+    except ClientError as e:
+        logger.error(f"Could not complete upload {upload_id}: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f"Could not complete upload: {e.response['Error']['Code']}"})
+        }
+    logger.info(f"Completed audio upload {upload_id} for user {user_id}")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Upload complete; audio analysis will follow', 'key': key})
+    }
+
+
+def process_uploaded_audio(bucket, key):
+    """
+    Analyses an uploaded PCM object one ranged GET at a time. The ranges go through one
+    streaming resampler, so the canonical audio has no seams at range boundaries, and then
+    through analyze_session_chunk like the chunks of a session: frames and keywords spanning
+    two ranges are analysed once. Each range leaves one feature snapshot; the snapshots are
+    scored together like a reading batch, and a single summary item is stored for the
+    whole recording.
+    """
+    state = None
+    snapshots = []
+    for metadata, data in iter_object_ranges(s3, bucket, key, AUDIO_UPLOAD_RANGE_BYTES):
+        if state is None:
+            user_id = metadata.get('user-id')
+            if not user_id or 'timestamp' not in metadata:
+                logger.error(f"Uploaded object {key} has no user-id/timestamp metadata; skipping")
+                return {'key': key, 'error': 'missing metadata'}
+            timestamp = int(metadata['timestamp'])
+            try:
+                sample_rate, channels = parse_audio_format(metadata.get('sample-rate', AUDIO_SAMPLE_RATE), metadata.get('channels', 1))
+            except ValueError as e:
+                # Never analysable; drop it rather than leave it for the lifecycle rule
+                logger.error(f"Uploaded object {key} has invalid audio format metadata: {e}")
+                s3.delete_object(Bucket=bucket, Key=key)
+                return {'key': key, 'error': str(e)}
+            sentiment_score = float(metadata['sentiment-score']) if 'sentiment-score' in metadata else None
+            state = new_session_state(CANONICAL_SAMPLE_RATE)
+            resampler = StreamingResampler(sample_rate)
+
+        samples = resampler.push(downmix(np.frombuffer(data, dtype='<i2', count=len(data) // 2), channels))
+        snapshot = analyze_session_chunk(state, samples, CANONICAL_SAMPLE_RATE)
+        if snapshot:
+            snapshots.append(snapshot)
+
+    if state is not None:
+        snapshot = analyze_session_chunk(state, resampler.flush(), CANONICAL_SAMPLE_RATE)
+        if snapshot:
+            snapshots.append(snapshot)
+
+    if not snapshots:
+        logger.info(f"Uploaded audio {key} was empty or silent; nothing stored")
+        s3.delete_object(Bucket=bucket, Key=key)
+        return {'key': key, 'threat_score': 0.0}
+
+    baseline = get_loudness_baseline(user_id)
+    sentiments = [clip_sentiment(snapshot, sentiment_score) for snapshot in snapshots]
+    sentiment_scores = [sentiment for sentiment, _ in sentiments]
+    threat_scores = calculate_audio_threat_score([None] * len(snapshots), sentiment_scores, snapshots, baseline)
+    max_index = int(np.argmax(threat_scores))
+    threat_score = float(threat_scores[max_index])
+
+    # The recording is summarised by its highest-scoring range, sentiment included
+    item = build_summary_item(user_id, timestamp, session_features(state), sentiment_scores[max_index], threat_score)
+    add_prosody_fields(item, snapshots[max_index], sentiments[max_index][1])
+    item['upload_key'] = key
+    item['volume_level'] = Decimal(str(snapshots[max_index]['volume_level']))
+    if metadata.get('language-code'):
+        item['language_code'] = metadata['language-code']
+    keywords = sorted({match['keyword'] for snapshot in snapshots for match in snapshot['keyword_matches']})
+    if keywords:
+        item['keyword_matches'] = keywords
+    audio_analysis_table.put_item(Item=item)
+    logger.info(f"Uploaded audio {key}: {state['frame_count']} frames in {len(snapshots)} ranges, score {threat_score}")
+
+    if threat_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
+        invoke_risk_assessor(user_id, timestamp, threat_score)
+
+    # The temp bucket only holds audio until it has been analysed
+    s3.delete_object(Bucket=bucket, Key=key)
+    # A redelivered notification finds the object gone, so the ranges are folded in once
+    fold_loudness_levels(user_id, [snapshot['volume_level'] for snapshot in snapshots])
+    return {'key': key, 'threat_score': threat_score}
+
+
+def process_s3_event(event):
+    results = []
+    for record in event['Records']:
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        try:
+            results.append(process_uploaded_audio(bucket, key))
+        except ClientError as e:
+            # S3 delivers notifications at least once; processed uploads are already deleted
+            if e.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            logger.info(f"Uploaded audio {key} no longer exists; already processed")
+            results.append({'key': key, 'skipped': 'already processed'})
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Uploaded audio processed', 'results': results})
+    }
+
+
+def process_clip(user_id, timestamp, samples, volume_level, sentiment_score, language_code, hold_until=None):
+    """
+    Analyses, stores and scores one clip (or a metadata-only reading when samples is empty).
+    Returns the response and the server-derived loudness level for the baseline (see process_once).
+    """
+    features = None
+    sentiment_source = 'client'
+    if len(samples):
+        # Drop silence before any analysis; a fully silent clip costs no writes or invocations
+        samples = gate_silence(samples, CANONICAL_SAMPLE_RATE)
+        if samples is None:
+            logger.info(f"Silent audio clip from user {user_id} at {timestamp} skipped")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Silent audio skipped', 'threat_score': 0.0, 'sampling': sampling_policy.recommend(0.0, hold_until)})
+            }, []
+        features = analyze_clip(samples, CANONICAL_SAMPLE_RATE)
+        volume_level = features['volume_level']
+        sentiment_score, sentiment_source = clip_sentiment(features, sentiment_score)
+        logger.info(
+            f"Extracted {features['frame_count']} audio frames, server volume level {volume_level:.3f}, "
+            f"{sentiment_source} sentiment {sentiment_score}"
+        )
+
+    # Calculate threat score against the user's loudness baseline; it only holds server-derived
+    # loudness, so a metadata-only reading is scored against the global threshold
+    baseline = get_loudness_baseline(user_id) if features else None
+    threat_score = calculate_audio_threat_score(volume_level, sentiment_score, features, baseline)
+
+    # Store analysis in DynamoDB
+    item = build_analysis_item(
+        user_id, timestamp, volume_level, sentiment_score, language_code, threat_score, features, sentiment_source
+    )
+    audio_analysis_table.put_item(Item=item)
+    logger.info(f"Audio analysis stored for user {user_id} at {timestamp} with score {threat_score}")
+
+    # In a real scenario, you might store the audio_data_base64 in S3
+    # For this example, we're just processing the metadata.
+
+    # Invoke Risk Assessor Lambda if threat score exceeds threshold
+    if threat_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
+        invoke_risk_assessor(user_id, timestamp, threat_score)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Audio analysis processed successfully',
+            'threat_score': threat_score,
+            'sampling': sampling_policy.recommend(threat_score, hold_until)
+        })
+    }, [volume_level] if features else []
 
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    log_payload(logger, "Received event", event)
+
+    # S3 upload notifications are invoked asynchronously; errors propagate so Lambda retries them
+    if 'Records' in event:
+        return process_s3_event(event)
 
     try:
         # API Gateway Proxy Integration puts the body as a string under 'body' key
         if 'body' in event and event['body'] is not None:
-            body_data = json.loads(event['body'])
+            if len(event['body']) > MAX_REQUEST_BODY_CHARS:
+                return payload_too_large_response(f"Request body too large: {len(event['body'])} characters")
+            # Drop the event's reference to the raw body so it can be freed once parsed
+            body_data = json.loads(event.pop('body'))
         else:
             body_data = event # For direct Lambda invocation or other triggers
 
-        logger.info(f"Parsed body data: {json.dumps(body_data)}")
+        log_payload(logger, "Parsed body data", body_data)
+
+        if event.get('resource') == AUDIO_UPLOAD_PATH:
+            if body_data.get('action', 'start') == 'complete':
+                return complete_audio_upload(body_data)
+            return start_audio_upload(body_data)
+
+        # Take the audio out of the body so only this local holds the (large) string
+        audio_data_base64 = body_data.pop('audio_data_base64', None)
+        # The echoed sampling hold is not part of the reading, so it stays out of the dedupe digest
+        hold_until = body_data.pop('sampling_hold_until', None)
 
         user_id = body_data.get('user_id')
-        audio_data_base64 = body_data.get('audio_data_base64')
         timestamp = body_data.get('timestamp')
         volume_level = body_data.get('volume_level')
         sentiment_score = body_data.get('sentiment_score')
         language_code = body_data.get('language_code')
+        session_id = body_data.get('session_id')
+        sequence_number = body_data.get('sequence_number')
+        readings = body_data.get('readings')
+
+        try:
+            sample_rate, channels = parse_audio_format(body_data.get('sample_rate', AUDIO_SAMPLE_RATE), body_data.get('channels', 1))
+        except ValueError as e:
+            logger.error(f"Invalid audio format: {e}")
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        if readings is not None:
+            if not user_id or not isinstance(readings, list) or not readings:
+                logger.error("Validation Error: Batch requests need user_id and a non-empty readings list.")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'Batch requests need user_id and a non-empty readings list'})
+                }
+            if len(readings) > MAX_AUDIO_BATCH_SIZE:
+                logger.error(f"Batch too large: {len(readings)} readings")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': f'Too many readings. Maximum {MAX_AUDIO_BATCH_SIZE} per batch.'})
+                }
+            reading_samples, error_response = decode_batch_audio(readings)
+            if error_response:
+                return error_response
+            return process_once(
+                user_id, batch_digest(user_id, body_data, readings, reading_samples), hold_until,
+                process_reading_batch, user_id, readings, reading_samples, sample_rate, channels, hold_until
+            )
 
         if not all([user_id, timestamp]):
             logger.error("Validation Error: Missing required fields (user_id, timestamp).")
@@ -96,44 +1090,47 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Invalid timestamp format. Must be an integer epoch.'})
             }
 
-        # Calculate threat score
-        threat_score = calculate_audio_threat_score(volume_level, sentiment_score)
-
-        # Store analysis in DynamoDB - Convert floats to Decimal
-        item = {
-            'user_id': user_id,
-            'timestamp': timestamp,
-            'volume_level': Decimal(str(volume_level)) if volume_level is not None else None,
-            'sentiment_score': Decimal(str(sentiment_score)) if sentiment_score is not None else None,
-            'language_code': language_code,
-            'threat_score': Decimal(str(threat_score)),
-            'analysis_time': datetime.utcnow().isoformat()
-        }
-        audio_analysis_table.put_item(Item=item)
-        logger.info(f"Audio analysis stored for user {user_id} at {timestamp} with score {threat_score}")
-
-        # In a real scenario, you might store the audio_data_base64 in S3
-        # For this example, we're just processing the metadata.
-
-        # Invoke Risk Assessor Lambda if threat score exceeds threshold
-        if threat_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
-            logger.info(f"Threat score {threat_score} >= threshold {THREAT_SCORE_TRIGGER_THRESHOLD}. Invoking Risk Assessor.")
-            lambda_client.invoke(
-                FunctionName=RISK_ASSESSMENT_LAMBDA_NAME,
-                InvocationType='Event',  # Asynchronous invocation
-                Payload=json.dumps({
-                    'user_id': user_id,
-                    'trigger_type': 'audio_analysis',
-                    'timestamp': timestamp,
-                    'threat_score': threat_score
-                })
+        if session_id is not None:
+            try:
+                sequence_number = int(sequence_number)
+            except (TypeError, ValueError):
+                logger.error(f"Invalid sequence_number for session {session_id}: {sequence_number}")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'sequence_number must be an integer when session_id is set'})
+                }
+
+        # Extract features from the raw PCM when the client sent audio
+        samples = np.zeros(0, dtype='<i2')
+        # Every remaining field (timestamp, sample_rate, channels, scores) is part of the request
+        metadata = json.dumps(body_data, sort_keys=True, default=str).encode()
+        if audio_data_base64:
+            try:
+                samples = decode_pcm16(audio_data_base64, MAX_AUDIO_PAYLOAD_BYTES)
+            except AudioPayloadTooLarge as e:
+                return payload_too_large_response(str(e))
+            except (binascii.Error, ValueError) as e:
+                logger.error(f"Invalid audio_data_base64: {e}")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'Invalid audio_data_base64. Must be base64-encoded 16-bit PCM.'})
+                }
+            # The decoded samples are all we need from here on; release the base64 string
+            audio_data_base64 = None
+        digest = content_digest(str(user_id).encode(), metadata, samples)
+        if len(samples):
+            samples = to_canonical(samples, sample_rate, channels)
+
+        if session_id is not None:
+            return process_session_chunk(
+                user_id, timestamp, str(session_id), sequence_number, samples, CANONICAL_SAMPLE_RATE,
+                sentiment_score, bool(body_data.get('is_final', False)), hold_until
             )
-            logger.info("Risk Assessor Lambda invoked.")
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'message': 'Audio analysis processed successfully', 'threat_score': threat_score})
-        }
+        # Sessions are already idempotent through their sequence numbers
+        return process_once(
+            user_id, digest, hold_until, process_clip, user_id, timestamp, samples, volume_level, sentiment_score, language_code, hold_until
+        )
 
     except json.JSONDecodeError as e:
         logger.error(f"JSON parsing error: {e}")
@@ -0,0 +1,177 @@
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keyword_templates.npz')
+
+# Every template is resampled to this many frames (~0.64 s at a 16 ms hop) so the library
+# is one contiguous (n_templates, TEMPLATE_FRAMES, n_coeffs) array
+TEMPLATE_FRAMES = 40
+# Sakoe-Chiba band radius (10% of the template), also the LB_Keogh envelope radius
+WARPING_RADIUS = 4
+# Candidate windows start every few frames
+WINDOW_STEP_FRAMES = 4
+# c0 tracks loudness rather than phonetic content, so it is left out of matching
+FIRST_COEFFICIENT = 1
+# Default per-frame distance below which a window matches a template; calibrate per library
+# from held-out recordings and store it with each template
+DEFAULT_MATCH_THRESHOLD = 8.0
+
+
+def resample_sequence(sequence, n_frames=TEMPLATE_FRAMES):
+    """Linearly resamples a (frames, coeffs) sequence to n_frames."""
+    positions = np.linspace(0, len(sequence) - 1, n_frames)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, len(sequence) - 1)
+    weight = (positions - lower)[:, None]
+    return sequence[lower] * (1.0 - weight) + sequence[upper] * weight
+
+
+def normalize_sequence(mfcc):
+    """Drops c0 and applies cepstral mean normalization."""
+    coefficients = np.asarray(mfcc, dtype=np.float32)[:, FIRST_COEFFICIENT:]
+    return coefficients - coefficients.mean(axis=0)
+
+
+def save_template_library(path, labels, mfcc_sequences, thresholds=None):
+    """
+    Writes a template library from MFCC sequences (e.g. mfcc.compute_mfcc over clean
+    recordings of each keyword). Several templates may share a label.
+    """
+    sequences = np.stack([resample_sequence(normalize_sequence(sequence)) for sequence in mfcc_sequences])
+    if thresholds is None:
+        thresholds = [DEFAULT_MATCH_THRESHOLD] * len(labels)
+    np.savez(
+        path,
+        templates=sequences.astype(np.float32),
+        labels=np.asarray(labels),
+        thresholds=np.asarray(thresholds, dtype=np.float32)
+    )
+
+
+def envelope(sequences, radius=WARPING_RADIUS):
+    """Running max/min over +-radius frames of (..., frames, coeffs) sequences."""
+    pad = [(0, 0)] * (sequences.ndim - 2) + [(radius, radius), (0, 0)]
+    windows = sliding_window_view(np.pad(sequences, pad, mode='edge'), 2 * radius + 1, axis=-2)
+    return np.ascontiguousarray(windows.max(axis=-1)), np.ascontiguousarray(windows.min(axis=-1))
+
+
+@lru_cache(maxsize=4)
+def load_template_library(path=DEFAULT_TEMPLATES_PATH):
+    """
+    Loads the library once per container into contiguous arrays, with the LB_Keogh
+    upper/lower envelopes precomputed. Returns None when no library is deployed.
+    """
+    if not os.path.exists(path):
+        logger.error(f"No keyword template library at {path}; keyword spotting disabled")
+        return None
+    with np.load(path) as data:
+        templates = np.ascontiguousarray(data['templates'], dtype=np.float32)
+        labels = [str(label) for label in data['labels']]
+        thresholds = np.ascontiguousarray(data['thresholds'], dtype=np.float32)
+
+    upper, lower = envelope(templates)
+    library = {
+        'templates': templates,
+        'labels': labels,
+        'thresholds': thresholds,
+        'upper': upper,
+        'lower': lower
+    }
+    logger.info(f"Loaded {len(labels)} keyword templates from {path}")
+    return library
+
+
+def lb_keogh(query, upper, lower):
+    """
+    LB_Keogh lower bound of the DTW distance between query and the sequence whose
+    envelope is (upper, lower), on the same per-frame scale as banded_dtw.
+    Leading dimensions broadcast, so this scores all pairs or aligned pairs alike.
+    """
+    above = np.maximum(query - upper, 0.0)
+    below = np.maximum(lower - query, 0.0)
+    return (np.square(above) + np.square(below)).sum(axis=(-2, -1)) / query.shape[-2]
+
+
+def banded_dtw(sequences_a, sequences_b, radius=WARPING_RADIUS):
+    """
+    DTW distance per pair of equal-length sequences, divided by the sequence length
+    (the same scale as lb_keogh, which therefore stays a lower bound).
+    All pairs are advanced together one anti-diagonal at a time, so the Python loop
+    runs 2 * frames - 1 times regardless of how many pairs are compared.
+    """
+    n_pairs, n_frames, _ = sequences_a.shape
+    cost = np.einsum('pik,pik->pi', sequences_a, sequences_a)[:, :, None] \
+        + np.einsum('pjk,pjk->pj', sequences_b, sequences_b)[:, None, :] \
+        - 2.0 * np.einsum('pik,pjk->pij', sequences_a, sequences_b)
+    cost = np.maximum(cost, 0.0)
+
+    accumulated = np.full((n_pairs, n_frames + 1, n_frames + 1), np.inf, dtype=np.float32)
+    accumulated[:, 0, 0] = 0.0
+    for diagonal in range(2 * n_frames - 1):
+        i = np.arange(max(0, diagonal - n_frames + 1), min(diagonal, n_frames - 1) + 1)
+        j = diagonal - i
+        in_band = np.abs(i - j) <= radius
+        i, j = i[in_band], j[in_band]
+        if not len(i):
+            continue
+        best_previous = np.minimum(
+            np.minimum(accumulated[:, i, j], accumulated[:, i, j + 1]),
+            accumulated[:, i + 1, j]
+        )
+        accumulated[:, i + 1, j + 1] = cost[:, i, j] + best_previous
+    return accumulated[:, n_frames, n_frames] / n_frames
+
+
+def spot_keywords(mfcc, library):
+    """
+    Finds distress keywords in a clip's (frames, n_mfcc) MFCCs.
+    A cascade of lower bounds prunes (window, template) pairs that cannot beat their
+    template's threshold: LB_Keogh of each window against the template envelopes for all
+    pairs, then LB_Keogh of the template against the window envelope for the survivors.
+    Only what is left goes through DTW. Returns the best match per keyword, best first.
+    """
+    if library is None or len(mfcc) < TEMPLATE_FRAMES:
+        return []
+
+    coefficients = np.asarray(mfcc, dtype=np.float32)[:, FIRST_COEFFICIENT:]
+    candidates = sliding_window_view(coefficients, TEMPLATE_FRAMES, axis=0)[::WINDOW_STEP_FRAMES].transpose(0, 2, 1)
+    # Cepstral mean normalization per window, matching how templates were normalized
+    candidates = candidates - candidates.mean(axis=1, keepdims=True)
+
+    thresholds = library['thresholds']
+    bounds = lb_keogh(candidates[:, None], library['upper'][None], library['lower'][None])
+    window_index, template_index = np.nonzero(bounds <= thresholds[None, :])
+    if not len(window_index):
+        return []
+
+    candidate_upper, candidate_lower = envelope(candidates)
+    reverse_bounds = lb_keogh(
+        library['templates'][template_index], candidate_upper[window_index], candidate_lower[window_index]
+    )
+    survivors = reverse_bounds <= thresholds[template_index]
+    window_index, template_index = window_index[survivors], template_index[survivors]
+    if not len(window_index):
+        return []
+
+    distances = banded_dtw(
+        np.ascontiguousarray(candidates[window_index]),
+        library['templates'][template_index]
+    )
+    is_match = distances <= thresholds[template_index]
+
+    best = {}
+    for window, template, distance in zip(window_index[is_match], template_index[is_match], distances[is_match]):
+        label = library['labels'][template]
+        if label not in best or distance < best[label]['distance']:
+            best[label] = {
+                'keyword': label,
+                'distance': float(distance),
+                'start_frame': int(window * WINDOW_STEP_FRAMES)
+            }
+    return sorted(best.values(), key=lambda match: match['distance'])
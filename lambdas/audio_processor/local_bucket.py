@@ -0,0 +1,140 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import uuid
+from urllib.parse import parse_qs, quote_plus, urlencode, urlparse
+
+from botocore.exceptions import ClientError
+
+LOCAL_URL_SCHEME = 'local-s3'
+
+
+def _client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class LocalDirectoryS3:
+    """
+    Directory-backed stand-in for the part of the boto3 S3 client used by the audio
+    upload flow, so presigned multipart uploads and S3-triggered processing run offline.
+    Set AUDIO_LOCAL_BUCKET_DIR to use it. Objects live at <root>/<bucket>/<key> with their
+    metadata in a .metadata.json sibling; in-progress parts under <root>/.multipart/<id>/.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, '.multipart'), exist_ok=True)
+
+    def _object_path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, '.multipart', upload_id)
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        path = self._object_path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body)
+        with open(path + '.metadata.json', 'w') as f:
+            json.dump(Metadata or {}, f)
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        path = self._object_path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _client_error('NoSuchKey', f'{Key} does not exist', 'GetObject')
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        if Range:
+            first, last = Range[len('bytes='):].split('-')
+            start, end = int(first), min(int(last), size - 1)
+            if start >= size:
+                raise _client_error('InvalidRange', 'The requested range is not satisfiable', 'GetObject')
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        with open(path + '.metadata.json') as f:
+            metadata = json.load(f)
+        return {
+            'Body': io.BytesIO(data),
+            'ContentLength': len(data),
+            'ContentRange': f'bytes {start}-{end}/{size}',
+            'Metadata': metadata
+        }
+
+    def delete_object(self, Bucket, Key):
+        path = self._object_path(Bucket, Key)
+        for stale in (path, path + '.metadata.json'):
+            if os.path.exists(stale):
+                os.remove(stale)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, Metadata=None, **kwargs):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        with open(os.path.join(self._upload_dir(upload_id), 'upload.json'), 'w') as f:
+            json.dump({'bucket': Bucket, 'key': Key, 'metadata': Metadata or {}}, f)
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        if ClientMethod != 'upload_part':
+            raise NotImplementedError(f'LocalDirectoryS3 only presigns upload_part, not {ClientMethod}')
+        query = urlencode({'uploadId': Params['UploadId'], 'partNumber': Params['PartNumber']})
+        return f"{LOCAL_URL_SCHEME}://{Params['Bucket']}/{Params['Key']}?{query}"
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        upload_dir = self._upload_dir(UploadId)
+        if not os.path.isdir(upload_dir):
+            raise _client_error('NoSuchUpload', f'Upload {UploadId} does not exist', 'UploadPart')
+        with open(os.path.join(upload_dir, f'{int(PartNumber):05d}.part'), 'wb') as f:
+            f.write(Body)
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def put_presigned_url(self, url, data):
+        """What an HTTP PUT of data to a presigned part URL does; returns the part's ETag."""
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        return self.upload_part(
+            parsed.netloc, parsed.path.lstrip('/'), query['uploadId'][0], int(query['partNumber'][0]), data
+        )['ETag']
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload_dir = self._upload_dir(UploadId)
+        if not os.path.isdir(upload_dir):
+            raise _client_error('NoSuchUpload', f'Upload {UploadId} does not exist', 'CompleteMultipartUpload')
+        with open(os.path.join(upload_dir, 'upload.json')) as f:
+            upload = json.load(f)
+        body = bytearray()
+        for part in MultipartUpload['Parts']:
+            part_path = os.path.join(upload_dir, f"{part['PartNumber']:05d}.part")
+            if not os.path.exists(part_path):
+                raise _client_error('InvalidPart', f"Part {part['PartNumber']} was not uploaded", 'CompleteMultipartUpload')
+            with open(part_path, 'rb') as f:
+                data = f.read()
+            if f'"{hashlib.md5(data).hexdigest()}"' != part['ETag']:
+                raise _client_error('InvalidPart', f"ETag mismatch for part {part['PartNumber']}", 'CompleteMultipartUpload')
+            body += data
+        result = self.put_object(Bucket, Key, bytes(body), upload['metadata'])
+        shutil.rmtree(upload_dir)
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': result['ETag']}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
+
+
+def object_created_event(bucket, key, size=0):
+    """The S3 ObjectCreated notification Lambda receives for key (keys arrive URL-encoded)."""
+    return {
+        'Records': [{
+            'eventSource': 'aws:s3',
+            'eventName': 'ObjectCreated:CompleteMultipartUpload',
+            's3': {
+                'bucket': {'name': bucket},
+                'object': {'key': quote_plus(key), 'size': size}
+            }
+        }]
+    }
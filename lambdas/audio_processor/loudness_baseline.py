@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+import numpy as np
+
+BASELINE_STATE_KEY = 'audio_loudness_baseline'
+
+
+def read_loudness_baseline(table, user_id, min_samples, min_std):
+    """
+    Returns the user's loudness baseline as (mean, std), or None while it has fewer than
+    min_samples levels.
+
+    The baseline is kept as sufficient statistics (count, sum, sum of squares). DynamoDB
+    numbers are 38-digit decimals, so the sums do not suffer the floating-point
+    cancellation that Welford's update exists to avoid.
+    """
+    response = table.get_item(Key={'user_id': user_id, 'state_key': BASELINE_STATE_KEY})
+    item = response.get('Item', {})
+    count = int(item.get('sample_count', 0))
+    if count < min_samples:
+        return None
+
+    mean = item['level_sum'] / count
+    variance = max(item['level_sq_sum'] / count - mean * mean, Decimal(0))
+    return float(mean), max(float(variance.sqrt()), min_std)
+
+
+def add_loudness_levels(table, user_id, levels):
+    """
+    Folds loudness levels into the user's baseline with a single atomic ADD. The ADD is
+    not idempotent, so callers make it once per request, after the request has succeeded.
+    """
+    levels = np.asarray(levels, dtype=np.float64)
+    table.update_item(
+        Key={'user_id': user_id, 'state_key': BASELINE_STATE_KEY},
+        UpdateExpression='ADD sample_count :count, level_sum :sum, level_sq_sum :sq_sum',
+        ExpressionAttributeValues={
+            ':count': len(levels),
+            ':sum': Decimal(str(float(levels.sum()))),
+            ':sq_sum': Decimal(str(float(np.dot(levels, levels))))
+        }
+    )
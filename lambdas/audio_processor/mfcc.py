@@ -0,0 +1,118 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import numpy as np
+
+from audio_features import FEATURE_BLOCK_FRAMES, FRAME_LENGTH, HOP_LENGTH, frame_signal, get_window
+from resample import CANONICAL_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 26 bands is the usual choice for 8 kHz speech; with 40 the lowest filters span only 2-3 FFT bins
+N_MELS = 26
+N_MFCC = 13
+MEL_FMIN_HZ = 20.0
+
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_disabled = False
+
+
+def hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+@lru_cache(maxsize=8)
+def get_mel_filterbank(sample_rate, n_fft, n_mels):
+    """(n_fft // 2 + 1, n_mels) triangular HTK-mel filterbank, built once per configuration."""
+    fft_freqs = np.fft.rfftfreq(n_fft, d=1.0 / sample_rate)
+    mel_points = np.linspace(hz_to_mel(MEL_FMIN_HZ), hz_to_mel(sample_rate / 2.0), n_mels + 2)
+    hz_points = mel_to_hz(mel_points)
+    lower, center, upper = hz_points[:-2, None], hz_points[1:-1, None], hz_points[2:, None]
+    rising = (fft_freqs - lower) / (center - lower)
+    falling = (upper - fft_freqs) / (upper - center)
+    filterbank = np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+    filterbank.setflags(write=False)
+    return filterbank
+
+
+@lru_cache(maxsize=8)
+def get_dct_matrix(n_mels, n_mfcc):
+    """(n_mels, n_mfcc) orthonormal DCT-II matrix."""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)
+    dct = np.cos(np.pi / n_mels * (n[:, None] + 0.5) * k[None, :]) * np.sqrt(2.0 / n_mels)
+    dct[:, 0] /= np.sqrt(2.0)
+    dct = dct.astype(np.float32)
+    dct.setflags(write=False)
+    return dct
+
+
+def compute_mfcc(samples, sample_rate=CANONICAL_SAMPLE_RATE, n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH,
+                 n_mels=N_MELS, n_mfcc=N_MFCC):
+    """
+    (n_frames, n_mfcc) MFCCs over strided frame views of the int16 samples.
+    Frames are converted and transformed FEATURE_BLOCK_FRAMES at a time.
+    """
+    frames = frame_signal(samples, n_fft, hop_length)
+    window = get_window(n_fft)
+    filterbank = get_mel_filterbank(sample_rate, n_fft, n_mels)
+    dct = get_dct_matrix(n_mels, n_mfcc)
+
+    mfcc = np.empty((len(frames), n_mfcc), dtype=np.float32)
+    for start in range(0, len(frames), FEATURE_BLOCK_FRAMES):
+        block = frames[start:start + FEATURE_BLOCK_FRAMES].astype(np.float32) / 32768.0
+        block *= window
+        spectrum = np.fft.rfft(block, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        log_mel = np.log(np.maximum(power @ filterbank, 1e-10))
+        mfcc[start:start + FEATURE_BLOCK_FRAMES] = log_mel @ dct
+    return mfcc
+
+
+def _get_process_pool(workers):
+    global _process_pool, _process_pool_workers
+    if _process_pool is None or _process_pool_workers != workers:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+        _process_pool_workers = workers
+    return _process_pool
+
+
+def compute_mfcc_parallel(samples, sample_rate=CANONICAL_SAMPLE_RATE, workers=1, min_samples=0,
+                          n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH, n_mels=N_MELS, n_mfcc=N_MFCC):
+    """
+    Same result as compute_mfcc, optionally split across a process pool for long clips.
+    The clip is cut at frame boundaries with n_fft - hop_length samples of overlap, so
+    the concatenated per-worker output is identical to the single-core result.
+    Lambda has no /dev/shm, so if the pool cannot start this falls back to one core
+    and stops trying for the life of the container.
+    """
+    global _process_pool_disabled
+    n_frames = len(frame_signal(samples, n_fft, hop_length))
+    if workers <= 1 or _process_pool_disabled or len(samples) < min_samples or n_frames < 2 * workers:
+        return compute_mfcc(samples, sample_rate, n_fft, hop_length, n_mels, n_mfcc)
+
+    bounds = np.linspace(0, n_frames, workers + 1).astype(int)
+    pieces = [
+        samples[first * hop_length:(last - 1) * hop_length + n_fft]
+        for first, last in zip(bounds[:-1], bounds[1:])
+    ]
+    try:
+        pool = _get_process_pool(workers)
+        results = pool.map(
+            compute_mfcc, pieces,
+            *([value] * len(pieces) for value in (sample_rate, n_fft, hop_length, n_mels, n_mfcc))
+        )
+        return np.concatenate(list(results))
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        logger.warning(f"Process pool unavailable ({e}); computing MFCCs on a single core")
+        _process_pool_disabled = True
+        return compute_mfcc(samples, sample_rate, n_fft, hop_length, n_mels, n_mfcc)
@@ -0,0 +1,152 @@
+import numpy as np
+
+from audio_features import FEATURE_BLOCK_FRAMES, FRAME_LENGTH, HOP_LENGTH, frame_signal
+from resample import CANONICAL_SAMPLE_RATE
+
+# Pitch search range: low male speech up to screams
+PITCH_MIN_HZ = 75.0
+PITCH_MAX_HZ = 500.0
+# Peak of the normalized autocorrelation above which a frame counts as voiced
+VOICING_THRESHOLD = 0.5
+# The shortest-lag autocorrelation peak within this fraction of the highest wins, which avoids
+# picking a multiple of the period (an octave too low)
+OCTAVE_PEAK_RATIO = 0.85
+# Frames quieter than this are never voiced (dBFS)
+VOICING_FLOOR_DB = -45.0
+# Below this many voiced frames (~0.3 s) there is too little speech to judge; the caller falls back
+PROSODY_MIN_VOICED_FRAMES = 20
+# Syllable nuclei are energy peaks at least this many frames apart (~80 ms)
+SYLLABLE_MIN_GAP_FRAMES = 5
+
+# Arousal cue ranges mapped onto 0..1 (value at 0, value at 1)
+AROUSAL_PITCH_HZ = (200.0, 400.0)
+AROUSAL_PITCH_STD_SEMITONES = (1.0, 6.0)
+AROUSAL_ENERGY_DB = (-30.0, -10.0)
+AROUSAL_SPEECH_RATE = (3.0, 7.0)
+AROUSAL_WEIGHTS = (0.3, 0.25, 0.3, 0.15)
+# Mean semitone jump between consecutive voiced frames that counts as fully irregular
+IRREGULAR_PITCH_JUMP_SEMITONES = 2.0
+# Arousal above this pulls valence down one for one: raised voices at a steady pitch are
+# anger far more often than joy, so only melody can keep them from reading as distress
+AROUSAL_NEGATIVE_LEAN_FROM = 0.35
+
+
+def _scale(value, bounds):
+    low, high = bounds
+    return float(np.clip((value - low) / (high - low), 0.0, 1.0))
+
+
+def frame_pitch(samples, sample_rate=CANONICAL_SAMPLE_RATE, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH):
+    """
+    Per-frame fundamental frequency by autocorrelation, computed for blocks of frames at once
+    as the inverse FFT of the power spectrum. Returns (f0_hz, voicing, energy_db); f0 is 0 for
+    unvoiced frames. The autocorrelation is unbiased (divided by the overlap at each lag) so
+    long lags are not penalized; the period is the shortest-lag local maximum close to the
+    highest one, refined by parabolic interpolation.
+    """
+    frames = frame_signal(samples, frame_length, hop_length)
+    n_frames = len(frames)
+    min_lag = int(sample_rate // PITCH_MAX_HZ)
+    max_lag = min(int(np.ceil(sample_rate / PITCH_MIN_HZ)), frame_length - 2)
+    overlap = (frame_length - np.arange(max_lag + 2)) / frame_length
+
+    f0 = np.zeros(n_frames, dtype=np.float32)
+    voicing = np.zeros(n_frames, dtype=np.float32)
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, FEATURE_BLOCK_FRAMES):
+        block_slice = slice(start, start + FEATURE_BLOCK_FRAMES)
+        block = frames[block_slice].astype(np.float32) / 32768.0
+        block -= block.mean(axis=1, keepdims=True)
+
+        spectrum = np.fft.rfft(block, n=2 * frame_length, axis=1)
+        acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, axis=1)[:, :max_lag + 2] / overlap
+        zero_lag = acf[:, 0]
+        energy_db[block_slice] = 10.0 * np.log10(np.maximum(zero_lag / frame_length, 1e-12))
+        normalized = acf / np.maximum(zero_lag, 1e-12)[:, None]
+
+        search = normalized[:, min_lag:max_lag + 1]
+        is_local_max = (search >= normalized[:, min_lag - 1:max_lag]) & (search >= normalized[:, min_lag + 1:max_lag + 2])
+        candidates = is_local_max & (search >= OCTAVE_PEAK_RATIO * search.max(axis=1, keepdims=True))
+        # Frames without any local maximum fall back to the global one
+        lags = min_lag + np.where(candidates.any(axis=1), np.argmax(candidates, axis=1), np.argmax(search, axis=1))
+        rows = np.arange(len(block))
+        peak = normalized[rows, lags]
+        left, right = normalized[rows, lags - 1], normalized[rows, lags + 1]
+        curvature = left - 2.0 * peak + right
+        offset = np.where(curvature < 0, 0.5 * (left - right) / np.where(curvature < 0, curvature, -1.0), 0.0)
+
+        voiced = (peak > VOICING_THRESHOLD) & (energy_db[block_slice] > VOICING_FLOOR_DB)
+        voicing[block_slice] = peak
+        f0[block_slice] = np.where(voiced, sample_rate / (lags + offset), 0.0)
+    return f0, voicing, energy_db
+
+
+def count_syllable_nuclei(energy_db, voiced):
+    """Local energy maxima within voiced stretches, at least SYLLABLE_MIN_GAP_FRAMES apart."""
+    if len(energy_db) < 3:
+        return 0
+    is_peak = np.zeros(len(energy_db), dtype=bool)
+    is_peak[1:-1] = (energy_db[1:-1] > energy_db[:-2]) & (energy_db[1:-1] >= energy_db[2:])
+    peaks = np.flatnonzero(is_peak & voiced)
+    if not len(peaks):
+        return 0
+    # Greedy left-to-right minimum spacing; the loop is over peaks, not samples
+    count, last = 1, peaks[0]
+    for peak in peaks[1:]:
+        if peak - last >= SYLLABLE_MIN_GAP_FRAMES:
+            count += 1
+            last = peak
+    return count
+
+
+def estimate_prosody(samples, sample_rate=CANONICAL_SAMPLE_RATE):
+    """
+    Deterministic prosody features and an arousal/valence estimate for one voice-active clip.
+    Arousal combines pitch level, pitch variability, loudness and speech rate. Valence is
+    arousal times the difference between melody and irregularity: wide, smooth pitch movement
+    (lively or happy speech) pushes it up, frame-to-frame pitch instability (screams, crying,
+    a strained voice) pushes it down. Arousal beyond AROUSAL_NEGATIVE_LEAN_FROM is then
+    subtracted, so high-arousal speech leans negative unless its melody outweighs that; a
+    missed distress clip costs more than a false alarm. Valence lies in -1..1. Returns None
+    when the clip has too little voiced speech to judge.
+    """
+    f0, _, energy_db = frame_pitch(samples, sample_rate)
+    voiced = f0 > 0
+    n_voiced = int(np.count_nonzero(voiced))
+    if n_voiced < PROSODY_MIN_VOICED_FRAMES:
+        return None
+
+    semitones = 12.0 * np.log2(f0[voiced] / 100.0)
+    voiced_energy_db = energy_db[voiced]
+    active_seconds = n_voiced * HOP_LENGTH / sample_rate
+    speech_rate = count_syllable_nuclei(energy_db, voiced) / active_seconds
+    # Jumps only between adjacent voiced frames, so pauses between words do not count
+    adjacent = voiced[1:] & voiced[:-1]
+    jumps = np.abs(np.diff(12.0 * np.log2(np.maximum(f0, 1.0) / 100.0)))[adjacent]
+    irregularity = _scale(float(jumps.mean()) if len(jumps) else 0.0, (0.0, IRREGULAR_PITCH_JUMP_SEMITONES))
+
+    pitch_hz = float(100.0 * 2.0 ** (np.median(semitones) / 12.0))
+    pitch_std = float(semitones.std())
+    energy_mean = float(voiced_energy_db.mean())
+    cues = (
+        _scale(pitch_hz, AROUSAL_PITCH_HZ),
+        _scale(pitch_std, AROUSAL_PITCH_STD_SEMITONES),
+        _scale(energy_mean, AROUSAL_ENERGY_DB),
+        _scale(speech_rate, AROUSAL_SPEECH_RATE)
+    )
+    arousal = float(np.dot(AROUSAL_WEIGHTS, cues))
+    # Pitch spread only counts as melody when it glides rather than jumps
+    melody = cues[1] * (1.0 - irregularity)
+    valence = arousal * (melody - irregularity) - max(0.0, arousal - AROUSAL_NEGATIVE_LEAN_FROM)
+    valence = float(np.clip(valence, -1.0, 1.0))
+    return {
+        'pitch_hz': pitch_hz,
+        'pitch_std_semitones': pitch_std,
+        'pitch_irregularity': irregularity,
+        'voiced_fraction': n_voiced / len(f0),
+        'speech_rate': speech_rate,
+        'energy_db_mean': energy_mean,
+        'energy_db_std': float(voiced_energy_db.std()),
+        'arousal': arousal,
+        'valence': valence
+    }
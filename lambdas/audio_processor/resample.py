@@ -0,0 +1,159 @@
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Every clip is analysed at this rate: speech, shouts and screams sit below 4 kHz
+CANONICAL_SAMPLE_RATE = 8000
+# Client rates we resample from. The filter length grows with the rate ratio, so an
+# arbitrary rate (a large prime, say) would cost seconds and gigabytes to build
+SUPPORTED_SAMPLE_RATES = (8000, 11025, 16000, 22050, 32000, 44100, 48000)
+SUPPORTED_CHANNELS = (1, 2)
+
+# Filter taps per phase on each side of the centre, relative to the slower of the two rates
+RESAMPLE_HALF_TAPS = 8
+RESAMPLE_KAISER_BETA = 6.0
+# Output samples per vectorized block; bounds the gathered input windows to a few MB
+RESAMPLE_BLOCK_SAMPLES = 16384
+
+
+@lru_cache(maxsize=8)
+def get_polyphase_filter(up, down, half_taps=RESAMPLE_HALF_TAPS):
+    """
+    Kaiser-windowed sinc low-pass for upsampling by `up` and decimating by `down`,
+    split into `up` phases. Returns (up, taps_per_phase) with each phase's taps reversed,
+    so a phase is applied as a dot product with an ascending window of input samples.
+    """
+    taps_per_phase = 2 * half_taps * -(-max(up, down) // up)
+    n_taps = taps_per_phase * up
+    cutoff = 1.0 / max(up, down)
+    # Centred on tap n_taps // 2 so the group delay is a whole number of upsampled samples
+    n = np.arange(n_taps) - n_taps // 2
+    window = np.i0(RESAMPLE_KAISER_BETA * np.sqrt(1.0 - (n / (n_taps // 2 + 1)) ** 2)) / np.i0(RESAMPLE_KAISER_BETA)
+    taps = up * cutoff * np.sinc(cutoff * n) * window
+    phases = taps.reshape(taps_per_phase, up).T[:, ::-1].astype(np.float32)
+    phases = np.ascontiguousarray(phases)
+    phases.setflags(write=False)
+    return phases
+
+
+def downmix(samples, channels):
+    """Averages interleaved int16 channels into one."""
+    if channels <= 1:
+        return samples
+    usable = len(samples) - len(samples) % channels
+    return samples[:usable].reshape(-1, channels).mean(axis=1).astype('<i2')
+
+
+def _rate_ratio(sample_rate, target_rate):
+    if sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise ValueError(f'Unsupported sample rate {sample_rate}')
+    divisor = gcd(sample_rate, target_rate)
+    return target_rate // divisor, sample_rate // divisor
+
+
+def _polyphase_outputs(source, source_start, first_output, n_outputs, up, down, phases):
+    """
+    Output samples first_output .. first_output + n_outputs - 1 of the resampled signal.
+    `source` holds input samples from index source_start on (negative for left padding) and
+    must cover every output's window. Output n is the dot product of phase
+    (n * down + delay) % up with the input window ending at (n * down + delay) // up.
+    Outputs n, n + up, n + 2 * up, ... share a phase and their windows are `down` samples
+    apart, so each phase is a strided view of the input times one filter, evaluated
+    RESAMPLE_BLOCK_SAMPLES outputs at a time.
+    """
+    if n_outputs <= 0:
+        return np.zeros(0, dtype='<i2')
+    taps_per_phase = phases.shape[1]
+    delay = phases.size // 2
+    windows = sliding_window_view(source, taps_per_phase)
+
+    output = np.empty(n_outputs, dtype='<i2')
+    for offset in range(min(up, n_outputs)):
+        position = (first_output + offset) * down + delay
+        phase_windows = windows[position // up - taps_per_phase + 1 - source_start::down]
+        phase_filter = phases[position % up]
+        phase_outputs = output[offset::up]
+        for start in range(0, len(phase_outputs), RESAMPLE_BLOCK_SAMPLES):
+            values = phase_windows[start:start + min(RESAMPLE_BLOCK_SAMPLES, len(phase_outputs) - start)].astype(np.float32) @ phase_filter
+            phase_outputs[start:start + len(values)] = np.clip(np.rint(values), -32768, 32767)
+    return output
+
+
+def resample_pcm16(samples, sample_rate, target_rate=CANONICAL_SAMPLE_RATE):
+    """
+    Polyphase rational resampling of int16 samples. Output sample n is one dot product
+    between its phase's filter and a window of the original samples, so the upsampled
+    signal is never materialized.
+    """
+    up, down = _rate_ratio(sample_rate, target_rate)
+    if sample_rate == target_rate or not len(samples):
+        return samples
+    phases = get_polyphase_filter(up, down)
+    taps_per_phase = phases.shape[1]
+    delay = phases.size // 2
+
+    n_out = -(-len(samples) * up // down)
+    # Zero padding on both sides so every output's window lies inside the padded input
+    last_window_end = ((n_out - 1) * down + delay) // up
+    padded = np.pad(samples, (taps_per_phase - 1, max(0, last_window_end - len(samples) + 1)))
+    return _polyphase_outputs(padded, -(taps_per_phase - 1), 0, n_out, up, down, phases)
+
+
+class StreamingResampler:
+    """
+    resample_pcm16 for a signal that arrives in pieces, such as the ranges of an uploaded
+    object. Each push returns the outputs whose input windows are complete and keeps the
+    input the next outputs still need, so the concatenated outputs of push and flush
+    match resampling the whole signal at once, with no edge artifacts at piece boundaries.
+    """
+
+    def __init__(self, sample_rate, target_rate=CANONICAL_SAMPLE_RATE):
+        self.up, self.down = _rate_ratio(sample_rate, target_rate)
+        self.passthrough = sample_rate == target_rate
+        self.phases = get_polyphase_filter(self.up, self.down)
+        self.delay = self.phases.size // 2
+        taps_per_phase = self.phases.shape[1]
+        # Retained input, starting at input index history_start (the zero left padding at first)
+        self.history = np.zeros(taps_per_phase - 1, dtype='<i2')
+        self.history_start = -(taps_per_phase - 1)
+        self.received = 0
+        self.emitted = 0
+
+    def _emit(self, source, n_ready):
+        output = _polyphase_outputs(
+            source, self.history_start, self.emitted, n_ready - self.emitted, self.up, self.down, self.phases
+        )
+        self.emitted = n_ready
+        keep_from = (self.emitted * self.down + self.delay) // self.up - self.phases.shape[1] + 1
+        self.history = np.array(source[max(0, keep_from - self.history_start):], dtype='<i2')
+        self.history_start = max(keep_from, self.history_start)
+        return output
+
+    def push(self, samples):
+        if self.passthrough:
+            return samples
+        source = np.concatenate((self.history, samples))
+        self.received += len(samples)
+        # Outputs whose window ends before the last received sample: n * down + delay < received * up
+        n_ready = max(self.emitted, -(-(self.received * self.up - self.delay) // self.down))
+        return self._emit(source, n_ready)
+
+    def flush(self):
+        """The remaining outputs, with the zero right padding resample_pcm16 applies."""
+        n_total = -(-self.received * self.up // self.down)
+        if self.passthrough or n_total <= self.emitted:
+            return np.zeros(0, dtype='<i2')
+        last_window_end = ((n_total - 1) * self.down + self.delay) // self.up
+        padding = max(0, last_window_end - (self.history_start + len(self.history)) + 1)
+        return self._emit(np.pad(self.history, (0, padding)), n_total)
+
+
+def to_canonical(samples, sample_rate, channels=1):
+    """Mono int16 at CANONICAL_SAMPLE_RATE, whatever the client recorded."""
+    return resample_pcm16(downmix(samples, channels), sample_rate)
+
+
+# Build the filter for the default client rate at import
+get_polyphase_filter(1, 2)
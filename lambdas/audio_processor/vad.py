@@ -0,0 +1,51 @@
+import numpy as np
+
+from audio_features import HOP_LENGTH
+
+# A block is active when it is above an absolute floor and clearly above the clip's own noise floor
+VAD_ABSOLUTE_FLOOR_DB = -50.0
+VAD_NOISE_MARGIN_DB = 6.0
+VAD_NOISE_FLOOR_PERCENTILE = 10
+# Mains hum and rumble cross zero far less often than speech; 2 * 80 Hz crossings per second
+VAD_MIN_CROSSING_HZ = 160.0
+# Activity must last this many consecutive blocks (~48 ms) to count, which rejects clicks and hum glitches
+VAD_MIN_ACTIVE_BLOCKS = 3
+# Blocks kept on each side of active speech so onsets and tails are not clipped
+VAD_HANGOVER_BLOCKS = 2
+
+
+def voice_activity_mask(samples, sample_rate, block_length=HOP_LENGTH):
+    """
+    Energy/zero-crossing voice activity detection over non-overlapping blocks.
+    Returns a boolean array with one entry per block (a trailing partial block is ignored).
+    """
+    n_blocks = len(samples) // block_length
+    if n_blocks == 0:
+        return np.zeros(0, dtype=bool)
+    blocks = samples[:n_blocks * block_length].reshape(n_blocks, block_length).astype(np.float32) / 32768.0
+
+    energy_db = 10.0 * np.log10(np.maximum(np.einsum('ij,ij->i', blocks, blocks) / block_length, 1e-12))
+    noise_floor_db = np.percentile(energy_db, VAD_NOISE_FLOOR_PERCENTILE)
+    signs = np.signbit(blocks)
+    crossings_per_second = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) * (sample_rate / block_length)
+
+    active = (
+        (energy_db > VAD_ABSOLUTE_FLOOR_DB) &
+        ((energy_db > noise_floor_db + VAD_NOISE_MARGIN_DB) | (noise_floor_db > VAD_ABSOLUTE_FLOOR_DB + VAD_NOISE_MARGIN_DB)) &
+        (crossings_per_second >= VAD_MIN_CROSSING_HZ)
+    )
+
+    if not active.any():
+        return active
+
+    # Morphological opening: keep only runs of at least VAD_MIN_ACTIVE_BLOCKS, then dilate
+    # by the hangover as well so short pauses inside speech are kept
+    run_starts = np.convolve(active, np.ones(VAD_MIN_ACTIVE_BLOCKS), mode='valid') == VAD_MIN_ACTIVE_BLOCKS
+    kernel = np.ones(VAD_MIN_ACTIVE_BLOCKS + 2 * VAD_HANGOVER_BLOCKS)
+    return np.convolve(run_starts, kernel, mode='full')[VAD_HANGOVER_BLOCKS:VAD_HANGOVER_BLOCKS + n_blocks] > 0
+
+
+def drop_silent_blocks(samples, active, block_length=HOP_LENGTH):
+    """Returns only the samples of active blocks, concatenated in order."""
+    n_blocks = len(active)
+    return samples[:n_blocks * block_length].reshape(n_blocks, block_length)[active].ravel()
@@ -4,6 +4,11 @@ import logging
 from datetime import datetime
 import os
 
+import numpy as np
+
+from safe_logging import log_payload
+from track_simplify import simplify_track, track_error_meters, track_to_attribute
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -11,10 +16,15 @@ dynamodb = boto3.resource('dynamodb')
 sns = boto3.client('sns')
 s3 = boto3.client('s3')
 
+# Evidence trails keep only the fixes needed to rebuild the recent path within this error
+EVIDENCE_TRACK_TOLERANCE_METERS = float(os.environ.get('EVIDENCE_TRACK_TOLERANCE_METERS', '10'))
+
 def lambda_handler(event, context):
     """
     Enhanced emergency response handler with better error handling and location intelligence
     """
+    log_payload(logger, "Received event", event)
+
     try:
         # Enhanced input validation
         if 'body' in event:
@@ -151,13 +161,14 @@ def execute_emergency_response(user_id, risk_assessment, emergency_contacts, pre
             actions_taken.append("No emergency contacts configured")
         
         # 2. Start evidence collection
-        evidence_id = start_evidence_collection(user_id, risk_assessment, current_location)
+        location_trail = get_location_trail(user_id)
+        evidence_id = start_evidence_collection(user_id, risk_assessment, current_location, location_trail)
         if evidence_id:
             actions_taken.append(f"Evidence collection started: {evidence_id}")
         
         # 3. Enable location tracking if preferences allow
         if preferences.get('emergency_location_sharing', True):
-            tracking_result = enable_location_tracking(user_id, current_location)
+            tracking_result = enable_location_tracking(user_id, current_location, location_trail)
             if tracking_result:
                 actions_taken.append("Enhanced location tracking enabled")
         
@@ -272,7 +283,35 @@ def send_sns_notification(user_id, risk_assessment, current_location):
         logger.error(f"Error sending SNS notification: {str(e)}")
         return False
 
-def start_evidence_collection(user_id, risk_assessment, current_location):
+def get_location_trail(user_id):
+    """
+    The user's recent fixes from the Motion Analyzer's state (a ring of time, latitude,
+    longitude rows), simplified with Douglas-Peucker. Returns a DynamoDB list of
+    [epoch, latitude, longitude], empty when there is no motion state.
+    """
+    try:
+        user_state_table_name = os.environ.get('USER_STATE_TABLE_NAME', 'SafeSakhi-UserState')
+        user_state_table = dynamodb.Table(user_state_table_name)
+
+        response = user_state_table.get_item(Key={'user_id': user_id, 'state_key': 'motion'})
+        item = response.get('Item')
+        if not item or not item.get('track_count'):
+            return []
+
+        # Oldest fix first: once the ring is full, the oldest is at the write head
+        ring = np.frombuffer(bytes(item['track'].value), dtype=np.float64).reshape(-1, 3)
+        count, head = int(item['track_count']), int(item['track_head'])
+        track = ring[:count] if count < len(ring) else np.roll(ring, -head, axis=0)
+
+        kept = simplify_track(track, EVIDENCE_TRACK_TOLERANCE_METERS)
+        logger.info(f"Location trail for user {user_id}: kept {len(kept)} of {len(track)} fixes, max error {track_error_meters(track, kept):.1f} m")
+        return track_to_attribute(track[kept])
+
+    except Exception as e:
+        logger.error(f"Error reading location trail: {str(e)}")
+        return []
+
+def start_evidence_collection(user_id, risk_assessment, current_location, location_trail=None):
     """Start collecting evidence"""
     try:
         evidence_id = f"{user_id}-{int(datetime.now().timestamp())}-emergency"
@@ -288,6 +327,7 @@ def start_evidence_collection(user_id, risk_assessment, current_location):
                 'evidence_type': 'emergency_context',
                 'risk_assessment': risk_assessment,
                 'current_location': current_location,
+                'location_trail': location_trail or [],
                 'collection_active': True,
                 'created_at': int(datetime.now().timestamp()),
                 'retention_until': int((datetime.now().timestamp() + (90 * 24 * 60 * 60)))  # 90 days
@@ -301,7 +341,7 @@ def start_evidence_collection(user_id, risk_assessment, current_location):
         logger.error(f"Error starting evidence collection: {str(e)}")
         return None
 
-def enable_location_tracking(user_id, current_location):
+def enable_location_tracking(user_id, current_location, location_trail=None):
     """Enable enhanced location tracking"""
     try:
         tracking_table_name = os.environ.get('LOCATION_TRACKING_TABLE_NAME', 'SafeSakhi-LocationTracking')
@@ -314,6 +354,7 @@ def enable_location_tracking(user_id, current_location):
                 'tracking_enabled': True,
                 'emergency_mode': True,
                 'current_location': current_location,
+                'location_trail': location_trail or [],
                 'started_at': int(datetime.now().timestamp()),
                 'update_interval': 30,  # seconds
                 'high_accuracy': True
@@ -0,0 +1,76 @@
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'activity_model.npy')
+
+ACTIVITY_CLASSES = ('still', 'walking', 'running', 'vehicle', 'struggling')
+
+# Window features the model reads, from motion_features.extract_motion_features. Scale-free
+# ratios are used as they are; magnitudes spanning decades are log-transformed
+ACTIVITY_FEATURES = (
+    'motion_activity', 'acceleration_variance', 'jerk_p95', 'rotation_p95',
+    'gait_band_ratio', 'agitation_band_ratio', 'peak_rate'
+)
+LOG_FEATURES = frozenset({'motion_activity', 'acceleration_variance', 'jerk_p95', 'rotation_p95'})
+LOG_FLOOR = 1e-4
+
+
+def feature_matrix(features_list):
+    """(windows, len(ACTIVITY_FEATURES)) float32 model input from a list of feature dicts."""
+    matrix = np.array([[features[name] for name in ACTIVITY_FEATURES] for features in features_list], dtype=np.float32).reshape(-1, len(ACTIVITY_FEATURES))
+    for column, name in enumerate(ACTIVITY_FEATURES):
+        if name in LOG_FEATURES:
+            matrix[:, column] = np.log(np.maximum(matrix[:, column], LOG_FLOOR))
+    return matrix
+
+
+def save_activity_model(path, mean, scale, weights, bias):
+    """
+    Writes a multinomial logistic model as one float32 array, so it can be memory-mapped:
+    row 0 the feature means, row 1 the feature scales (both with a trailing 0 pad), then one
+    row of weights and bias per class in ACTIVITY_CLASSES order.
+    """
+    n_features = len(ACTIVITY_FEATURES)
+    packed = np.zeros((2 + len(ACTIVITY_CLASSES), n_features + 1), dtype=np.float32)
+    packed[0, :n_features] = mean
+    packed[1, :n_features] = scale
+    packed[2:, :n_features] = weights
+    packed[2:, n_features] = bias
+    np.save(path, packed)
+
+
+@lru_cache(maxsize=4)
+def load_activity_model(path=DEFAULT_MODEL_PATH):
+    """
+    Memory-maps the model once per container; pages are read on first use rather than at
+    import. Returns None when no model is deployed or its shape does not match the classes
+    and features above.
+    """
+    if not os.path.exists(path):
+        logger.warning(f"No activity model at {path}; activity classification disabled")
+        return None
+    packed = np.load(path, mmap_mode='r')
+    if packed.shape != (2 + len(ACTIVITY_CLASSES), len(ACTIVITY_FEATURES) + 1):
+        logger.error(f"Activity model at {path} has shape {packed.shape}; activity classification disabled")
+        return None
+    return packed
+
+
+def classify_activity(features_list, model):
+    """
+    Activity probabilities for a batch of windows in one pass: standardize, one matrix
+    product, softmax. Returns (labels, probabilities) with probabilities shaped
+    (windows, len(ACTIVITY_CLASSES)).
+    """
+    n_features = len(ACTIVITY_FEATURES)
+    standardized = (feature_matrix(features_list) - model[0, :n_features]) / model[1, :n_features]
+    logits = standardized @ model[2:, :n_features].T + model[2:, n_features]
+    logits -= logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(logits)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    return [ACTIVITY_CLASSES[index] for index in probabilities.argmax(axis=1)], probabilities
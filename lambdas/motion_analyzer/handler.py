@@ -1,9 +1,39 @@
 import json
 import os
+import binascii
 import boto3
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime
 from decimal import Decimal
+import numpy as np
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from dynamo_utils import batch_put_items
+from geofence import SafeZoneCache, SafeZoneIndex
+from safe_logging import log_payload
+from sampling import SAMPLING_ACTIVE, SAMPLING_ESCALATED, SAMPLING_IDLE, SamplingPolicy
+from track_simplify import simplify_track
+
+from motion_features import decode_sensor_window, extract_motion_features, window_signals
+from motion_state import (
+    MOTION_STATE_KEY,
+    PHASE_IDLE,
+    advance_activity,
+    advance_fall_detector,
+    advance_off_route,
+    advance_stationary,
+    copy_motion_state,
+    motion_state_from_item,
+    motion_state_to_item,
+    new_motion_state
+)
+from activity import DEFAULT_MODEL_PATH, classify_activity, load_activity_model
+from location_filter import advance_location_filter
+from route_index import RouteIndex
+from trajectory import analyze_trajectory, append_fix, ordered_track
 
 # Configure logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
@@ -18,6 +48,10 @@ lambda_client = boto3.client('lambda')
 # DynamoDB Table Name from Environment Variable
 MOTION_ANALYSIS_TABLE_NAME = os.environ.get('MOTION_ANALYSIS_TABLE_NAME')
 motion_analysis_table = dynamodb.Table(MOTION_ANALYSIS_TABLE_NAME)
+USER_STATE_TABLE_NAME = os.environ.get('USER_STATE_TABLE_NAME')
+user_state_table = dynamodb.Table(USER_STATE_TABLE_NAME)
+USERS_TABLE_NAME = os.environ.get('USERS_TABLE_NAME')
+users_table = dynamodb.Table(USERS_TABLE_NAME)
 
 # Risk Assessment Lambda Name
 RISK_ASSESSMENT_LAMBDA_NAME = os.environ.get('RISK_ASSESSMENT_LAMBDA_NAME')
@@ -27,6 +61,101 @@ THREAT_SCORE_TRIGGER_THRESHOLD = float(os.environ.get('THREAT_SCORE_TRIGGER_THRE
 MOTION_ACTIVITY_THRESHOLD = float(os.environ.get('MOTION_ACTIVITY_THRESHOLD', '0.1'))
 LOCATION_STATIONARY_THRESHOLD_METERS = float(os.environ.get('LOCATION_STATIONARY_THRESHOLD_METERS', '50'))
 STATIONARY_DURATION_SECONDS = int(os.environ.get('STATIONARY_DURATION_SECONDS', '300'))
+# A still user's smoothed fixes wander by the filter's own uncertainty: the stationary radius
+# also covers this many standard deviations of it, and the clock only restarts after this
+# many consecutive fixes outside the radius
+STATIONARY_UNCERTAINTY_SIGMAS = float(os.environ.get('STATIONARY_UNCERTAINTY_SIGMAS', '3'))
+STATIONARY_DEPARTURE_FIXES = int(os.environ.get('STATIONARY_DEPARTURE_FIXES', '3'))
+
+# Raw sensor windows: (t, ax, ay, az, gx, gy, gz) samples analysed on the server
+MAX_SENSOR_WINDOW_SAMPLES = int(os.environ.get('MAX_SENSOR_WINDOW_SAMPLES', '6000'))
+# Broadband motion above the gait band with fast changes in acceleration looks like a struggle
+STRUGGLE_BAND_RATIO = float(os.environ.get('STRUGGLE_BAND_RATIO', '0.5'))
+STRUGGLE_JERK_THRESHOLD = float(os.environ.get('STRUGGLE_JERK_THRESHOLD', '200'))
+STRUGGLE_BONUS = float(os.environ.get('STRUGGLE_BONUS', '0.3'))
+IMPACT_BONUS = float(os.environ.get('IMPACT_BONUS', '0.2'))
+
+# Activity classification of sensor windows (model deployed with the function)
+ACTIVITY_MODEL_PATH = os.environ.get('ACTIVITY_MODEL_PATH', DEFAULT_MODEL_PATH)
+ACTIVITY_TRANSITION_BONUS = float(os.environ.get('ACTIVITY_TRANSITION_BONUS', '0.3'))
+# A previous window older than this says nothing about a transition
+ACTIVITY_MEMORY_SECONDS = float(os.environ.get('ACTIVITY_MEMORY_SECONDS', '120'))
+# Changes of activity that are out of the ordinary on their own: being driven off on foot,
+# breaking into a run, a struggle starting, or a run stopping dead
+UNEXPECTED_ACTIVITY_TRANSITIONS = frozenset({
+    ('walking', 'vehicle'),
+    ('still', 'running'),
+    ('walking', 'running'),
+    ('running', 'still'),
+    ('still', 'struggling'),
+    ('walking', 'struggling'),
+    ('vehicle', 'struggling')
+})
+
+# Batched readings flushed by phones sampling every few seconds
+MAX_MOTION_BATCH_SIZE = int(os.environ.get('MAX_MOTION_BATCH_SIZE', '100'))
+# Batched rows keep coordinates only for the fixes needed to rebuild the path within this error
+MOTION_TRACK_TOLERANCE_METERS = float(os.environ.get('MOTION_TRACK_TOLERANCE_METERS', '10'))
+
+# Fall and sustained-struggle detection across windows, from the per-user motion state
+FALL_DETECTED_BONUS = float(os.environ.get('FALL_DETECTED_BONUS', '0.6'))
+SUSTAINED_STRUGGLE_BONUS = float(os.environ.get('SUSTAINED_STRUGGLE_BONUS', '0.4'))
+MOTION_STATE_TTL_SECONDS = int(os.environ.get('MOTION_STATE_TTL_SECONDS', '3600'))
+MOTION_STATE_CACHE_SIZE = int(os.environ.get('MOTION_STATE_CACHE_SIZE', '1024'))
+MOTION_STATE_MAX_ATTEMPTS = 3
+
+# Walking pace that suddenly becomes vehicle speed; night is judged in the users' local time
+SPEED_TRANSITION_BONUS = float(os.environ.get('SPEED_TRANSITION_BONUS', '0.2'))
+NIGHT_TRANSITION_BONUS = float(os.environ.get('NIGHT_TRANSITION_BONUS', '0.3'))
+LOCAL_UTC_OFFSET_MINUTES = int(os.environ.get('LOCAL_UTC_OFFSET_MINUTES', '330'))
+NIGHT_START_HOUR = int(os.environ.get('NIGHT_START_HOUR', '20'))
+NIGHT_END_HOUR = int(os.environ.get('NIGHT_END_HOUR', '6'))
+
+# "Walk me home" trips: the expected route is stored under its own sort key, and the score
+# grows with how far beyond the corridor around it the user is and how long they stay off it
+MOTION_ROUTE_PATH = '/motion-route'
+ROUTE_STATE_KEY = 'route'
+MAX_ROUTE_VERTICES = int(os.environ.get('MAX_ROUTE_VERTICES', '10000'))
+ROUTE_MAX_SECONDS = int(os.environ.get('ROUTE_MAX_SECONDS', '14400'))
+ROUTE_CORRIDOR_METERS = float(os.environ.get('ROUTE_CORRIDOR_METERS', '50'))
+ROUTE_DEVIATION_BONUS = float(os.environ.get('ROUTE_DEVIATION_BONUS', '0.3'))
+ROUTE_DEVIATION_FULL_METERS = float(os.environ.get('ROUTE_DEVIATION_FULL_METERS', '500'))
+ROUTE_DWELL_BONUS = float(os.environ.get('ROUTE_DWELL_BONUS', '0.3'))
+ROUTE_DWELL_SECONDS = float(os.environ.get('ROUTE_DWELL_SECONDS', '300'))
+
+# Share of the location-based score (stationary time, poor accuracy, speed transitions)
+# dropped inside the user's safe zones; sensor windows score in full everywhere
+SAFE_ZONE_DISCOUNT = float(os.environ.get('SAFE_ZONE_DISCOUNT', '0.8'))
+# Zones are re-read from the user's profile at most this often per container
+SAFE_ZONE_CACHE_SECONDS = int(os.environ.get('SAFE_ZONE_CACHE_SECONDS', '300'))
+
+# Recommended sampling returned with every response: calm users send a batch every few
+# minutes, escalations (scores over the trigger threshold) a reading every second
+SAMPLING_IDLE_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_IDLE_INTERVAL_SECONDS', '30'))
+SAMPLING_IDLE_BATCH_SIZE = int(os.environ.get('SAMPLING_IDLE_BATCH_SIZE', '6'))
+SAMPLING_ACTIVE_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_ACTIVE_INTERVAL_SECONDS', '5'))
+SAMPLING_ACTIVE_BATCH_SIZE = int(os.environ.get('SAMPLING_ACTIVE_BATCH_SIZE', '6'))
+SAMPLING_ESCALATED_INTERVAL_SECONDS = float(os.environ.get('SAMPLING_ESCALATED_INTERVAL_SECONDS', '1'))
+SAMPLING_ESCALATED_BATCH_SIZE = int(os.environ.get('SAMPLING_ESCALATED_BATCH_SIZE', '2'))
+SAMPLING_ACTIVE_SCORE = float(os.environ.get('SAMPLING_ACTIVE_SCORE', '0.3'))
+SAMPLING_HOLD_SECONDS = float(os.environ.get('SAMPLING_HOLD_SECONDS', '120'))
+
+sampling_policy = SamplingPolicy(
+    {
+        SAMPLING_IDLE: (SAMPLING_IDLE_INTERVAL_SECONDS, min(SAMPLING_IDLE_BATCH_SIZE, MAX_MOTION_BATCH_SIZE)),
+        SAMPLING_ACTIVE: (SAMPLING_ACTIVE_INTERVAL_SECONDS, min(SAMPLING_ACTIVE_BATCH_SIZE, MAX_MOTION_BATCH_SIZE)),
+        SAMPLING_ESCALATED: (SAMPLING_ESCALATED_INTERVAL_SECONDS, min(SAMPLING_ESCALATED_BATCH_SIZE, MAX_MOTION_BATCH_SIZE))
+    },
+    SAMPLING_ACTIVE_SCORE, THREAT_SCORE_TRIGGER_THRESHOLD, SAMPLING_HOLD_SECONDS
+)
+
+# Last state this container read or wrote per user; the version condition catches stale entries
+motion_states = OrderedDict()
+safe_zone_indexes = SafeZoneCache(MOTION_STATE_CACHE_SIZE, SAFE_ZONE_CACHE_SECONDS)
+# Route index per user, with the start time of the trip it was built for
+route_indexes = OrderedDict()
+
+_deserializer = TypeDeserializer()
 
 
 def get_cors_headers():
@@ -46,33 +175,622 @@ def decimal_default(obj):
     return obj
 
 
-def calculate_motion_threat_score(motion_activity, is_stationary, location_accuracy=None):
+def decimal_map(values):
+    """Flat dict of floats, ints, bools and strings as a DynamoDB map, floats rounded to 6 places"""
+    return {name: decimal_default(round(value, 6)) if isinstance(value, float) else value for name, value in values.items()}
+
+
+def feature_threat_bonus(features):
+    """
+    Score contribution from server-side sensor window features. Classified windows score the
+    activity and unexpected changes of activity; without a model, jerky broadband motion
+    stands in for struggling, on top of motion_activity.
+    """
+    bonus = 0.0
+    if 'activity' in features:
+        if features['activity'] == 'struggling':
+            bonus += STRUGGLE_BONUS
+        if (features.get('previous_activity'), features['activity']) in UNEXPECTED_ACTIVITY_TRANSITIONS:
+            bonus += ACTIVITY_TRANSITION_BONUS
+    # Jerky broadband motion rather than the rhythm of walking or running
+    elif features['agitation_band_ratio'] > STRUGGLE_BAND_RATIO and features['jerk_p95'] > STRUGGLE_JERK_THRESHOLD:
+        bonus += STRUGGLE_BONUS
+    # A hard impact such as a fall or a blow
+    if features['impact_count']:
+        bonus += IMPACT_BONUS
+    # Patterns confirmed across windows by the motion state
+    if features.get('fall_detected'):
+        bonus += FALL_DETECTED_BONUS
+    # Hard running also trips the jerk threshold; once classified, it has to look like struggling
+    if features.get('sustained_struggle') and features.get('activity', 'struggling') == 'struggling':
+        bonus += SUSTAINED_STRUGGLE_BONUS
+    return bonus
+
+
+def is_night(epoch_seconds):
+    local_hour = (epoch_seconds + LOCAL_UTC_OFFSET_MINUTES * 60) // 3600 % 24
+    return local_hour >= NIGHT_START_HOUR or local_hour < NIGHT_END_HOUR
+
+
+def cache_motion_state(user_id, state):
+    motion_states[user_id] = state
+    motion_states.move_to_end(user_id)
+    while len(motion_states) > MOTION_STATE_CACHE_SIZE:
+        motion_states.popitem(last=False)
+
+
+def get_safe_zone_index(user_id):
+    """The user's safe zones from UsersTable, indexed and cached per container for SAFE_ZONE_CACHE_SECONDS"""
+    index = safe_zone_indexes.get(user_id)
+    if index is None:
+        try:
+            response = users_table.get_item(Key={'user_id': user_id}, ProjectionExpression='safe_zones')
+        except ClientError as e:
+            # Scoring without zones only forgoes the discount; try again on the next request
+            logger.warning(f"Could not read safe zones for user {user_id}: {e}")
+            return SafeZoneIndex([])
+        index = SafeZoneIndex(response.get('Item', {}).get('safe_zones'))
+        safe_zone_indexes.put(user_id, index)
+    return index
+
+
+def get_route_index(user_id, route_started):
+    """
+    RouteIndex for the trip the motion state points at, built once per container and trip
+    from the route item; None when that trip has ended (the item is gone or newer).
+    """
+    cached = route_indexes.get(user_id)
+    if cached is None or cached[0] != route_started:
+        response = user_state_table.get_item(Key={'user_id': user_id, 'state_key': ROUTE_STATE_KEY}, ConsistentRead=True)
+        item = response.get('Item')
+        index = None
+        if item and float(item['started_at']) == route_started:
+            index = RouteIndex(np.frombuffer(bytes(item['polyline'].value), dtype=np.float64).reshape(-1, 2))
+        cached = (route_started, index)
+        route_indexes[user_id] = cached
+    route_indexes.move_to_end(user_id)
+    while len(route_indexes) > MOTION_STATE_CACHE_SIZE:
+        route_indexes.popitem(last=False)
+    return cached[1]
+
+
+def update_motion_state(user_id, readings):
+    """
+    Advances the user's motion state with a list of parsed readings, taken in time order:
+    the stationary anchor and the trajectory ring with each position fix, and the fall and
+    struggle detectors and the last activity with each sensor window. Position fixes go through
+    the Kalman location filter first, and the anchor, ring and any expected route see the
+    smoothed fix. Returns (results, state): one {'fall_detected', 'sustained_struggle',
+    'stationary_seconds', 'trajectory', 'smoothed_location', 'route_deviation'} per reading,
+    in input order, with 'previous_activity' added for a classified window, and the state as
+    advanced.
+
+    A warm container starts from its cached copy of the state, otherwise from one
+    consistent GetItem, and writes it back with a single PutItem conditioned on the version
+    it was computed from, however many readings there are. If another container got there
+    first, the failed write hands back the stored item (ReturnValuesOnConditionCheckFailure)
+    and the readings are replayed on it.
+    """
+    signals = {}
+    for index, reading in enumerate(readings):
+        if reading['window'] is not None:
+            magnitude, jerk = window_signals(reading['window'])
+            times = reading['created_at_epoch'] + reading['window'][:, 0].astype(np.float64)
+            signals[index] = (times, magnitude, jerk)
+    order = sorted(range(len(readings)), key=lambda index: readings[index]['created_at_epoch'])
+
+    key = {'user_id': user_id, 'state_key': MOTION_STATE_KEY}
+    if user_id in motion_states:
+        stored = motion_states[user_id]
+    else:
+        response = user_state_table.get_item(Key=key, ConsistentRead=True)
+        stored = motion_state_from_item(response['Item']) if 'Item' in response else None
+
+    for attempt in range(MOTION_STATE_MAX_ATTEMPTS):
+        state = copy_motion_state(stored) if stored else new_motion_state()
+        results = [None] * len(readings)
+        changed = False
+        for index in order:
+            reading = readings[index]
+            result = {'fall_detected': False, 'sustained_struggle': False, 'stationary_seconds': None, 'trajectory': None, 'smoothed_location': None, 'route_deviation': None}
+            latitude, longitude = reading['latitude'], reading['longitude']
+            if latitude is not None and longitude is not None:
+                # Downstream scoring sees the Kalman-smoothed fix, so noisy fixes do not bounce
+                smoothed = advance_location_filter(state, reading['created_at_epoch'], latitude, longitude, reading['accuracy'])
+                if smoothed:
+                    result['smoothed_location'] = smoothed
+                    latitude, longitude = smoothed['latitude'], smoothed['longitude']
+                # Fixes within the stationary radius, widened by a poor accuracy or an uncertain
+                # filter, count as not moving
+                radius = max(LOCATION_STATIONARY_THRESHOLD_METERS, reading['accuracy'] or 0.0)
+                if smoothed:
+                    radius = max(radius, STATIONARY_UNCERTAINTY_SIGMAS * smoothed['accuracy'])
+                result['stationary_seconds'] = advance_stationary(
+                    state, reading['created_at_epoch'], latitude, longitude, radius, STATIONARY_DEPARTURE_FIXES
+                )
+                changed = changed or result['stationary_seconds'] is not None
+                if append_fix(state, reading['created_at_epoch'], latitude, longitude):
+                    result['trajectory'] = analyze_trajectory(ordered_track(state))
+                    changed = True
+                # During a trip, distance to the expected route (capped where the bonus is full)
+                route_started = state['route_started']
+                if route_started and route_started <= reading['created_at_epoch'] <= route_started + ROUTE_MAX_SECONDS:
+                    route = get_route_index(user_id, route_started)
+                    if route is not None:
+                        corridor = max(ROUTE_CORRIDOR_METERS, reading['accuracy'] or 0.0)
+                        distance = route.distance_meters(latitude, longitude, corridor + ROUTE_DEVIATION_FULL_METERS)
+                        off_route_seconds = advance_off_route(state, reading['created_at_epoch'], distance, corridor)
+                        if off_route_seconds is not None:
+                            result['route_deviation'] = {'distance_meters': distance, 'corridor_meters': corridor, 'off_route_seconds': off_route_seconds}
+                            changed = True
+            if index in signals:
+                detected = advance_fall_detector(state, *signals[index], STRUGGLE_JERK_THRESHOLD)
+                if detected is None:
+                    logger.info(f"Sensor window at {reading['created_at_epoch']} for user {user_id} is not newer than the motion state; skipped")
+                else:
+                    result['fall_detected'], result['sustained_struggle'] = detected
+                    changed = True
+            if reading['features'] and 'activity' in reading['features']:
+                window_end = signals[index][0][-1]
+                transition = advance_activity(state, window_end, reading['features']['activity'], ACTIVITY_MEMORY_SECONDS)
+                if transition is not None:
+                    result['previous_activity'] = transition
+                    changed = True
+            results[index] = result
+        if not changed:
+            return results, state
+
+        state['version'] += 1
+        item = motion_state_to_item(state)
+        item.update(key)
+        item['expires_at'] = int(time.time()) + MOTION_STATE_TTL_SECONDS
+        put_kwargs = {'Item': item, 'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'}
+        if stored:
+            put_kwargs['ConditionExpression'] = 'version = :version'
+            put_kwargs['ExpressionAttributeValues'] = {':version': stored['version']}
+        else:
+            put_kwargs['ConditionExpression'] = 'attribute_not_exists(user_id)'
+        try:
+            user_state_table.put_item(**put_kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Error responses bypass the resource layer, so the item is still in wire format
+            current = {name: _deserializer.deserialize(value) for name, value in e.response.get('Item', {}).items()}
+            stored = motion_state_from_item(current) if current else None
+            logger.info(f"Motion state for user {user_id} changed elsewhere; replaying request (attempt {attempt + 1})")
+            continue
+        cache_motion_state(user_id, state)
+        return results, state
+
+    logger.error(f"Could not update motion state for user {user_id} after {MOTION_STATE_MAX_ATTEMPTS} attempts")
+    motion_states.pop(user_id, None)
+    return results, state
+
+
+def sampling_floor(state, timestamp):
+    """
+    Least busy sampling tier the motion state allows: a fall or struggle in progress needs
+    the next window soon to be confirmed, and a trip needs regular fixes to follow the route.
+    """
+    if state['phase'] != PHASE_IDLE or state['struggle_seconds']:
+        return SAMPLING_ESCALATED
+    if state['route_started'] and timestamp <= state['route_started'] + ROUTE_MAX_SECONDS:
+        return SAMPLING_ACTIVE
+    return SAMPLING_IDLE
+
+
+def calculate_motion_threat_score(motion_activity, stationary_seconds, location_accuracy=None, features=None, trajectory=None, route_deviation=None, in_safe_zone=False):
     """
     Calculates a threat score based on motion and location data.
-    This is a simplified example.
+    Scalars return a float; arrays of motion_activity, stationary_seconds and
+    location_accuracy (None entries allowed) are scored in one vectorized pass and return an
+    array. `stationary_seconds` is how long the user has stayed in place according to the
+    motion state (None when unknown). `features` and `trajectory` are a dict (or None) for a
+    single reading, or lists aligned with the arrays: sensor window features replace the
+    client-supplied motion_activity (or, once classified, the magnitude term altogether) and
+    add feature_threat_bonus, and the analyze_trajectory summary (with 'at_night' added by
+    the caller) adds the speed transition bonus. `route_deviation` (same shapes) adds the
+    route deviation bonuses during a trip. `in_safe_zone` (a bool or bool array) discounts
+    the location-based part of the score by SAFE_ZONE_DISCOUNT.
     """
-    score = 0.0
+    is_batch = np.ndim(motion_activity) > 0
+
+    # None values become NaN in a float array
+    activity = np.nan_to_num(np.array(motion_activity, dtype=np.float64), nan=0.0)
+    stationary = np.array(stationary_seconds, dtype=np.float64)
+    accuracy = np.nan_to_num(np.array(location_accuracy, dtype=np.float64), nan=0.0)
+    activity, stationary, accuracy = (np.array(arr) for arr in np.broadcast_arrays(activity, stationary, accuracy))
+    score = np.zeros(activity.shape)
+
+    window_features = features if isinstance(features, list) else [features]
+    for index, summary in enumerate(window_features):
+        if summary:
+            # A classified window is scored on what the user is doing, not how hard they move
+            activity.flat[index] = 0.0 if 'activity' in summary else summary['motion_activity']
+            score.flat[index] += feature_threat_bonus(summary)
 
     # High motion activity could indicate struggle or rapid movement
-    if motion_activity > MOTION_ACTIVITY_THRESHOLD:
-        score += motion_activity * 0.4
+    score += np.where(activity > MOTION_ACTIVITY_THRESHOLD, activity * 0.4, 0.0)
+
+    # Being stationary for too long (unknown durations are NaN and never compare true)
+    # Base score for being stationary, more if location accuracy is poor while stationary
+    long_stationary = stationary >= STATIONARY_DURATION_SECONDS
+    location_score = np.where(long_stationary, 0.3 + np.where(accuracy > LOCATION_STATIONARY_THRESHOLD_METERS, 0.2, 0.0), 0.0)
 
-    # Being stationary in an unexpected location or for too long
-    if is_stationary:
-        score += 0.3 # Base score for being stationary
+    # Walking pace that suddenly becomes vehicle speed, e.g. being pulled into a car
+    trajectories = trajectory if isinstance(trajectory, list) else [trajectory]
+    for index, summary in enumerate(trajectories):
+        if summary and summary['speed_transition']:
+            location_score.flat[index] += SPEED_TRANSITION_BONUS + (NIGHT_TRANSITION_BONUS if summary['at_night'] else 0.0)
 
-        # If location accuracy is poor while stationary, increase threat
-        if location_accuracy and location_accuracy > LOCATION_STATIONARY_THRESHOLD_METERS:
-            score += 0.2
+    # Straying from the expected route: how far beyond the corridor, and for how long
+    deviations = route_deviation if isinstance(route_deviation, list) else [route_deviation]
+    for index, deviation in enumerate(deviations):
+        if deviation:
+            beyond = max(0.0, deviation['distance_meters'] - deviation['corridor_meters'])
+            location_score.flat[index] += ROUTE_DEVIATION_BONUS * min(1.0, beyond / ROUTE_DEVIATION_FULL_METERS)
+            location_score.flat[index] += ROUTE_DWELL_BONUS * min(1.0, deviation['off_route_seconds'] / ROUTE_DWELL_SECONDS)
 
-        # In a real app, you'd check stationary duration and known safe locations
+    # Staying put or driving off is expected at home, work or college
+    score += location_score * np.where(in_safe_zone, 1.0 - SAFE_ZONE_DISCOUNT, 1.0)
 
     # Ensure score is between 0 and 1
-    return min(1.0, max(0.0, score))
+    score = np.clip(score, 0.0, 1.0)
+    return score if is_batch else float(score)
+
+
+def parse_reading(reading):
+    """
+    Validates one reading and analyses its sensor window, if any. Returns the parsed
+    reading, or raises ValueError with a message for the client.
+    """
+    if not isinstance(reading, dict):
+        raise ValueError('Each reading must be a JSON object')
+    location = reading.get('location')
+    if reading.get('created_at_epoch') is None or not isinstance(location, dict) or reading.get('is_stationary') is None:
+        raise ValueError('Missing required fields for motion analysis')
+    if reading.get('motion_activity') is None and not reading.get('sensor_window'):
+        raise ValueError('Missing motion_activity or sensor_window')
+    try:
+        created_at_epoch = int(reading['created_at_epoch'])
+    except (TypeError, ValueError):
+        raise ValueError('Invalid created_at_epoch format. Must be an integer epoch.')
+    try:
+        latitude, longitude = float(location['latitude']), float(location['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('location must have numeric latitude and longitude')
+    # Also rejects NaN, which fails both comparisons
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError('location latitude or longitude out of range')
+    accuracy = location.get('accuracy')
+    if accuracy is not None:
+        try:
+            accuracy = float(accuracy)
+        except (TypeError, ValueError):
+            raise ValueError('location accuracy must be a number of meters')
+        if not (np.isfinite(accuracy) and accuracy >= 0.0):
+            raise ValueError('location accuracy must be a finite, non-negative number of meters')
+
+    window, features = None, None
+    if reading.get('sensor_window'):
+        try:
+            window = decode_sensor_window(reading['sensor_window'], MAX_SENSOR_WINDOW_SAMPLES)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f'Invalid sensor_window: {e}')
+        features = extract_motion_features(window)
+    return {
+        'created_at_epoch': created_at_epoch,
+        'motion_activity': features['motion_activity'] if features else reading['motion_activity'],
+        'latitude': latitude,
+        'longitude': longitude,
+        'accuracy': accuracy,
+        'is_stationary': reading['is_stationary'],
+        'window': window,
+        'features': features
+    }
+
+
+def analyze_readings(user_id, readings):
+    """
+    Advances the motion state with the parsed readings, looks each (smoothed) fix up in the
+    user's safe zones and scores them in one vectorized pass. Returns (threat_scores array,
+    MotionAnalysisTable items) in input order, and the sampling floor of the advanced state.
+    """
+    # All windows of the batch are classified in one pass, before the state records transitions
+    windowed = [reading for reading in readings if reading['features']]
+    # Loaded on the first windowed request, then cached for the container
+    activity_model = load_activity_model(ACTIVITY_MODEL_PATH) if windowed else None
+    if activity_model is not None:
+        labels, probabilities = classify_activity([reading['features'] for reading in windowed], activity_model)
+        for reading, label, probability in zip(windowed, labels, probabilities.max(axis=1)):
+            reading['features']['activity'] = label
+            reading['features']['activity_confidence'] = float(probability)
+
+    states, motion_state = update_motion_state(user_id, readings)
+    zone_index = get_safe_zone_index(user_id)
+    features, trajectories = [], []
+    for reading, state in zip(readings, states):
+        if reading['features']:
+            reading['features']['fall_detected'] = state['fall_detected']
+            reading['features']['sustained_struggle'] = state['sustained_struggle']
+            if state.get('previous_activity'):
+                reading['features']['previous_activity'] = state['previous_activity']
+                logger.info(f"User {user_id} went from {state['previous_activity']} to {reading['features']['activity']}")
+        trajectory = state['trajectory']
+        if trajectory:
+            trajectory['at_night'] = is_night(reading['created_at_epoch'])
+            if trajectory['speed_transition']:
+                logger.info(f"User {user_id} went from walking pace to {trajectory['speed_mps']:.1f} m/s")
+        reading['smoothed_location'] = state['smoothed_location']
+        location = state['smoothed_location'] or reading
+        reading['safe_zones'] = []
+        if len(zone_index) and location['latitude'] is not None and location['longitude'] is not None:
+            reading['safe_zones'] = zone_index.zones_containing(location['latitude'], location['longitude'])
+        features.append(reading['features'])
+        trajectories.append(trajectory)
+
+    # The poor-accuracy penalty uses the filter's uncertainty, which shrinks as fixes agree
+    threat_scores = calculate_motion_threat_score(
+        [reading['motion_activity'] for reading in readings],
+        [state['stationary_seconds'] for state in states],
+        [state['smoothed_location']['accuracy'] if state['smoothed_location'] else reading['accuracy'] for reading, state in zip(readings, states)],
+        features,
+        trajectories,
+        [state['route_deviation'] for state in states],
+        [bool(reading['safe_zones']) for reading in readings]
+    )
+    items = [
+        build_motion_item(user_id, reading, state, float(threat_score))
+        for reading, state, threat_score in zip(readings, states, threat_scores)
+    ]
+    floor = sampling_floor(motion_state, max(reading['created_at_epoch'] for reading in readings))
+    return threat_scores, items, floor
+
+
+def build_motion_item(user_id, reading, state, threat_score):
+    """MotionAnalysisTable item for one reading - floats converted to Decimal"""
+    item = {
+        'user_id': user_id,
+        'created_at_epoch': reading['created_at_epoch'],
+        'motion_activity': Decimal(str(reading['motion_activity'])),
+        'location': {
+            'latitude': Decimal(str(reading['latitude'])),
+            'longitude': Decimal(str(reading['longitude'])),
+            'accuracy': Decimal(str(reading['accuracy'])) if reading['accuracy'] is not None else None
+        },
+        'is_stationary': reading['is_stationary'],
+        'threat_score': Decimal(str(threat_score)),
+        'analysis_time': datetime.utcnow().isoformat()
+    }
+
+    # Remove None values from location
+    item['location'] = {k: v for k, v in item['location'].items() if v is not None}
+
+    if state['stationary_seconds'] is not None:
+        item['stationary_seconds'] = decimal_default(float(state['stationary_seconds']))
+    if state['trajectory']:
+        item['trajectory'] = decimal_map(state['trajectory'])
+    if state['smoothed_location']:
+        item['smoothed_location'] = decimal_map(state['smoothed_location'])
+    if reading['features']:
+        item['motion_features'] = decimal_map(reading['features'])
+    if state['route_deviation']:
+        item['route_deviation'] = decimal_map(state['route_deviation'])
+    if reading['safe_zones']:
+        item['safe_zones'] = reading['safe_zones']
+    return item
+
+
+def invoke_risk_assessor(user_id, reading, threat_score, batch_context=None):
+    """Asynchronously hands a reading over the threshold to the Risk Assessor, with its (smoothed) location and any batch context"""
+    logger.info(f"Threat score {threat_score} >= threshold {THREAT_SCORE_TRIGGER_THRESHOLD}. Invoking Risk Assessor.")
+    payload = {
+        'user_id': user_id,
+        'trigger_type': 'motion_analysis',
+        'timestamp': reading['created_at_epoch'], # Use motion timestamp for consistency
+        'threat_score': threat_score,
+        'location': {'latitude': reading['latitude'], 'longitude': reading['longitude']}
+    }
+    if reading.get('smoothed_location'):
+        smoothed = reading['smoothed_location']
+        payload['location'] = {'latitude': smoothed['latitude'], 'longitude': smoothed['longitude'], 'accuracy': smoothed['accuracy']}
+    if batch_context:
+        payload.update(batch_context)
+    lambda_client.invoke(
+        FunctionName=RISK_ASSESSMENT_LAMBDA_NAME,
+        InvocationType='Event',  # Asynchronous invocation
+        Payload=json.dumps(payload)
+    )
+    logger.info("Risk Assessor Lambda invoked.")
+
+
+def drop_redundant_coordinates(items):
+    """
+    Removes latitude and longitude from the batch rows (sorted by time) whose fix lies within
+    MOTION_TRACK_TOLERANCE_METERS of the path interpolated between the fixes kept by
+    simplify_track. The first and last rows of a batch always keep theirs, so every batch can
+    be rebuilt on its own with interpolate_track; accuracy stays on every row. Batches only:
+    a single reading is its own first and last row, and whether its fix is redundant depends
+    on the next one, so single-reading rows always keep their coordinates.
+    """
+    track = np.array([
+        (item['created_at_epoch'], float(item['location']['latitude']), float(item['location']['longitude']))
+        for item in items
+    ])
+    kept = simplify_track(track, MOTION_TRACK_TOLERANCE_METERS)
+    is_kept = np.zeros(len(items), dtype=bool)
+    is_kept[kept] = True
+    for item, keep in zip(items, is_kept):
+        if not keep:
+            item['location'].pop('latitude')
+            item['location'].pop('longitude')
+    logger.info(f"Kept coordinates for {len(kept)} of {len(items)} motion readings")
+
+
+def process_reading_batch(user_id, raw_readings, hold_until=None):
+    """
+    Scores a batch of buffered readings in one vectorized pass with a single motion state
+    write, stores them with BatchWriteItem and invokes the Risk Assessor at most once, for
+    the highest-scoring reading, with the batch context. `hold_until` is the client's echoed
+    sampling hold.
+    """
+    readings = []
+    for index, reading in enumerate(raw_readings):
+        try:
+            readings.append(parse_reading(reading))
+        except ValueError as e:
+            logger.error(f"Invalid reading {index}: {e}")
+            return {
+                'statusCode': 400,
+                'headers': get_cors_headers(),
+                'body': json.dumps({'error': f'Reading {index}: {e}'})
+            }
+
+    threat_scores, items, floor = analyze_readings(user_id, readings)
+
+    # One item per timestamp: BatchWriteItem rejects duplicate keys, the last reading wins
+    unique_items = sorted({item['created_at_epoch']: item for item in items}.values(), key=lambda item: item['created_at_epoch'])
+    drop_redundant_coordinates(unique_items)
+    calls = batch_put_items(dynamodb, MOTION_ANALYSIS_TABLE_NAME, unique_items)
+    logger.info(f"Stored {len(unique_items)} motion readings for user {user_id} in {calls} BatchWriteItem calls")
+
+    max_index = int(np.argmax(threat_scores))
+    max_score = float(threat_scores[max_index])
+    if max_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
+        invoke_risk_assessor(user_id, readings[max_index], max_score, {
+            'batch_size': len(readings),
+            'readings_over_threshold': int(np.count_nonzero(threat_scores >= THREAT_SCORE_TRIGGER_THRESHOLD)),
+            'fall_detected': any(reading['features'] and reading['features']['fall_detected'] for reading in readings),
+            'speed_transition': any(item.get('trajectory', {}).get('speed_transition', False) for item in items)
+        })
+
+    return {
+        'statusCode': 200,
+        'headers': get_cors_headers(),
+        'body': json.dumps({
+            'message': 'Motion batch processed successfully',
+            'readings_processed': len(readings),
+            'threat_scores': [float(score) for score in threat_scores],
+            'max_threat_score': max_score,
+            'sampling': sampling_policy.recommend(max_score, hold_until, floor)
+        })
+    }
+
+
+def point_motion_state_at_route(user_id, route_started):
+    """
+    Sets the trip the motion state follows (0 for none) with one UpdateItem that also bumps
+    its version, so containers holding a cached copy fail their next conditional write and
+    replay on the stored state. A user without a motion state yet gets a new one.
+    """
+    key = {'user_id': user_id, 'state_key': MOTION_STATE_KEY}
+    motion_states.pop(user_id, None)
+    for attempt in range(MOTION_STATE_MAX_ATTEMPTS):
+        try:
+            user_state_table.update_item(
+                Key=key,
+                UpdateExpression='SET route_started = :started, route_last_time = :zero, off_route_since = :zero ADD version :one',
+                ConditionExpression='attribute_exists(user_id)',
+                ExpressionAttributeValues={':started': Decimal(route_started), ':zero': Decimal(0), ':one': 1}
+            )
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        if not route_started:
+            return
+        state = new_motion_state()
+        state['route_started'] = float(route_started)
+        item = motion_state_to_item(state)
+        item.update(key)
+        item['expires_at'] = int(time.time()) + MOTION_STATE_TTL_SECONDS
+        try:
+            user_state_table.put_item(Item=item, ConditionExpression='attribute_not_exists(user_id)')
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # A motion request created the state in between; update that one instead
+            logger.info(f"Motion state for user {user_id} created elsewhere; retrying route update (attempt {attempt + 1})")
+    raise RuntimeError(f"Could not point the motion state for user {user_id} at route {route_started}")
+
+
+def start_motion_route(body_data):
+    """
+    Stores the expected route of a "walk me home" trip, a list of [latitude, longitude]
+    vertices in travel order, as one float64 Binary attribute, and points the motion state
+    at it. Fixes from `started_at` (default now) on are checked against it.
+    """
+    user_id = body_data.get('user_id')
+    route = body_data.get('route')
+    if not user_id or not isinstance(route, list) or len(route) < 2:
+        logger.error("Validation Error: Route requests need user_id and a route of at least 2 vertices.")
+        return {
+            'statusCode': 400,
+            'headers': get_cors_headers(),
+            'body': json.dumps({'error': 'Route requests need user_id and a route of at least 2 [latitude, longitude] vertices'})
+        }
+    if len(route) > MAX_ROUTE_VERTICES:
+        logger.error(f"Route too long: {len(route)} vertices")
+        return {
+            'statusCode': 400,
+            'headers': get_cors_headers(),
+            'body': json.dumps({'error': f'Too many route vertices. Maximum {MAX_ROUTE_VERTICES}.'})
+        }
+    try:
+        polyline = np.array(route, dtype=np.float64)
+        started_at = int(body_data.get('started_at') or time.time())
+    except (TypeError, ValueError):
+        polyline = None
+    if polyline is None or polyline.shape != (len(route), 2) or not np.isfinite(polyline).all() or (np.abs(polyline) > [90.0, 180.0]).any():
+        logger.error("Validation Error: Invalid route vertices or started_at.")
+        return {
+            'statusCode': 400,
+            'headers': get_cors_headers(),
+            'body': json.dumps({'error': 'Invalid route. Vertices must be [latitude, longitude] pairs and started_at an integer epoch.'})
+        }
+
+    user_state_table.put_item(Item={
+        'user_id': user_id,
+        'state_key': ROUTE_STATE_KEY,
+        'started_at': started_at,
+        'vertex_count': len(polyline),
+        'polyline': polyline.tobytes(),
+        'expires_at': int(time.time()) + ROUTE_MAX_SECONDS
+    })
+    point_motion_state_at_route(user_id, started_at)
+    logger.info(f"Route with {len(polyline)} vertices started for user {user_id} at {started_at}")
+    return {
+        'statusCode': 200,
+        'headers': get_cors_headers(),
+        'body': json.dumps({'message': 'Route started', 'started_at': started_at, 'vertex_count': len(polyline)})
+    }
+
+
+def end_motion_route(body_data):
+    """Ends the user's trip: deletes the route and stops checking fixes against it."""
+    user_id = body_data.get('user_id')
+    if not user_id:
+        logger.error("Validation Error: Route requests need user_id.")
+        return {
+            'statusCode': 400,
+            'headers': get_cors_headers(),
+            'body': json.dumps({'error': 'Route requests need user_id'})
+        }
+    user_state_table.delete_item(Key={'user_id': user_id, 'state_key': ROUTE_STATE_KEY})
+    point_motion_state_at_route(user_id, 0)
+    route_indexes.pop(user_id, None)
+    logger.info(f"Route ended for user {user_id}")
+    return {
+        'statusCode': 200,
+        'headers': get_cors_headers(),
+        'body': json.dumps({'message': 'Route ended'})
+    }
 
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # API Gateway Proxy Integration puts the body as a string under 'body' key
@@ -81,15 +799,41 @@ def lambda_handler(event, context):
         else:
             body_data = event # For direct Lambda invocation or other triggers
 
-        logger.info(f"Parsed body data: {json.dumps(body_data)}")
+        log_payload(logger, "Parsed body data", body_data)
+
+        if event.get('resource') == MOTION_ROUTE_PATH:
+            if body_data.get('action', 'start') == 'end':
+                return end_motion_route(body_data)
+            return start_motion_route(body_data)
 
         user_id = body_data.get('user_id')
+
+        # Batched readings buffered by the phone
+        raw_readings = body_data.get('readings')
+        if raw_readings is not None:
+            if not user_id or not isinstance(raw_readings, list) or not raw_readings:
+                logger.error("Validation Error: Batch requests need user_id and a non-empty readings list.")
+                return {
+                    'statusCode': 400,
+                    'headers': get_cors_headers(),
+                    'body': json.dumps({'error': 'Batch requests need user_id and a non-empty readings list'})
+                }
+            if len(raw_readings) > MAX_MOTION_BATCH_SIZE:
+                logger.error(f"Batch too large: {len(raw_readings)} readings")
+                return {
+                    'statusCode': 400,
+                    'headers': get_cors_headers(),
+                    'body': json.dumps({'error': f'Too many readings. Maximum {MAX_MOTION_BATCH_SIZE} per batch.'})
+                }
+            return process_reading_batch(user_id, raw_readings, body_data.get('sampling_hold_until'))
+
         created_at_epoch = body_data.get('created_at_epoch')
         motion_activity = body_data.get('motion_activity')
         location = body_data.get('location') # This will be a dictionary
         is_stationary = body_data.get('is_stationary')
+        sensor_window = body_data.get('sensor_window')
 
-        if not all([user_id, created_at_epoch, motion_activity is not None, location, is_stationary is not None]):
+        if not all([user_id, created_at_epoch, motion_activity is not None or sensor_window, location, is_stationary is not None]):
             logger.error("Validation Error: Missing required fields (user_id, created_at_epoch, motion_activity, location, is_stationary).")
             return {
                 'statusCode': 400,
@@ -97,73 +841,44 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Missing required fields for motion analysis'})
             }
 
-        # Convert timestamp to integer if it's not already
+        # Validates the timestamp and extracts features from the raw sensor window when the client sent one
         try:
-            created_at_epoch = int(created_at_epoch)
-        except ValueError:
-            logger.error(f"Invalid created_at_epoch format: {created_at_epoch}")
+            reading = parse_reading(body_data)
+        except ValueError as e:
+            logger.error(f"Invalid motion reading: {e}")
             return {
                 'statusCode': 400,
                 'headers': get_cors_headers(),  # Added CORS headers
-                'body': json.dumps({'error': 'Invalid created_at_epoch format. Must be an integer epoch.'})
+                'body': json.dumps({'error': str(e)})
             }
+        created_at_epoch = reading['created_at_epoch']
+        features = reading['features']
+        if features:
+            logger.info(f"Analysed {features['sample_count']} sensor samples at {features['sample_rate']:.1f} Hz, motion activity {reading['motion_activity']:.3f}")
 
-        # Extract location details
-        latitude = location.get('latitude')
-        longitude = location.get('longitude')
-        accuracy = location.get('accuracy')
-
-        if not all([user_id, created_at_epoch]):
-            logger.error("Validation Error: Missing required fields (user_id, timestamp).")
-            return {
-                'statusCode': 400,
-                'headers': get_cors_headers(),  # Added CORS headers
-                'body': json.dumps({'error': 'Missing required fields (user_id, timestamp)'})
-            }
+        # One read (cold containers only) and one conditional write of the user's motion state
+        threat_scores, items, floor = analyze_readings(user_id, [reading])
+        threat_score = float(threat_scores[0])
+        item = items[0]
 
-        # Calculate threat score
-        threat_score = calculate_motion_threat_score(motion_activity, is_stationary, accuracy)
-
-        # Store analysis in DynamoDB - Convert floats to Decimal for DynamoDB
-        item = {
-            'user_id': user_id,
-            'created_at_epoch': created_at_epoch,
-            'motion_activity': Decimal(str(motion_activity)),
-            'location': {
-                'latitude': Decimal(str(latitude)),
-                'longitude': Decimal(str(longitude)),
-                'accuracy': Decimal(str(accuracy)) if accuracy is not None else None
-            },
-            'is_stationary': is_stationary,
-            'threat_score': Decimal(str(threat_score)),
-            'analysis_time': datetime.utcnow().isoformat()
-        }
-        
-        # Remove None values from location
-        item['location'] = {k: v for k, v in item['location'].items() if v is not None}
-        
         motion_analysis_table.put_item(Item=item)
         logger.info(f"Motion analysis stored for user {user_id} at {created_at_epoch} with score {threat_score}")
 
         # Invoke Risk Assessor Lambda if threat score exceeds threshold
         if threat_score >= THREAT_SCORE_TRIGGER_THRESHOLD:
-            logger.info(f"Threat score {threat_score} >= threshold {THREAT_SCORE_TRIGGER_THRESHOLD}. Invoking Risk Assessor.")
-            lambda_client.invoke(
-                FunctionName=RISK_ASSESSMENT_LAMBDA_NAME,
-                InvocationType='Event',  # Asynchronous invocation
-                Payload=json.dumps({
-                    'user_id': user_id,
-                    'trigger_type': 'motion_analysis',
-                    'timestamp': created_at_epoch, # Use motion timestamp for consistency
-                    'threat_score': threat_score
-                })
-            )
-            logger.info("Risk Assessor Lambda invoked.")
+            invoke_risk_assessor(user_id, reading, threat_score)
 
         return {
             'statusCode': 200,
             'headers': get_cors_headers(),  # Added CORS headers
-            'body': json.dumps({'message': 'Motion analysis processed successfully', 'threat_score': threat_score})
+            'body': json.dumps({
+                'message': 'Motion analysis processed successfully',
+                'threat_score': threat_score,
+                'motion_activity': reading['motion_activity'],
+                'activity': reading['features'].get('activity') if reading['features'] else None,
+                'stationary_seconds': float(item['stationary_seconds']) if 'stationary_seconds' in item else None,
+                'sampling': sampling_policy.recommend(threat_score, body_data.get('sampling_hold_until'), floor)
+            })
         }
 
     except json.JSONDecodeError as e:
@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+from trajectory import EARTH_RADIUS_METERS
+
+# Constant-velocity model: the unmodelled acceleration (m/s^2, one standard deviation).
+# Fixes come seconds apart, so this is the average change in velocity between them, not peak
+# acceleration; larger values follow turns faster but smooth less
+ACCELERATION_NOISE = 0.2
+# Squared normalized innovation (two axes) above which a fix is treated as an outlier and
+# its variance inflated to match, so one jump pulls the estimate only part of the way;
+# 13.8 is the 99.9th percentile of chi-square with two degrees of freedom
+OUTLIER_GATE = 13.8
+# Phones report accuracy as a one-sigma radius; clamp it to something believable
+MIN_FIX_ACCURACY_METERS = 3.0
+DEFAULT_FIX_ACCURACY_METERS = 30.0
+# Starting velocity uncertainty (m/s): anything from standing still to a moving car
+INITIAL_SPEED_STD = 10.0
+# After this long without a fix, or this far from the local origin, the filter restarts
+MAX_GAP_SECONDS = 600.0
+MAX_ORIGIN_METERS = 20000.0
+
+# Filter rows, each (north, east) in meters and seconds on a plane tangent at the origin.
+# The axes are independent (isotropic noise, uncoupled motion), so the 4x4 covariance is
+# two identical 2x2 blocks and both axes are updated together as numpy pairs.
+POSITION, VELOCITY, VAR_POSITION, COV_POSITION_VELOCITY, VAR_VELOCITY = range(5)
+FILTER_ROWS = 5
+
+
+def new_location_filter():
+    return {
+        'kalman': np.zeros((FILTER_ROWS, 2)),
+        'kalman_time': 0.0,
+        'kalman_origin_latitude': 0.0,
+        'kalman_origin_longitude': 0.0
+    }
+
+
+def _transition(dt):
+    """
+    Predict step for the stacked filter rows, as kalman' = T @ kalman + Q: constant velocity
+    for the mean, and P' = F P F^T + Q for the covariance with white-noise acceleration.
+    """
+    q = ACCELERATION_NOISE ** 2
+    transition = np.eye(FILTER_ROWS)
+    transition[POSITION, VELOCITY] = dt
+    transition[VAR_POSITION, COV_POSITION_VELOCITY:] = 2.0 * dt, dt * dt
+    transition[COV_POSITION_VELOCITY, VAR_VELOCITY] = dt
+    noise = np.zeros((FILTER_ROWS, 1))
+    noise[VAR_POSITION:, 0] = q * dt ** 4 / 4.0, q * dt ** 3 / 2.0, q * dt * dt
+    return transition, noise
+
+
+def _to_local(state, latitude, longitude):
+    origin_latitude = math.radians(state['kalman_origin_latitude'])
+    return EARTH_RADIUS_METERS * np.array([
+        math.radians(latitude) - origin_latitude,
+        math.radians(longitude - state['kalman_origin_longitude']) * math.cos(origin_latitude)
+    ])
+
+
+def _restart(state, timestamp, latitude, longitude, variance):
+    state['kalman_origin_latitude'], state['kalman_origin_longitude'] = latitude, longitude
+    state['kalman_time'] = timestamp
+    kalman = np.zeros((FILTER_ROWS, 2))
+    kalman[VAR_POSITION] = variance
+    kalman[VAR_VELOCITY] = INITIAL_SPEED_STD ** 2
+    state['kalman'] = kalman
+
+
+def advance_location_filter(state, timestamp, latitude, longitude, accuracy=None):
+    """
+    One predict and update step of the per-user constant-velocity Kalman filter, in place
+    and in constant time. Returns the smoothed fix as {'latitude', 'longitude', 'accuracy'
+    (one-sigma meters), 'speed_mps', 'velocity_north', 'velocity_east'}, or None for a fix
+    that is not newer than the last one, leaving the state unchanged.
+    """
+    if state['kalman_time'] and timestamp <= state['kalman_time']:
+        return None
+    sigma = max(MIN_FIX_ACCURACY_METERS, float(accuracy)) if accuracy is not None else DEFAULT_FIX_ACCURACY_METERS
+    variance = sigma * sigma
+
+    measured = _to_local(state, latitude, longitude) if state['kalman_time'] else None
+    dt = timestamp - state['kalman_time']
+    if measured is None or dt > MAX_GAP_SECONDS or math.hypot(*measured) > MAX_ORIGIN_METERS:
+        _restart(state, timestamp, latitude, longitude, variance)
+    else:
+        transition, noise = _transition(dt)
+        kalman = transition @ state['kalman'] + noise
+        position, velocity, p, c, v = kalman.copy()
+        # Update with the measured position
+        innovation = measured - position
+        spread = p + variance
+        distance = float(np.dot(innovation, innovation / spread))
+        if distance > OUTLIER_GATE:
+            spread = p + variance * distance / OUTLIER_GATE
+        gain_position, gain_velocity = p / spread, c / spread
+        kalman[POSITION] += gain_position * innovation
+        kalman[VELOCITY] += gain_velocity * innovation
+        kalman[VAR_POSITION] -= gain_position * p
+        kalman[COV_POSITION_VELOCITY] -= gain_position * c
+        kalman[VAR_VELOCITY] -= gain_velocity * c
+        state['kalman'] = kalman
+        state['kalman_time'] = timestamp
+    return smoothed_fix(state)
+
+
+def smoothed_fix(state):
+    (north, east), (velocity_north, velocity_east), variances = state['kalman'][:VAR_POSITION + 1].tolist()
+    origin_latitude = math.radians(state['kalman_origin_latitude'])
+    return {
+        'latitude': state['kalman_origin_latitude'] + math.degrees(north / EARTH_RADIUS_METERS),
+        'longitude': state['kalman_origin_longitude'] + math.degrees(east / (EARTH_RADIUS_METERS * math.cos(origin_latitude))),
+        'accuracy': math.sqrt(sum(variances) / 2.0),
+        'speed_mps': math.hypot(velocity_north, velocity_east),
+        'velocity_north': velocity_north,
+        'velocity_east': velocity_east
+    }
@@ -0,0 +1,113 @@
+import base64
+
+import numpy as np
+
+# One sample per row: seconds since the window start, accelerometer (m/s^2), gyroscope (rad/s)
+WINDOW_COLUMNS = ('t', 'ax', 'ay', 'az', 'gx', 'gy', 'gz')
+STANDARD_GRAVITY = 9.80665
+
+# Fewer samples than this (~1 s at 16 Hz) cannot resolve the frequency bands below
+MIN_WINDOW_SAMPLES = 16
+
+# Walking and running put their energy in the gait band; struggling, shaking and
+# being shoved show up as broadband energy above it, up to the Nyquist frequency
+GAIT_BAND_HZ = (0.5, 3.0)
+AGITATION_MIN_HZ = 3.0
+# Acceleration magnitude above which a local maximum counts as an impact (falls, blows)
+IMPACT_THRESHOLD_G = 2.5
+# Dynamic acceleration RMS mapped to motion_activity 1.0 (one g of sustained shaking)
+ACTIVITY_FULL_SCALE = STANDARD_GRAVITY
+
+
+def decode_sensor_window(sensor_window, max_samples=None):
+    """
+    Parses a raw sensor window into a (samples, len(WINDOW_COLUMNS)) float32 array.
+    Accepts base64 little-endian float32 rows, or a dict of equal-length arrays keyed by
+    WINDOW_COLUMNS. Raises ValueError (binascii.Error included) for anything else.
+    """
+    if isinstance(sensor_window, str):
+        data = base64.b64decode(sensor_window, validate=True)
+        row_bytes = 4 * len(WINDOW_COLUMNS)
+        if len(data) % row_bytes:
+            raise ValueError(f'Packed sensor window must be whole rows of {len(WINDOW_COLUMNS)} float32 values')
+        window = np.frombuffer(data, dtype='<f4').reshape(-1, len(WINDOW_COLUMNS))
+    elif isinstance(sensor_window, dict):
+        missing = [column for column in WINDOW_COLUMNS if column not in sensor_window]
+        if missing:
+            raise ValueError(f'Sensor window is missing columns: {missing}')
+        lengths = {len(sensor_window[column]) for column in WINDOW_COLUMNS}
+        if len(lengths) != 1:
+            raise ValueError('Sensor window columns must all have the same length')
+        window = np.empty((lengths.pop(), len(WINDOW_COLUMNS)), dtype=np.float32)
+        for index, column in enumerate(WINDOW_COLUMNS):
+            window[:, index] = sensor_window[column]
+    else:
+        raise ValueError('sensor_window must be a base64 string or a dict of column arrays')
+
+    if len(window) < MIN_WINDOW_SAMPLES:
+        raise ValueError(f'Sensor window needs at least {MIN_WINDOW_SAMPLES} samples, got {len(window)}')
+    if max_samples is not None and len(window) > max_samples:
+        raise ValueError(f'Sensor window has {len(window)} samples, limit is {max_samples}')
+    if not np.isfinite(window).all() or not (np.diff(window[:, 0]) > 0).all():
+        raise ValueError('Sensor window values must be finite with strictly increasing t')
+    return window
+
+
+def window_signals(window):
+    """
+    Per-sample acceleration magnitude (m/s^2) and, for each step between samples, jerk
+    magnitude (m/s^3). Jerk uses the true interval of each step, so dropped samples do not
+    inflate it.
+    """
+    acceleration = window[:, 1:4]
+    magnitude = np.sqrt(np.einsum('ij,ij->i', acceleration, acceleration))
+    acceleration_change = np.diff(acceleration, axis=0)
+    jerk = np.sqrt(np.einsum('ij,ij->i', acceleration_change, acceleration_change)) / np.diff(window[:, 0])
+    return magnitude, jerk
+
+
+def extract_motion_features(window):
+    """
+    Window-level features from one decoded sensor window, computed over whole arrays.
+    Percentiles and medians rather than maxima keep single glitchy samples from dominating;
+    the sample rate is taken from the median interval, so jittery phone timestamps are fine.
+    """
+    t = window[:, 0]
+    interval = float(np.median(np.diff(t)))
+    duration = float(t[-1] - t[0]) + interval
+
+    magnitude, jerk = window_signals(window)
+    gravity = float(np.median(magnitude))
+    dynamic = magnitude - gravity
+    dynamic_rms = float(np.sqrt(np.mean(dynamic ** 2)))
+    rotation = np.sqrt(np.einsum('ij,ij->i', window[:, 4:7], window[:, 4:7]))
+
+    spectrum = np.abs(np.fft.rfft(dynamic * np.hanning(len(dynamic)))) ** 2
+    frequencies = np.fft.rfftfreq(len(dynamic), interval)
+    total_energy = float(spectrum[1:].sum())
+    gait_energy = float(spectrum[(frequencies >= GAIT_BAND_HZ[0]) & (frequencies < GAIT_BAND_HZ[1])].sum())
+    agitation_energy = float(spectrum[frequencies >= AGITATION_MIN_HZ].sum())
+
+    # Local maxima of the magnitude: all of them above one standard deviation of the dynamic
+    # part (steps, shakes) and those past the impact threshold
+    is_peak = (magnitude[1:-1] > magnitude[:-2]) & (magnitude[1:-1] >= magnitude[2:])
+    peak_values = magnitude[1:-1][is_peak]
+    peak_count = int(np.count_nonzero(peak_values > gravity + dynamic.std()))
+    impact_count = int(np.count_nonzero(peak_values > IMPACT_THRESHOLD_G * STANDARD_GRAVITY))
+
+    return {
+        'sample_count': len(window),
+        'sample_rate': 1.0 / interval,
+        'duration_seconds': duration,
+        'motion_activity': min(1.0, dynamic_rms / ACTIVITY_FULL_SCALE),
+        'acceleration_mean': float(magnitude.mean()),
+        'acceleration_variance': float(magnitude.var()),
+        'acceleration_p95': float(np.percentile(magnitude, 95)),
+        'jerk_p95': float(np.percentile(jerk, 95)),
+        'rotation_p95': float(np.percentile(rotation, 95)),
+        'spectral_energy': total_energy / len(dynamic),
+        'gait_band_ratio': gait_energy / total_energy if total_energy > 0 else 0.0,
+        'agitation_band_ratio': agitation_energy / total_energy if total_energy > 0 else 0.0,
+        'peak_rate': peak_count / duration,
+        'impact_count': impact_count
+    }
@@ -0,0 +1,243 @@
+from decimal import Decimal
+
+import numpy as np
+
+from location_filter import FILTER_ROWS, new_location_filter
+from motion_features import IMPACT_THRESHOLD_G, STANDARD_GRAVITY
+from trajectory import TRAJECTORY_COLUMNS, TRAJECTORY_POINTS, haversine_meters, new_trajectory
+
+# Per-user motion state lives in the user state table under this sort key
+MOTION_STATE_KEY = 'motion'
+
+PHASE_IDLE = 'idle'
+PHASE_FREEFALL = 'freefall'
+PHASE_IMPACT = 'impact'
+
+# A fall: acceleration magnitude dips towards 0 g, an impact follows shortly after,
+# then the phone (and its owner) lies still
+FREEFALL_THRESHOLD_G = 0.6
+FREEFALL_MIN_SECONDS = 0.1
+IMPACT_WINDOW_SECONDS = 1.0
+# Motion right after the impact (bouncing, rolling) does not count against stillness
+SETTLE_SECONDS = 0.5
+STILL_TOLERANCE_G = 0.15
+STILLNESS_SECONDS = 2.0
+# Moving again this long after the impact without ever lying still: not a fall
+FALL_CONFIRM_SECONDS = 10.0
+
+# Struggle: consecutive blocks where enough steps exceed the jerk threshold
+STRUGGLE_BLOCK_SECONDS = 1.0
+STRUGGLE_ACTIVE_FRACTION = 0.3
+STRUGGLE_MIN_SECONDS = 3.0
+
+# Windows further apart than this do not continue each other's patterns
+MAX_WINDOW_GAP_SECONDS = 5.0
+
+# Fall and struggle detector progress, restarted when windows are too far apart
+DETECTOR_KEYS = ('phase', 'phase_time', 'last_moving', 'struggle_seconds')
+
+# Scalar state carried between requests, stored as Decimal; the anchor is where the user
+# went still, and stays put until enough consecutive fixes land outside the stationary
+# radius from it (departure_fixes counts them)
+STATE_NUMBER_KEYS = (
+    'phase_time', 'last_moving', 'struggle_seconds', 'last_time',
+    'anchor_latitude', 'anchor_longitude', 'stationary_since', 'last_seen', 'departure_fixes',
+    'kalman_time', 'kalman_origin_latitude', 'kalman_origin_longitude', 'activity_time',
+    'route_started', 'route_last_time', 'off_route_since'
+)
+
+# Activity of the last classified window, before any has been
+ACTIVITY_UNKNOWN = 'unknown'
+
+
+def new_motion_state():
+    state = {
+        'phase': PHASE_IDLE,
+        'phase_time': 0.0,
+        'last_moving': 0.0,
+        'struggle_seconds': 0.0,
+        'last_time': 0.0,
+        'anchor_latitude': 0.0,
+        'anchor_longitude': 0.0,
+        'stationary_since': 0.0,
+        'last_seen': 0.0,
+        'departure_fixes': 0.0,
+        'activity': ACTIVITY_UNKNOWN,
+        'activity_time': 0.0,
+        'route_started': 0.0,
+        'route_last_time': 0.0,
+        'off_route_since': 0.0,
+        'version': 0
+    }
+    state.update(new_trajectory())
+    state.update(new_location_filter())
+    return state
+
+
+def advance_stationary(state, timestamp, latitude, longitude, radius_meters, departure_fixes=1):
+    """
+    Updates the stationary anchor with one position fix and returns how long, in seconds,
+    the user has stayed within radius_meters of it. Once departure_fixes consecutive fixes
+    land further away, the anchor moves to the latest and the clock restarts; fewer are
+    taken as noise. Returns None for a fix older than the last one seen, leaving the
+    state unchanged.
+    """
+    if timestamp < state['last_seen']:
+        return None
+    if not state['last_seen']:
+        state['departure_fixes'] = departure_fixes
+    elif haversine_meters(state['anchor_latitude'], state['anchor_longitude'], latitude, longitude) > radius_meters:
+        state['departure_fixes'] += 1
+    else:
+        state['departure_fixes'] = 0
+    if state['departure_fixes'] >= departure_fixes:
+        state['anchor_latitude'], state['anchor_longitude'] = latitude, longitude
+        state['stationary_since'] = timestamp
+        state['departure_fixes'] = 0
+    state['last_seen'] = timestamp
+    return timestamp - state['stationary_since']
+
+
+def advance_activity(state, timestamp, activity, memory_seconds):
+    """
+    Records the activity of a window ending at timestamp. Returns the previous activity when
+    it differs and was seen within memory_seconds, '' when there is no transition, or None
+    for a window not newer than the last one, leaving the state unchanged.
+    """
+    if timestamp <= state['activity_time']:
+        return None
+    previous = state['activity']
+    recent = timestamp - state['activity_time'] <= memory_seconds
+    state['activity'], state['activity_time'] = activity, timestamp
+    return previous if recent and previous not in (activity, ACTIVITY_UNKNOWN) else ''
+
+
+def advance_off_route(state, timestamp, distance_meters, corridor_meters):
+    """
+    Tracks how long the user has been outside the corridor around their expected route.
+    Returns the seconds spent off route so far (0 within the corridor), or None for a fix
+    older than the last one checked against the route, leaving the state unchanged.
+    """
+    if timestamp < state['route_last_time']:
+        return None
+    state['route_last_time'] = timestamp
+    if distance_meters <= corridor_meters:
+        state['off_route_since'] = 0.0
+        return 0.0
+    if not state['off_route_since']:
+        state['off_route_since'] = timestamp
+    return timestamp - state['off_route_since']
+
+
+def copy_motion_state(state):
+    """Copy that can be advanced without touching the original (the track ring and the filter are arrays)."""
+    copied = dict(state)
+    copied['track'] = state['track'].copy()
+    copied['kalman'] = state['kalman'].copy()
+    return copied
+
+
+def _true_runs(mask):
+    """Start and end (exclusive) indexes of each run of True values."""
+    edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def advance_fall_detector(state, times, magnitude, jerk, jerk_threshold):
+    """
+    Runs the fall and struggle detectors over one window and updates the state in place.
+    `times` are absolute sample times in seconds, `magnitude` the acceleration magnitude
+    (m/s^2) and `jerk` the jerk (m/s^3) of each step between samples.
+
+    Candidate events (long enough free-fall dips, impact peaks) are found with array
+    operations, then walked in time order through the idle -> freefall -> impact phases;
+    the loops run over events and one-second blocks, never over samples. A pattern that
+    straddles windows continues from the stored phase, so a fall is flagged in the window
+    where stillness is confirmed: the impact's own window, or the next one.
+
+    Returns (fall_detected, struggle_detected), or None when the window is not newer than
+    the state (a retry or an out-of-order window), in which case the state is unchanged.
+    """
+    if times[-1] <= state['last_time']:
+        return None
+    if times[0] - state['last_time'] > MAX_WINDOW_GAP_SECONDS:
+        initial = new_motion_state()
+        state.update({key: initial[key] for key in DETECTOR_KEYS})
+
+    magnitude_g = magnitude / STANDARD_GRAVITY
+    starts, ends = _true_runs(magnitude_g < FREEFALL_THRESHOLD_G)
+    long_enough = times[ends - 1] - times[starts] >= FREEFALL_MIN_SECONDS
+    freefall_ends = times[ends[long_enough] - 1]
+    is_peak = (magnitude_g[1:-1] > magnitude_g[:-2]) & (magnitude_g[1:-1] >= magnitude_g[2:])
+    impacts = times[1:-1][is_peak & (magnitude_g[1:-1] > IMPACT_THRESHOLD_G)]
+
+    events = sorted([(float(time), PHASE_FREEFALL) for time in freefall_ends] + [(float(time), PHASE_IMPACT) for time in impacts])
+    for time, kind in events:
+        if kind == PHASE_FREEFALL:
+            state['phase'], state['phase_time'] = PHASE_FREEFALL, time
+        elif state['phase'] == PHASE_FREEFALL and time - state['phase_time'] <= IMPACT_WINDOW_SECONDS:
+            state['phase'], state['phase_time'], state['last_moving'] = PHASE_IMPACT, time, time
+
+    fall_detected = False
+    window_end = float(times[-1])
+    if state['phase'] == PHASE_IMPACT:
+        settled = state['phase_time'] + SETTLE_SECONDS
+        moving = times[(np.abs(magnitude_g - 1.0) > STILL_TOLERANCE_G) & (times > settled)]
+        if len(moving):
+            state['last_moving'] = float(moving[-1])
+        if window_end - max(settled, state['last_moving']) >= STILLNESS_SECONDS:
+            fall_detected = True
+            state['phase'] = PHASE_IDLE
+        elif window_end - state['phase_time'] > FALL_CONFIRM_SECONDS:
+            state['phase'] = PHASE_IDLE
+    elif state['phase'] == PHASE_FREEFALL and window_end - state['phase_time'] > IMPACT_WINDOW_SECONDS:
+        state['phase'] = PHASE_IDLE
+
+    # Share of high-jerk steps in each block of the window
+    blocks = ((times[1:] - times[0]) // STRUGGLE_BLOCK_SECONDS).astype(np.int64)
+    high_jerk = np.bincount(blocks, weights=jerk > jerk_threshold)
+    steps = np.bincount(blocks)
+    active = high_jerk >= STRUGGLE_ACTIVE_FRACTION * np.maximum(steps, 1)
+    struggle_detected = False
+    streak = state['struggle_seconds']
+    for is_active in active:
+        streak = streak + STRUGGLE_BLOCK_SECONDS if is_active else 0.0
+        struggle_detected = struggle_detected or streak >= STRUGGLE_MIN_SECONDS
+    state['struggle_seconds'] = streak
+    state['last_time'] = window_end
+    return fall_detected, struggle_detected
+
+
+def motion_state_to_item(state):
+    """Serializes the state into compact DynamoDB attributes (numbers rounded to 7 decimals, ~1 cm for coordinates)."""
+    item = {key: Decimal(str(round(state[key], 7))) for key in STATE_NUMBER_KEYS}
+    item.update({
+        'phase': state['phase'],
+        'activity': state['activity'],
+        'version': state['version'],
+        'track': state['track'].tobytes(),
+        'track_head': state['track_head'],
+        'track_count': state['track_count'],
+        'kalman': state['kalman'].tobytes()
+    })
+    return item
+
+
+def motion_state_from_item(item):
+    state = new_motion_state()
+    for key in STATE_NUMBER_KEYS:
+        # Items written before a key existed fall back to its initial value
+        if key in item:
+            state[key] = float(item[key])
+    state['phase'] = item['phase']
+    state['activity'] = item.get('activity', ACTIVITY_UNKNOWN)
+    state['version'] = int(item['version'])
+    if 'track' in item:
+        # boto3 returns Binary attributes as a Binary wrapper; .value is the raw bytes
+        track = np.frombuffer(bytes(item['track'].value), dtype=np.float64)
+        state['track'] = track.reshape(TRAJECTORY_POINTS, len(TRAJECTORY_COLUMNS)).copy()
+        state['track_head'] = int(item['track_head'])
+        state['track_count'] = int(item['track_count'])
+    if 'kalman' in item:
+        state['kalman'] = np.frombuffer(bytes(item['kalman'].value), dtype=np.float64).reshape(FILTER_ROWS, 2).copy()
+    return state
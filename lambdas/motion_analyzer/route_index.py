@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+
+from trajectory import EARTH_RADIUS_METERS
+
+# Grid cell size; a fix on the route finds its segment in the 3 x 3 cells around it
+ROUTE_CELL_METERS = 100.0
+
+
+class RouteIndex:
+    """
+    Nearest-segment search over an expected route, a (vertices, 2) array of latitude and
+    longitude. Segments are bucketed into a square grid on a plane tangent at the first
+    vertex, and a query visits rings of cells outwards from the fix until no closer
+    segment can remain, so the work per fix depends on the route near the fix rather than
+    on its length.
+    """
+
+    def __init__(self, polyline, cell_meters=ROUTE_CELL_METERS):
+        polyline = np.asarray(polyline, dtype=np.float64).reshape(-1, 2)
+        self.cell_meters = cell_meters
+        self.origin_latitude, self.origin_longitude = polyline[0].tolist()
+        self._cos_origin = math.cos(math.radians(self.origin_latitude))
+        points = self._to_local(polyline[:, 0], polyline[:, 1])
+        if len(points) == 1:
+            points = np.vstack([points, points])
+        # Long straight stretches are split into pieces no longer than a cell, so each piece
+        # touches at most 2 x 2 cells however the route runs
+        deltas = points[1:] - points[:-1]
+        pieces = np.maximum(np.ceil(np.hypot(*deltas.T) / cell_meters), 1).astype(np.int64)
+        parent = np.repeat(np.arange(len(deltas)), pieces)
+        piece = np.arange(len(parent)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        piece_deltas = deltas[parent] / pieces[parent, None]
+        piece_starts = points[:-1][parent] + piece[:, None] * piece_deltas
+        # (pieces, 5) rows of start x, start y, delta x, delta y, squared length, gathered
+        # together for the candidates of a query
+        self.segments = np.column_stack([piece_starts, piece_deltas, np.maximum((piece_deltas ** 2).sum(axis=1), 1e-12)])
+
+        ends = piece_starts + piece_deltas
+        low = np.floor(np.minimum(piece_starts, ends) / cell_meters).astype(np.int64)
+        high = np.floor(np.maximum(piece_starts, ends) / cell_meters).astype(np.int64)
+        cells = {}
+        for segment, ((low_x, low_y), (high_x, high_y)) in enumerate(zip(low.tolist(), high.tolist())):
+            for cell_x in range(low_x, high_x + 1):
+                for cell_y in range(low_y, high_y + 1):
+                    cells.setdefault((cell_x, cell_y), []).append(segment)
+        self.cells = {cell: np.array(segments) for cell, segments in cells.items()}
+
+    def __len__(self):
+        return len(self.segments)
+
+    def _to_local(self, latitude, longitude):
+        """(x east, y north) in meters from the first vertex"""
+        return EARTH_RADIUS_METERS * np.column_stack([
+            np.radians(np.asarray(longitude) - self.origin_longitude) * self._cos_origin,
+            np.radians(np.asarray(latitude) - self.origin_latitude)
+        ])
+
+    def _nearest(self, segment_ids, x, y):
+        start_x, start_y, delta_x, delta_y, length_squared = self.segments[segment_ids].T
+        offset_x, offset_y = x - start_x, y - start_y
+        along = np.minimum(np.maximum((offset_x * delta_x + offset_y * delta_y) / length_squared, 0.0), 1.0)
+        return float(np.hypot(offset_x - along * delta_x, offset_y - along * delta_y).min())
+
+    def distance_meters(self, latitude, longitude, max_meters):
+        """
+        Distance from the fix to the nearest route segment, capped at max_meters: a fix
+        further away than that returns max_meters after visiting at most
+        (2 * ceil(max_meters / cell_meters) + 1) ** 2 cells.
+        """
+        x = EARTH_RADIUS_METERS * math.radians(longitude - self.origin_longitude) * self._cos_origin
+        y = EARTH_RADIUS_METERS * math.radians(latitude - self.origin_latitude)
+        cell_x, cell_y = math.floor(x / self.cell_meters), math.floor(y / self.cell_meters)
+        best = math.inf
+        max_ring = max(1, math.ceil(max_meters / self.cell_meters))
+        # The 3 x 3 block around the fix first, which settles any fix within a cell of the route
+        ring_cells = [(cell_x + dx, cell_y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        for ring in range(1, max_ring + 1):
+            if ring > 1:
+                # Cells on the square ring at Chebyshev distance `ring`
+                ring_cells = [(cell_x + dx, cell_y + ring * side) for side in (-1, 1) for dx in range(-ring, ring + 1)]
+                ring_cells += [(cell_x + ring * side, cell_y + dy) for side in (-1, 1) for dy in range(-ring + 1, ring)]
+            found = [self.cells[cell] for cell in ring_cells if cell in self.cells]
+            if found:
+                best = min(best, self._nearest(np.concatenate(found) if len(found) > 1 else found[0], x, y))
+            # Anything in a further ring is at least `ring` whole cells away
+            if best <= ring * self.cell_meters:
+                break
+        return min(best, max_meters)
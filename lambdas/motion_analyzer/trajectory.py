@@ -0,0 +1,108 @@
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000.0
+
+# Recent position fixes kept per user as a (TRAJECTORY_POINTS, 3) float64 ring of
+# (epoch seconds, latitude, longitude): 1.5 KB, stored as one Binary attribute
+TRAJECTORY_POINTS = 64
+TRAJECTORY_COLUMNS = ('time', 'latitude', 'longitude')
+
+# Sustained speed of a person on foot versus one in a vehicle (m/s)
+WALKING_MAX_SPEED = 2.5
+VEHICLE_MIN_SPEED = 8.0
+# The latest this many segments must all be at vehicle speed, without turning back more than
+# VEHICLE_MAX_TURN_DEGREES, so one GPS glitch (out and back again) is not a vehicle
+VEHICLE_MIN_SEGMENTS = 2
+VEHICLE_MAX_TURN_DEGREES = 60.0
+# Movement over this long before the fast segments must have been at walking pace
+PRIOR_SECONDS = 300.0
+
+
+def haversine_meters(latitude1, longitude1, latitude2, longitude2):
+    """Great-circle distances between points in degrees; scalars or arrays, broadcast together."""
+    phi1, phi2 = np.radians(latitude1), np.radians(latitude2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = np.radians(np.subtract(longitude2, longitude1)) / 2
+    a = np.sin(half_dphi) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def initial_bearing_degrees(latitude1, longitude1, latitude2, longitude2):
+    """Bearing from the first point towards the second, 0..360 clockwise from north."""
+    phi1, phi2 = np.radians(latitude1), np.radians(latitude2)
+    dlambda = np.radians(np.subtract(longitude2, longitude1))
+    y = np.sin(dlambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlambda)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def new_trajectory():
+    return {'track': np.zeros((TRAJECTORY_POINTS, len(TRAJECTORY_COLUMNS))), 'track_head': 0, 'track_count': 0}
+
+
+def append_fix(trajectory, timestamp, latitude, longitude):
+    """Adds a fix to the ring in place, overwriting the oldest; fixes not newer than the last are ignored."""
+    if trajectory['track_count'] and timestamp <= trajectory['track'][trajectory['track_head'] - 1, 0]:
+        return False
+    trajectory['track'][trajectory['track_head']] = (timestamp, latitude, longitude)
+    trajectory['track_head'] = (trajectory['track_head'] + 1) % TRAJECTORY_POINTS
+    trajectory['track_count'] = min(trajectory['track_count'] + 1, TRAJECTORY_POINTS)
+    return True
+
+
+def ordered_track(trajectory):
+    """The ring's fixes oldest first, as a (count, 3) array."""
+    count, head = trajectory['track_count'], trajectory['track_head']
+    if count < TRAJECTORY_POINTS:
+        return trajectory['track'][:count]
+    return np.roll(trajectory['track'], -head, axis=0)
+
+
+def segment_kinematics(track):
+    """
+    Distance (m), duration (s), speed (m/s) and bearing (degrees) of every segment between
+    consecutive fixes, plus the heading change (-180..180) at every interior fix, computed
+    over whole arrays.
+    """
+    times, latitudes, longitudes = track[:, 0], track[:, 1], track[:, 2]
+    distances = haversine_meters(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    durations = np.diff(times)
+    bearings = initial_bearing_degrees(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    return {
+        'distances': distances,
+        'durations': durations,
+        'speeds': distances / durations,
+        'bearings': bearings,
+        'heading_changes': (np.diff(bearings) + 180.0) % 360.0 - 180.0
+    }
+
+
+def analyze_trajectory(track):
+    """
+    Summary of a chronological track, flagging a sudden switch from walking pace to
+    vehicle speed: the last VEHICLE_MIN_SEGMENTS segments are fast and hold their heading,
+    while the PRIOR_SECONDS before them averaged walking pace or slower.
+    """
+    if len(track) < 2:
+        return None
+    kinematics = segment_kinematics(track)
+    speeds, durations, distances = kinematics['speeds'], kinematics['durations'], kinematics['distances']
+
+    speed_transition = False
+    n_fast = VEHICLE_MIN_SEGMENTS
+    if len(speeds) > n_fast:
+        recent_turns = np.abs(kinematics['heading_changes'][len(speeds) - n_fast:])
+        is_fast = bool((speeds[-n_fast:] >= VEHICLE_MIN_SPEED).all() and (recent_turns <= VEHICLE_MAX_TURN_DEGREES).all())
+        fast_start = track[-n_fast - 1, 0]
+        prior = track[1:-n_fast, 0] > fast_start - PRIOR_SECONDS
+        prior_speed = distances[:-n_fast][prior].sum() / durations[:-n_fast][prior].sum() if prior.any() else None
+        speed_transition = is_fast and prior_speed is not None and bool(prior_speed <= WALKING_MAX_SPEED)
+
+    return {
+        'speed_mps': float(speeds[-1]),
+        'max_speed_mps': float(speeds.max()),
+        'track_meters': float(distances.sum()),
+        'track_seconds': float(track[-1, 0] - track[0, 0]),
+        'max_heading_change': float(np.abs(kinematics['heading_changes']).max()) if len(speeds) > 1 else 0.0,
+        'speed_transition': speed_transition
+    }
@@ -4,6 +4,9 @@ import boto3
 import logging
 from datetime import datetime, timedelta
 
+from geofence import SafeZoneCache, SafeZoneIndex
+from safe_logging import log_payload
+
 # Configure logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(level=LOG_LEVEL)
@@ -54,6 +57,10 @@ CONTEXT_HIGH_RISK_AREA_BONUS = float(os.environ.get('CONTEXT_HIGH_RISK_AREA_BONU
 CONTEXT_ISOLATED_LOCATION_BONUS = float(os.environ.get('CONTEXT_ISOLATED_LOCATION_BONUS', '0.1'))
 LOCATION_ACCURACY_THRESHOLD_METERS = float(os.environ.get('LOCATION_ACCURACY_THRESHOLD_METERS', '100'))
 HIGH_RISK_AREA_PROXIMITY_DEGREE = float(os.environ.get('HIGH_RISK_AREA_PROXIMITY_DEGREE', '0.01')) # Approx 1.1km at equator per 0.01 degree
+SAFE_ZONE_DISCOUNT = float(os.environ.get('SAFE_ZONE_DISCOUNT', '0.8')) # Share of the context score dropped inside a safe zone
+# Built safe zone indexes, cached per container like the Motion Analyzer's
+SAFE_ZONE_CACHE_SIZE = int(os.environ.get('SAFE_ZONE_CACHE_SIZE', '1024'))
+SAFE_ZONE_CACHE_SECONDS = int(os.environ.get('SAFE_ZONE_CACHE_SECONDS', '300'))
 
 # Escalation factors
 ESCALATION_MULTI_TYPE_BONUS = float(os.environ.get('ESCALATION_MULTI_TYPE_BONUS', '0.4'))
@@ -62,6 +69,8 @@ ESCALATION_HIGH_SEVERITY_BONUS = float(os.environ.get('ESCALATION_HIGH_SEVERITY_
 ESCALATION_HIGH_SEVERITY_THRESHOLD = float(os.environ.get('ESCALATION_HIGH_SEVERITY_THRESHOLD', '0.6'))
 ESCALATION_HIGH_COUNT_THRESHOLD = int(os.environ.get('ESCALATION_HIGH_COUNT_THRESHOLD', '3'))
 
+safe_zone_indexes = SafeZoneCache(SAFE_ZONE_CACHE_SIZE, SAFE_ZONE_CACHE_SECONDS)
+
 
 def get_risk_level(score):
     if score >= THRESHOLD_CRITICAL:
@@ -103,8 +112,25 @@ def is_within_high_risk_area(user_location, high_risk_areas):
                 return True
     return False
 
+def find_safe_zones(user_id, user_location, safe_zones):
+    """
+    Names of the user's safe zones (UsersTable `safe_zones` polygons) containing the location, if any.
+    The index is built once per user and container and reused for SAFE_ZONE_CACHE_SECONDS.
+    """
+    if not user_location or not safe_zones:
+        return []
+    user_lat = user_location.get('latitude')
+    user_lon = user_location.get('longitude')
+    if user_lat is None or user_lon is None:
+        return []
+    index = safe_zone_indexes.get(user_id)
+    if index is None:
+        index = SafeZoneIndex(safe_zones)
+        safe_zone_indexes.put(user_id, index)
+    return index.zones_containing(float(user_lat), float(user_lon))
+
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # Risk Assessor is invoked directly by other Lambdas, so 'body' key is not expected
@@ -196,6 +222,12 @@ def lambda_handler(event, context):
                 if is_within_high_risk_area(user_current_location, user_profile['high_risk_areas']):
                     context_score += CONTEXT_HIGH_RISK_AREA_BONUS
 
+            # Night hours at home, work or college are not a risk factor of their own
+            safe_zones = find_safe_zones(user_id, user_current_location, user_profile.get('safe_zones'))
+            if safe_zones:
+                context_score *= 1.0 - SAFE_ZONE_DISCOUNT
+                logger.info(f"User {user_id} is in safe zone(s) {', '.join(safe_zones)}; context score discounted")
+
             # Add bonus for isolated location (if inferred, e.g., from lack of network/GPS signal, or known remote areas)
             # This would require more sophisticated logic, but adding a placeholder
             # if user_profile.get('is_isolated_location', False):
@@ -229,6 +261,7 @@ def lambda_handler(event, context):
                     'escalation_score': escalation_score,
                     'context_score': context_score,
                     'pattern_score': pattern_score,
+                    'safe_zones': safe_zones,
                     'assessment_time': datetime.utcnow().isoformat()
                 }
             )
@@ -0,0 +1,38 @@
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_WRITE_MAX_ITEMS = 25  # DynamoDB BatchWriteItem limit per request
+BATCH_WRITE_MAX_ATTEMPTS = 6
+BATCH_WRITE_BASE_DELAY_SECONDS = 0.05
+BATCH_WRITE_MAX_DELAY_SECONDS = 1.0
+
+
+def batch_put_items(dynamodb, table_name, items, max_attempts=BATCH_WRITE_MAX_ATTEMPTS):
+    """
+    Writes items with BatchWriteItem, 25 per request. Unprocessed items are resent
+    with capped exponential backoff and full jitter, as recommended for throttling.
+    `dynamodb` is a boto3 DynamoDB service resource, so items use plain Python types.
+    Returns the number of BatchWriteItem calls made; raises RuntimeError if items
+    are still unprocessed after max_attempts.
+    """
+    calls = 0
+    for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+        request_items = {
+            table_name: [{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_MAX_ITEMS]]
+        }
+        for attempt in range(max_attempts):
+            response = dynamodb.batch_write_item(RequestItems=request_items)
+            calls += 1
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                break
+            delay = min(BATCH_WRITE_MAX_DELAY_SECONDS, BATCH_WRITE_BASE_DELAY_SECONDS * (2 ** attempt))
+            unprocessed = sum(len(requests) for requests in request_items.values())
+            logger.warning(f"{unprocessed} unprocessed items for {table_name}, retrying (attempt {attempt + 1})")
+            time.sleep(random.uniform(0, delay))
+        else:
+            raise RuntimeError(f"BatchWriteItem to {table_name} left items unprocessed after {max_attempts} attempts")
+    return calls
@@ -0,0 +1,113 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Grid cells of 0.01 degrees are about 1.1 km north-south; a home or college zone touches
+# one to four of them
+GRID_CELL_DEGREES = 0.01
+# Zones covering more cells than this (a whole district) are candidates in every cell
+# instead of being copied into each one
+MAX_CELLS_PER_ZONE = 256
+
+
+class SafeZoneIndex:
+    """
+    Point-in-polygon index over one user's safe zones, built once and queried per fix.
+    `zones` is the UsersTable `safe_zones` list: {'name', 'polygon': [[latitude, longitude],
+    ...]} with at least three vertices, open or closed. Every grid cell that a zone's
+    bounding box touches lists the polygon edges of those zones, so a lookup is one dict
+    access followed by one vectorized ray-casting pass over the candidate edges.
+    """
+
+    def __init__(self, zones, cell_degrees=GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.names = []
+        polygons = []
+        for zone in zones or []:
+            polygon = [(float(latitude), float(longitude)) for latitude, longitude in zone.get('polygon') or []]
+            if len(polygon) > 3 and polygon[0] == polygon[-1]:
+                polygon.pop()
+            if len(polygon) < 3:
+                logger.warning(f"Safe zone {zone.get('name')!r} has fewer than 3 vertices; skipped")
+                continue
+            polygons.append(polygon)
+            self.names.append(zone.get('name') or f'zone {len(self.names) + 1}')
+
+        # All vertices in one array, zone after zone; each edge runs to the next vertex of its
+        # zone, and the last one back to the first
+        counts = np.array([len(polygon) for polygon in polygons], dtype=np.int64)
+        starts = np.cumsum(counts) - counts
+        vertices = np.array([vertex for polygon in polygons for vertex in polygon], dtype=np.float64).reshape(-1, 2)
+        following = np.arange(1, len(vertices) + 1)
+        following[starts + counts - 1] = starts
+        # (edges, 4) rows of latitude1, longitude1, latitude2, longitude2
+        self.edges = np.hstack([vertices, vertices[following]])
+        self.edge_zones = np.repeat(np.arange(len(polygons)), counts)
+        # (zones, 4) rows of minimum latitude, minimum longitude, maximum latitude, maximum longitude
+        self.boxes = np.hstack([np.minimum.reduceat(vertices, starts), np.maximum.reduceat(vertices, starts)]) if polygons else np.zeros((0, 4))
+
+        cell_zones, wide_zones = {}, []
+        first_cells = np.floor(self.boxes[:, :2] / cell_degrees).astype(np.int64)
+        last_cells = np.floor(self.boxes[:, 2:] / cell_degrees).astype(np.int64)
+        for zone_id, ((first_row, first_col), (last_row, last_col)) in enumerate(zip(first_cells.tolist(), last_cells.tolist())):
+            if (last_row - first_row + 1) * (last_col - first_col + 1) > MAX_CELLS_PER_ZONE:
+                wide_zones.append(zone_id)
+                continue
+            for row in range(first_row, last_row + 1):
+                for col in range(first_col, last_col + 1):
+                    cell_zones.setdefault((row, col), []).append(zone_id)
+        # Each zone's edges are contiguous, so a cell's candidates are a few ranges joined
+        zone_edges = np.split(np.arange(len(self.edges)), starts[1:])
+        self.wide_edges = np.concatenate([zone_edges[zone_id] for zone_id in wide_zones]) if wide_zones else np.zeros(0, dtype=np.int64)
+        self.cells = {
+            cell: np.concatenate([zone_edges[zone_id] for zone_id in zone_ids] + [self.wide_edges])
+            for cell, zone_ids in cell_zones.items()
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def zones_containing(self, latitude, longitude):
+        """Names of the zones containing the point, in registration order; [] outside all of them."""
+        cell = (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+        candidates = self.cells.get(cell, self.wide_edges)
+        if not len(candidates):
+            return []
+        edges = self.edges[candidates]
+        # Even-odd rule: count edges that straddle the point's latitude and cross the ray
+        # running east from it
+        straddles = (edges[:, 0] > latitude) != (edges[:, 2] > latitude)
+        edges = edges[straddles]
+        crossing_longitude = edges[:, 1] + (latitude - edges[:, 0]) * (edges[:, 3] - edges[:, 1]) / (edges[:, 2] - edges[:, 0])
+        crossings = np.bincount(self.edge_zones[candidates[straddles]][longitude < crossing_longitude], minlength=len(self.names))
+        return [self.names[zone_id] for zone_id in np.flatnonzero(crossings % 2)]
+
+
+class SafeZoneCache:
+    """
+    In-container LRU of built SafeZoneIndex objects per user. Entries expire after
+    ttl_seconds, so zones edited in the profile are picked up without a redeploy.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    def put(self, user_id, index):
+        self._entries[user_id] = (time.monotonic(), index)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
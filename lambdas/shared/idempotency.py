@@ -0,0 +1,89 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+# Dedupe records share the per-user state table, under this sort-key prefix
+DEDUPE_STATE_PREFIX = 'dedupe#'
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETED = 'completed'
+
+_deserializer = TypeDeserializer()
+
+
+def content_digest(*parts):
+    """128-bit BLAKE2b digest of bytes-like parts (numpy arrays hash their buffer without a copy)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Small in-container LRU of completed responses, keyed by request digest."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def claim_request(table, user_id, digest, ttl_seconds, stale_after_seconds):
+    """
+    Claims a request digest with one conditional PutItem. Returns None when this caller
+    now owns the request, or the existing dedupe record when it was seen before.
+    ReturnValuesOnConditionCheckFailure hands back that record with the failure, so a
+    duplicate costs a single round trip. An in-progress claim older than
+    stale_after_seconds (an invocation that crashed) can be taken over.
+    """
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={
+                'user_id': user_id,
+                'state_key': f"{DEDUPE_STATE_PREFIX}{digest}",
+                'status': STATUS_IN_PROGRESS,
+                'claimed_at': now,
+                'expires_at': now + ttl_seconds
+            },
+            ConditionExpression='attribute_not_exists(user_id) OR (#status = :in_progress AND claimed_at < :stale_before)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':in_progress': STATUS_IN_PROGRESS, ':stale_before': now - stale_after_seconds},
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        return None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Error responses bypass the resource layer, so the item is still in wire format
+        item = e.response.get('Item', {})
+        return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def complete_request(table, user_id, digest, response_body, ttl_seconds):
+    """Replaces the claim with the finished response so later duplicates can replay it."""
+    table.put_item(Item={
+        'user_id': user_id,
+        'state_key': f"{DEDUPE_STATE_PREFIX}{digest}",
+        'status': STATUS_COMPLETED,
+        'response_body': response_body,
+        'expires_at': int(time.time()) + ttl_seconds
+    })
+
+
+def release_request(table, user_id, digest):
+    """Drops a claim whose request failed, so a corrected retry is processed normally."""
+    table.delete_item(Key={'user_id': user_id, 'state_key': f"{DEDUPE_STATE_PREFIX}{digest}"})
@@ -0,0 +1,29 @@
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'SafeSakhi')
+
+
+def emit_metrics(metrics, units=None, dimensions=None, namespace=METRICS_NAMESPACE):
+    """
+    Publishes metrics with CloudWatch Embedded Metric Format: one JSON line on stdout,
+    which Lambda forwards to CloudWatch Logs and CloudWatch turns into metrics.
+    No API call is made, so this is safe on the request path.
+    `units` maps metric names to CloudWatch units; unlisted metrics are Counts.
+    """
+    units = units or {}
+    dimensions = dimensions or {'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions.keys())],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'Count')} for name in metrics]
+            }]
+        }
+    }
+    record.update(dimensions)
+    record.update(metrics)
+    print(json.dumps(record), flush=True)
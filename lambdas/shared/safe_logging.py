@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+
+# Fields that carry evidence, audio or credentials: never logged verbatim
+SENSITIVE_KEYS = frozenset({
+    'audio_data_base64',
+    'text_input',
+    'emergency_contacts',
+    'authorization',
+    'x-api-key',
+    'x-amz-security-token'
+})
+
+# Raw API Gateway bodies are logged separately once parsed, so only their size is kept
+RAW_BODY_KEYS = frozenset({'body'})
+
+MAX_LOGGED_STRING_CHARS = 256
+MAX_HASHED_STRING_CHARS = 16 * 1024
+
+
+def summarize_value(value):
+    """Replaces a value with its type, size and (for small strings) a short content hash."""
+    if isinstance(value, str):
+        if len(value) <= MAX_HASHED_STRING_CHARS:
+            digest = hashlib.sha256(value.encode('utf-8', 'replace')).hexdigest()[:12]
+            return f'<redacted str len={len(value)} sha256={digest}>'
+        return f'<redacted str len={len(value)}>'
+    if isinstance(value, (list, tuple, dict)):
+        return f'<redacted {type(value).__name__} len={len(value)}>'
+    return f'<redacted {type(value).__name__}>'
+
+
+def redact(payload, sensitive_keys=SENSITIVE_KEYS):
+    """Returns a copy of payload that is safe and cheap to log."""
+    if isinstance(payload, dict):
+        redacted = {}
+        for key, value in payload.items():
+            lowered = str(key).lower()
+            if lowered in sensitive_keys:
+                redacted[key] = summarize_value(value)
+            elif lowered in RAW_BODY_KEYS and isinstance(value, str):
+                redacted[key] = f'<body str len={len(value)}>'
+            else:
+                redacted[key] = redact(value, sensitive_keys)
+        return redacted
+    if isinstance(payload, (list, tuple)):
+        return [redact(item, sensitive_keys) for item in payload]
+    if isinstance(payload, str) and len(payload) > MAX_LOGGED_STRING_CHARS:
+        return f'{payload[:MAX_LOGGED_STRING_CHARS]}...<truncated len={len(payload)}>'
+    return payload
+
+
+class RedactedPayload:
+    """Defers redaction and JSON serialization until a log record is actually formatted."""
+
+    __slots__ = ('payload', 'sensitive_keys')
+
+    def __init__(self, payload, sensitive_keys=SENSITIVE_KEYS):
+        self.payload = payload
+        self.sensitive_keys = sensitive_keys
+
+    def __str__(self):
+        return json.dumps(redact(self.payload, self.sensitive_keys), default=str)
+
+
+def log_payload(logger, message, payload, level=logging.INFO, sensitive_keys=SENSITIVE_KEYS):
+    """Logs a redacted payload; does no work at all when the level is disabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, '%s: %s', message, RedactedPayload(payload, sensitive_keys))
@@ -0,0 +1,57 @@
+import time
+
+# Sampling tiers, calmest first
+SAMPLING_IDLE = 'idle'
+SAMPLING_ACTIVE = 'active'
+SAMPLING_ESCALATED = 'escalated'
+SAMPLING_TIERS = (SAMPLING_IDLE, SAMPLING_ACTIVE, SAMPLING_ESCALATED)
+
+
+class SamplingPolicy:
+    """
+    Tells a client how often to sample and how many readings to send per request, from the
+    threat score just computed and the least busy tier the caller's risk state allows.
+    `tiers` maps each tier to (seconds between readings, readings per request). Scores at or
+    above active_score or escalated_score select the busier tiers.
+
+    An escalation comes with a `hold_until` epoch that the client echoes back on its next
+    requests, so one calm reading does not drop it straight back to idle. The hold costs the
+    server no state, and a client can only keep itself busy with it, for at most
+    hold_seconds from now.
+    """
+
+    def __init__(self, tiers, active_score, escalated_score, hold_seconds):
+        self.tiers = tiers
+        self.active_score = active_score
+        self.escalated_score = escalated_score
+        self.hold_seconds = hold_seconds
+
+    def recommend(self, threat_score, hold_until=None, floor=SAMPLING_IDLE, now=None):
+        """
+        The `sampling` object for a response: {'tier', 'interval_seconds', 'batch_size',
+        'hold_until'}. `hold_until` is the client's echoed value (anything unparseable counts
+        as none), `floor` the least busy tier allowed.
+        """
+        now = time.time() if now is None else now
+        try:
+            hold_until = min(float(hold_until or 0), now + self.hold_seconds)
+        except (TypeError, ValueError):
+            hold_until = 0.0
+
+        tier = SAMPLING_TIERS.index(floor)
+        if threat_score >= self.active_score:
+            tier = max(tier, SAMPLING_TIERS.index(SAMPLING_ACTIVE))
+        if threat_score >= self.escalated_score:
+            hold_until = now + self.hold_seconds
+        if hold_until > now:
+            tier = SAMPLING_TIERS.index(SAMPLING_ESCALATED)
+        else:
+            hold_until = 0.0
+
+        interval_seconds, batch_size = self.tiers[SAMPLING_TIERS[tier]]
+        return {
+            'tier': SAMPLING_TIERS[tier],
+            'interval_seconds': interval_seconds,
+            'batch_size': batch_size,
+            'hold_until': int(hold_until)
+        }
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000.0
+
+
+def _local_meters(track):
+    """(x, y) in meters on a plane tangent at the track's mean latitude; accurate to well under 1% over tens of km."""
+    latitudes, longitudes = np.radians(track[:, 1]), np.radians(track[:, 2])
+    x = EARTH_RADIUS_METERS * (longitudes - longitudes[0]) * np.cos(latitudes.mean())
+    y = EARTH_RADIUS_METERS * (latitudes - latitudes[0])
+    return np.column_stack([x, y])
+
+
+def _synchronized_distances(times, points, first, last):
+    """
+    Distance from each fix strictly between first and last to where the straight segment
+    first -> last puts the user at that fix's time (synchronized Euclidean distance).
+    """
+    span = times[last] - times[first]
+    fraction = (times[first + 1:last] - times[first]) / span if span > 0 else np.zeros(last - first - 1)
+    expected = points[first] + fraction[:, None] * (points[last] - points[first])
+    return np.hypot(*(points[first + 1:last] - expected).T)
+
+
+def simplify_track(track, tolerance_meters):
+    """
+    Ramer-Douglas-Peucker over a chronological (n, 3) array of (epoch seconds, latitude,
+    longitude). Returns the sorted indexes of the fixes to keep, always including the first
+    and last. Distances are synchronized: a dropped fix lies within tolerance_meters of the
+    position interpolated in time between the kept fixes around it, so interpolate_track
+    rebuilds both the path and when the user was where. Each split is one vectorized pass
+    over the fixes of a segment; the loop runs over segments.
+    """
+    n = len(track)
+    if n <= 2:
+        return np.arange(n)
+    times, points = track[:, 0], _local_meters(track)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    segments = [(0, n - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+        distances = _synchronized_distances(times, points, first, last)
+        split = int(np.argmax(distances))
+        if distances[split] > tolerance_meters:
+            split += first + 1
+            keep[split] = True
+            segments.append((first, split))
+            segments.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def interpolate_track(kept, times):
+    """Positions at the given times, linearly interpolated between kept fixes: a (len(times), 3) array."""
+    times = np.asarray(times, dtype=np.float64)
+    return np.column_stack([times, np.interp(times, kept[:, 0], kept[:, 1]), np.interp(times, kept[:, 0], kept[:, 2])])
+
+
+def track_error_meters(track, kept_indexes):
+    """Largest great-circle distance between each original fix and its interpolated position."""
+    rebuilt = interpolate_track(track[kept_indexes], track[:, 0])
+    phi1, phi2 = np.radians(track[:, 1]), np.radians(rebuilt[:, 1])
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(rebuilt[:, 2] - track[:, 2]) / 2) ** 2
+    return float((2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).max())
+
+
+def track_to_attribute(track):
+    """Fixes as a DynamoDB list of [epoch, latitude, longitude]; 6 decimals is ~10 cm."""
+    return [[int(time), Decimal(str(round(latitude, 6))), Decimal(str(round(longitude, 6)))] for time, latitude, longitude in track.tolist()]
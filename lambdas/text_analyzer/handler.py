@@ -6,6 +6,8 @@ import re
 from datetime import datetime
 from decimal import Decimal
 
+from safe_logging import log_payload
+
 # Configure logging
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(level=LOG_LEVEL)
@@ -119,7 +121,7 @@ def calculate_text_threat_score(text_input, sentiment, key_phrases, entities, me
 
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event, default=str)}")
+    log_payload(logger, "Received event", event)
 
     try:
         # API Gateway Proxy Integration puts the body as a string under 'body' key
@@ -128,7 +130,7 @@ def lambda_handler(event, context):
         else:
             body_data = event # For direct Lambda invocation or other triggers
 
-        logger.info(f"Parsed body data: {json.dumps(body_data, default=str)}")
+        log_payload(logger, "Parsed body data", body_data)
 
         user_id = body_data.get('user_id')
         timestamp = body_data.get('timestamp')
@@ -0,0 +1,65 @@
+"""
+Measures peak Python allocations while /audio-input handles one large clip.
+
+    python scripts/bench_audio_payload_memory.py [MB ...]   # default: 1 5 10
+
+For each size, a request body with that many megabytes of random 16 kHz PCM is built first
+(the Lambda runtime already holds the event), then lambda_handler runs under tracemalloc
+with the tables and Lambda client replaced by the in-memory stand-ins from memory_tables.
+One warm-up request runs first, as on a warm container. The reported peak is what the
+handler itself allocates on top of the event: the decoded buffer, the canonical-rate copy
+and the analysis.
+"""
+import argparse
+import base64
+import gc
+import json
+import sys
+import tracemalloc
+
+import numpy as np
+
+from local_env import use_lambda
+from memory_tables import install_memory_backends
+
+use_lambda('audio_processor')
+
+import handler  # noqa: E402
+
+
+def peak_allocations(megabytes, seed=0):
+    """(status code, peak MB allocated by lambda_handler) for a random clip of `megabytes` decoded bytes."""
+    pcm = np.random.default_rng(seed).integers(-2 ** 15, 2 ** 15, megabytes * 2 ** 19, dtype=np.int16)
+    event = {'body': json.dumps({
+        'user_id': f'bench-{megabytes}', 'timestamp': 1700000000,
+        'audio_data_base64': base64.b64encode(pcm.tobytes()).decode()
+    })}
+    del pcm
+    gc.collect()
+    tracemalloc.start()
+    response = handler.lambda_handler(event, None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return response['statusCode'], peak / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sizes', nargs='*', type=int, default=[1, 5, 10], help='decoded clip sizes in MB')
+    args = parser.parse_args(argv)
+
+    install_memory_backends(handler, {
+        'audio_analysis_table': (handler.AUDIO_ANALYSIS_TABLE_NAME, ('user_id', 'timestamp')),
+        'user_state_table': (handler.USER_STATE_TABLE_NAME, ('user_id', 'state_key'))
+    })
+    # Caches built on first use (filterbanks, windows) belong to the container, not the request
+    peak_allocations(1, seed=1)
+    print(f"{'decoded clip':>12}  {'status':>6}  peak allocations")
+    for megabytes in args.sizes:
+        status, peak = peak_allocations(megabytes)
+        print(f"{megabytes:>9} MB  {status:>6}  {peak:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
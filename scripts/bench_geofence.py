@@ -0,0 +1,96 @@
+"""
+Times geofence.SafeZoneIndex lookups against a linear scan and checks they agree.
+
+    python scripts/bench_geofence.py [--zones 10 100 500 1000]
+
+For each count, random star-shaped zones of 4-40 vertices and 50-400 m across are
+scattered over a 30 km city, plus one 12 km district-sized zone, with vertices as Decimal
+the way they come out of UsersTable. Lookups are timed for points near every zone and 500
+points anywhere in the city, and compared with an even-odd ray cast over every edge of
+every zone in plain Python. Every point must give the same zones both ways.
+"""
+import argparse
+import math
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from local_env import use_lambda
+
+use_lambda('shared')
+
+from geofence import SafeZoneIndex  # noqa: E402
+
+CITY_LATITUDE, CITY_LONGITUDE, CITY_SPREAD_KM = 28.6, 77.2, 15.0
+METERS_PER_DEGREE = 111195.0
+RANDOM_POINTS = 500
+
+
+def star_polygon(latitude, longitude, radius_meters, vertices, rng):
+    """A simple polygon with vertices at sorted random angles and random radii."""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = radius_meters * rng.uniform(0.4, 1.0, vertices)
+    return np.column_stack([
+        latitude + radii * np.cos(angles) / METERS_PER_DEGREE,
+        longitude + radii * np.sin(angles) / (METERS_PER_DEGREE * math.cos(math.radians(latitude)))
+    ])
+
+
+def city_zones(count, rng):
+    zones = []
+    for index in range(count):
+        latitude = CITY_LATITUDE + rng.uniform(-1, 1) * CITY_SPREAD_KM / 111.2
+        longitude = CITY_LONGITUDE + rng.uniform(-1, 1) * CITY_SPREAD_KM / 97.6
+        polygon = star_polygon(latitude, longitude, rng.uniform(50, 400), int(rng.integers(4, 40)), rng)
+        zones.append({'name': f'zone {index}', 'polygon': [[Decimal(str(round(a, 7))), Decimal(str(round(b, 7)))] for a, b in polygon]})
+    zones.append({'name': 'district', 'polygon': star_polygon(CITY_LATITUDE, CITY_LONGITUDE, 12000, 60, rng).tolist()})
+    return zones
+
+
+def linear_scan(zones, latitude, longitude):
+    """Names of the zones containing the point, by ray casting every edge in Python."""
+    names = []
+    for zone in zones:
+        polygon = [(float(a), float(b)) for a, b in zone['polygon']]
+        inside = False
+        for (y1, x1), (y2, x2) in zip(polygon, polygon[1:] + polygon[:1]):
+            if (y1 > latitude) != (y2 > latitude) and longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        if inside:
+            names.append(zone['name'])
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--zones', type=int, nargs='+', default=[10, 100, 500, 1000])
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(3)
+    for count in args.zones:
+        zones = city_zones(count, rng)
+        started = time.perf_counter()
+        index = SafeZoneIndex(zones)
+        build_ms = (time.perf_counter() - started) * 1e3
+
+        near = [np.array(zone['polygon'], dtype=float).mean(axis=0) + rng.normal(0, 0.002, 2) for zone in zones[:-1]]
+        anywhere = np.column_stack([
+            CITY_LATITUDE + rng.uniform(-0.15, 0.15, RANDOM_POINTS), CITY_LONGITUDE + rng.uniform(-0.17, 0.17, RANDOM_POINTS)
+        ])
+        points = [tuple(map(float, point)) for point in [*near, *anywhere]]
+
+        started = time.perf_counter()
+        found = [index.zones_containing(*point) for point in points]
+        lookup_us = (time.perf_counter() - started) / len(points) * 1e6
+        started = time.perf_counter()
+        expected = [linear_scan(zones, *point) for point in points]
+        scan_us = (time.perf_counter() - started) / len(points) * 1e6
+        mismatches = sum(sorted(a) != sorted(b) for a, b in zip(found, expected))
+        print(f"{count:5d} zones: build {build_ms:6.1f} ms, lookup {lookup_us:5.1f} us, linear scan {scan_us:8.1f} us, "
+              f"{mismatches} of {len(points)} points disagree, {sum(map(bool, found))} inside a zone")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Times MFCC extraction on one core and across the process pool, and checks they agree.
+
+    python scripts/bench_mfcc.py [--seconds S] [--workers 1 2 4] [--repeats N]
+
+A clip of white noise at the canonical rate goes through mfcc.compute_mfcc_parallel with
+each worker count (1 is the single-core compute_mfcc path). The first call per count is a
+warm-up, which also starts the pool. The script prints the largest difference between the
+pooled and single-core output, which should be exactly 0, and the memoized mel filterbank
+and DCT lookups against building them. Pool timings only mean something on a machine with
+as many free cores as workers; the script prints the core count it saw.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from local_env import use_lambda
+
+use_lambda('audio_processor')
+
+import mfcc  # noqa: E402
+from resample import CANONICAL_SAMPLE_RATE  # noqa: E402
+
+
+def milliseconds(call, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        call()
+    return (time.perf_counter() - started) / repeats * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=120.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    samples = (np.random.default_rng(0).standard_normal(int(CANONICAL_SAMPLE_RATE * args.seconds)) * 3000).astype(np.int16)
+    single = mfcc.compute_mfcc(samples)
+    print(f"{args.seconds:.0f} s clip at {CANONICAL_SAMPLE_RATE} Hz, {single.shape[0]} frames, {os.cpu_count()} CPU(s) available")
+    for workers in args.workers:
+        pooled = mfcc.compute_mfcc_parallel(samples, workers=workers)
+        elapsed = milliseconds(lambda: mfcc.compute_mfcc_parallel(samples, workers=workers), args.repeats)
+        print(f"  {workers} worker(s): {elapsed:.1f} ms, max difference from single core {np.abs(pooled - single).max()}")
+
+    n_fft = mfcc.FRAME_LENGTH
+    built = milliseconds(lambda: (
+        mfcc.get_mel_filterbank.__wrapped__(CANONICAL_SAMPLE_RATE, n_fft, mfcc.N_MELS),
+        mfcc.get_dct_matrix.__wrapped__(mfcc.N_MELS, mfcc.N_MFCC)
+    ), 100)
+    cached = milliseconds(lambda: (
+        mfcc.get_mel_filterbank(CANONICAL_SAMPLE_RATE, n_fft, mfcc.N_MELS),
+        mfcc.get_dct_matrix(mfcc.N_MELS, mfcc.N_MFCC)
+    ), 100)
+    print(f"Mel filterbank + DCT matrix: {built * 1e3:.0f} us to build, {cached * 1e3:.2f} us memoized")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Compares batched /motion-input requests with sending the same readings one at a time.
+
+    python scripts/bench_motion_batch.py [--repeats N]
+
+Correctness: a 24-reading walk-to-car trip at night, with a 5 s sensor window per reading
+(every fifth one a struggle), goes once as single requests and once, shuffled, as one
+batch for another user. Scores and stored rows must match, leaving out the coordinates
+the batch path drops within MOTION_TRACK_TOLERANCE_METERS.
+
+Cost: 60 readings (15 minutes at 15 s) as single requests and as one batch, with and
+without sensor windows, counting DynamoDB writes and Risk Assessor invocations and
+timing CPU per reading on a warm container. The last line adds 8 ms per DynamoDB call and
+20 ms per invocation. Those round trips are assumptions, not measurements.
+"""
+import argparse
+import base64
+import json
+import math
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from motion_scenarios import local_time_epoch, motion_handler, readings, track
+
+handler, dynamodb, lambda_client = motion_handler()
+
+DYNAMODB_CALL_MS, INVOKE_MS = 8.0, 20.0
+WINDOW_RATE_HZ, WINDOW_SAMPLES = 50.0, 250
+
+
+def sensor_window(struggle, rng):
+    """A base64 packed window: gravity plus light noise, or violent shaking."""
+    t = np.arange(WINDOW_SAMPLES) / WINDOW_RATE_HZ
+    acceleration = np.zeros((WINDOW_SAMPLES, 3))
+    acceleration[:, 2] = 9.81
+    acceleration += rng.normal(0, 12.0 if struggle else 0.3, acceleration.shape)
+    window = np.column_stack([t, acceleration, rng.normal(0, 0.1, (WINDOW_SAMPLES, 3))]).astype('<f4')
+    return base64.b64encode(window.tobytes()).decode()
+
+
+def trip(legs, windows, rng):
+    trip_readings = readings(track(legs, start=local_time_epoch(22)))
+    if windows:
+        for index, reading in enumerate(trip_readings):
+            del reading['motion_activity']
+            reading['sensor_window'] = sensor_window(index % 5 == 4, rng)
+    return trip_readings
+
+
+def send_singly(user_id, trip_readings):
+    return [
+        json.loads(handler.lambda_handler(dict(reading, user_id=user_id), None)['body'])['threat_score']
+        for reading in trip_readings
+    ]
+
+
+def send_batch(user_id, trip_readings):
+    body = json.loads(handler.lambda_handler({'body': json.dumps({'user_id': user_id, 'readings': trip_readings})}, None)['body'])
+    return body['threat_scores']
+
+
+def stored_rows(user_id):
+    ignored = ('user_id', 'analysis_time', 'location')
+    return {
+        key[1]: {name: value for name, value in item.items() if name not in ignored}
+        for key, item in handler.motion_analysis_table.items.items() if key[0] == user_id
+    }
+
+
+def same_values(first, second):
+    """
+    Equal, with numbers compared to 1e-5 relative: classifying one window or a batch of
+    them can round the last float32 bit differently.
+    """
+    if isinstance(first, dict) and isinstance(second, dict):
+        return first.keys() == second.keys() and all(same_values(first[key], second[key]) for key in first)
+    if isinstance(first, Decimal) and isinstance(second, Decimal):
+        return math.isclose(first, second, rel_tol=1e-5)
+    return first == second
+
+
+def write_calls():
+    return handler.motion_analysis_table.calls['put_item'] + handler.user_state_table.calls['put_item'] + dynamodb.batch_calls
+
+
+def check_batch_matches_singles(rng):
+    trip_readings = trip([(1.3, 300, 90), (12.0, 60, 95)], True, rng)
+    single = send_singly('singly', trip_readings)
+    shuffled = list(trip_readings)
+    rng.shuffle(shuffled)
+    gets_before = handler.user_state_table.calls['get_item']
+    writes_before, invokes_before = write_calls(), len(lambda_client.invocations)
+    batch_scores = send_batch('batched', shuffled)
+    by_time = dict(zip((reading['created_at_epoch'] for reading in shuffled), batch_scores))
+    batch = [by_time[reading['created_at_epoch']] for reading in trip_readings]
+    print(f"{len(trip_readings)} readings: batch scores match single requests: {np.allclose(single, batch)} "
+          f"(max difference {np.max(np.abs(np.subtract(single, batch))):.1e}); "
+          f"stored rows match: {same_values(stored_rows('singly'), stored_rows('batched'))}")
+    print(f"  batch cost: {handler.user_state_table.calls['get_item'] - gets_before} state read(s), "
+          f"{write_calls() - writes_before} write call(s), {len(lambda_client.invocations) - invokes_before} invocation(s)")
+
+
+def cost(send, trip_readings, repeats, label):
+    """(CPU ms, write calls, invocations) per request group, averaged over repeats, as new users on a warm container."""
+    writes_before, invokes_before = write_calls(), len(lambda_client.invocations)
+    started = time.process_time()
+    for repeat in range(repeats):
+        send(f'{label}-{repeat}', trip_readings)
+    cpu_ms = (time.process_time() - started) / repeats * 1e3
+    return cpu_ms, (write_calls() - writes_before) / repeats, (len(lambda_client.invocations) - invokes_before) / repeats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(1)
+    check_batch_matches_singles(rng)
+
+    for windows in (False, True):
+        trip_readings = trip([(1.3, 900, 90)], windows, rng)
+        n = len(trip_readings)
+        print(f"{n} walking readings {'with' if windows else 'without'} sensor windows:")
+        results = {}
+        for label, send in (('single', send_singly), ('batch', send_batch)):
+            cpu_ms, writes, invokes = results[label] = cost(send, trip_readings, args.repeats, f'{label}-{windows}')
+            print(f"  {label:<6} {cpu_ms:7.1f} ms CPU, {writes:4.0f} write calls, {invokes:3.0f} invocations")
+        per_second = {
+            label: (n / cpu_ms * 1e3, n / (cpu_ms + writes * DYNAMODB_CALL_MS + invokes * INVOKE_MS) * 1e3)
+            for label, (cpu_ms, writes, invokes) in results.items()
+        }
+        print(f"  readings per Lambda-second: CPU only {per_second['single'][0]:,.0f} -> {per_second['batch'][0]:,.0f}; "
+              f"with assumed round trips {per_second['single'][1]:,.0f} -> {per_second['batch'][1]:,.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Times request logging: safe_logging.log_payload against the json.dumps logging it replaced.
+
+    python scripts/bench_payload_logging.py [--repeats N]
+
+Each handler logs twice per request, the raw event and the parsed body. Both are timed
+for a 5 s audio clip (160 KB of PCM as base64, plus an Authorization header) and a
+5,000-character text input, with the logger at INFO and at WARNING. Records go to an
+in-memory stream, so the times cover formatting and redaction but not CloudWatch.
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+from local_env import use_lambda
+
+use_lambda('shared')
+
+from safe_logging import log_payload  # noqa: E402
+
+
+def requests():
+    """(name, API Gateway event, parsed body) for the two request shapes timed."""
+    audio_body = {
+        'user_id': 'bench', 'timestamp': 1700000000, 'volume_level': 0.5,
+        'audio_data_base64': base64.b64encode(os.urandom(160000)).decode()
+    }
+    text_body = {'user_id': 'bench', 'timestamp': 1700000000, 'text_input': 'x' * 5000}
+    return [
+        ('5 s audio clip', {'body': json.dumps(audio_body), 'headers': {'Authorization': 'Bearer token'}}, audio_body),
+        ('5000-char text', {'body': json.dumps(text_body)}, text_body)
+    ]
+
+
+def microseconds(call, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        call()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    logger = logging.getLogger('bench_payload_logging')
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+    logger.propagate = False
+    print(f"{'level':<8}{'request':<16}{'json.dumps':>12}{'log_payload':>13}  (per request, two log calls)")
+    for level in (logging.INFO, logging.WARNING):
+        logger.setLevel(level)
+        for name, event, body in requests():
+            before = microseconds(lambda: (
+                logger.info(f"Received event: {json.dumps(event)}"),
+                logger.info(f"Parsed body data: {json.dumps(body)}")
+            ), args.repeats)
+            after = microseconds(lambda: (
+                log_payload(logger, 'Received event', event),
+                log_payload(logger, 'Parsed body data', body)
+            ), args.repeats)
+            print(f"{logging.getLevelName(level):<8}{name:<16}{before:>9.1f} us{after:>10.1f} us")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
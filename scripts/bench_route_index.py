@@ -0,0 +1,88 @@
+"""
+Times route_index.RouteIndex distance queries against a linear scan and checks they agree.
+
+    python scripts/bench_route_index.py [--vertices 100 1000 5000 20000]
+
+For each size a meandering street route with 10 m between vertices is indexed. Then 300
+fixes each are queried on the route (10 m GPS noise), about 150 m off it and about 2 km
+off it, with the handler's ROUTE_DEVIATION_FULL_METERS beyond the corridor as the search
+limit. A numpy scan over every segment in the same local projection gives the reference
+distance; the largest difference from the index (both capped at the limit) is printed.
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from local_env import use_lambda
+
+use_lambda('motion_analyzer')
+
+from route_index import RouteIndex  # noqa: E402
+from trajectory import EARTH_RADIUS_METERS  # noqa: E402
+
+METERS_PER_DEGREE = 111195.0
+START_LATITUDE, START_LONGITUDE = 28.6, 77.2
+SEARCH_LIMIT_METERS = 550.0
+FIXES_PER_DISTANCE = 300
+OFFSETS_METERS = {'on route': 10.0, '150 m off': 150.0, '2 km off': 2000.0}
+
+
+def street_route(vertices, rng, step_meters=10.0):
+    """A wandering route with a right-angle turn chance every 40 vertices, as (n, 2) latitude/longitude."""
+    heading = np.cumsum(rng.normal(0, 0.25, vertices))
+    heading[::40] += rng.choice([-np.pi / 2, 0.0, np.pi / 2], len(heading[::40]))
+    north, east = np.cumsum(step_meters * np.cos(heading)), np.cumsum(step_meters * np.sin(heading))
+    return np.column_stack([
+        START_LATITUDE + north / METERS_PER_DEGREE,
+        START_LONGITUDE + east / (METERS_PER_DEGREE * math.cos(math.radians(START_LATITUDE)))
+    ])
+
+
+def linear_distance(route, latitude, longitude):
+    """Distance from a fix to the nearest route segment, scanning every segment with numpy."""
+    origin = route[0]
+    scale = math.cos(math.radians(origin[0]))
+    points = EARTH_RADIUS_METERS * np.column_stack([np.radians(route[:, 1] - origin[1]) * scale, np.radians(route[:, 0] - origin[0])])
+    fix = EARTH_RADIUS_METERS * np.array([math.radians(longitude - origin[1]) * scale, math.radians(latitude - origin[0])])
+    starts, steps = points[:-1], points[1:] - points[:-1]
+    along = np.clip(((fix - starts) * steps).sum(axis=1) / np.maximum((steps * steps).sum(axis=1), 1e-12), 0, 1)
+    return float(np.hypot(*((fix - starts) - along[:, None] * steps).T).min())
+
+
+def microseconds_per_query(index, fixes):
+    started = time.perf_counter()
+    for latitude, longitude in fixes:
+        index.distance_meters(latitude, longitude, SEARCH_LIMIT_METERS)
+    return (time.perf_counter() - started) / len(fixes) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vertices', type=int, nargs='+', default=[100, 1000, 5000, 20000])
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(5)
+    for vertices in args.vertices:
+        route = street_route(vertices, rng)
+        started = time.perf_counter()
+        index = RouteIndex(route)
+        build_ms = (time.perf_counter() - started) * 1e3
+
+        picks = route[rng.integers(0, vertices, FIXES_PER_DISTANCE)]
+        fixes = {name: picks + rng.normal(0, offset / METERS_PER_DEGREE, picks.shape) for name, offset in OFFSETS_METERS.items()}
+        timings = ', '.join(f"{name} {microseconds_per_query(index, points):5.1f} us" for name, points in fixes.items())
+        every_fix = np.vstack(list(fixes.values()))
+        started = time.perf_counter()
+        reference = [min(linear_distance(route, *fix), SEARCH_LIMIT_METERS) for fix in every_fix]
+        linear_us = (time.perf_counter() - started) / len(every_fix) * 1e6
+        error = max(abs(min(index.distance_meters(*fix, SEARCH_LIMIT_METERS), SEARCH_LIMIT_METERS) - expected)
+                    for fix, expected in zip(every_fix, reference))
+        print(f"{vertices:6d} vertices ({len(index):6d} pieces), build {build_ms:6.1f} ms | per query: {timings} | "
+              f"linear scan {linear_us:7.1f} us | max difference {error:.1e} m")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
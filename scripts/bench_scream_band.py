@@ -0,0 +1,147 @@
+"""
+Checks that the scream detector rejects loud noise, and times the frame-feature pass behind it.
+
+    python scripts/bench_scream_band.py [--seconds S] [--repeats N]
+
+Noise rejection: loud white noise, 1-4 kHz hiss, pink noise and brown noise (traffic and
+wind rumble) go through the handler's own path at the common 16 kHz client rate:
+to_canonical, gate_silence, analyze_clip, then feature_threat_bonus and
+calculate_audio_threat_score with no client fields. So do synthetic screams, a vowel held
+at 700-1400 Hz with vibrato and pitch jitter, clean and in background noise. Each line gives
+the mean scream_ratio and scream_flatness, the share of frames counted as screaming, the
+feature bonus (shout and scream frames) and the threat score. The script exits with status
+1 if any noise clip gets scream frames, a feature bonus or a threat score at
+THREAT_SCORE_TRIGGER_THRESHOLD, or a clean scream gets too few scream frames.
+
+Timing: audio_features.compute_frame_features on white noise at the canonical 8 kHz and at
+16 kHz, per second of audio, and the band mask built against the lru_cached lookup.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from local_env import use_lambda
+from synthetic import speak, to_pcm16
+
+use_lambda('audio_processor')
+
+import handler  # noqa: E402
+from audio_features import FRAME_LENGTH, compute_frame_features, get_band_mask  # noqa: E402
+from resample import CANONICAL_SAMPLE_RATE, to_canonical  # noqa: E402
+
+CLIENT_RATE = 16000
+CLIP_SECONDS = 4.0
+# Clean screams must have at least this share of frames counted as screaming
+MIN_SCREAM_FRAMES = 0.5
+
+
+def colored_noise(n, exponent, rng):
+    """Noise with power falling as 1/f**exponent (0 white, 1 pink, 2 brown), peak 1."""
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    freqs = np.fft.rfftfreq(n, 1.0 / CLIENT_RATE)
+    freqs[0] = freqs[1]
+    noise = np.fft.irfft(spectrum / freqs ** (exponent / 2.0), n)
+    return noise / np.abs(noise).max()
+
+
+def band_noise(n, low, high, rng):
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    freqs = np.fft.rfftfreq(n, 1.0 / CLIENT_RATE)
+    spectrum[(freqs < low) | (freqs > high)] = 0.0
+    noise = np.fft.irfft(spectrum, n)
+    return noise / np.abs(noise).max()
+
+
+def scream(f0, jitter, rng):
+    """A held, open vowel at f0 with 5 Hz vibrato, as float samples peaking at 0.8."""
+    return speak(
+        (('a', 1.0),), CLIP_SECONDS, lambda t: f0 * (1.0 + 0.08 * np.sin(2 * np.pi * 5 * CLIP_SECONDS * t)),
+        formant_scale=1.4, loudness=0.8, jitter=jitter, rng=rng, sample_rate=CLIENT_RATE
+    )
+
+
+def test_clips(rng):
+    """{name: (16 kHz int16 samples, is_noise)}"""
+    n = int(CLIENT_RATE * CLIP_SECONDS)
+    clips = {
+        'white noise': (to_pcm16(0.25 * rng.standard_normal(n)), True),
+        '1-4 kHz hiss': (to_pcm16(0.8 * band_noise(n, 1000, 4000, rng)), True),
+        'pink noise': (to_pcm16(0.8 * colored_noise(n, 1, rng)), True),
+        'brown noise (traffic, wind)': (to_pcm16(0.8 * colored_noise(n, 2, rng)), True)
+    }
+    for f0 in (700, 1000, 1400):
+        for jitter in (0.5, 1.5):
+            clips[f'scream {f0} Hz, jitter {jitter}'] = (to_pcm16(scream(f0, jitter, rng)), False)
+        clips[f'scream {f0} Hz, jitter 1.5, in noise'] = (to_pcm16(scream(f0, 1.5, rng), 0.08, rng), None)
+    return clips
+
+
+def score_clip(samples):
+    """(features, share of scream frames, feature bonus, threat score) through the handler's clip path."""
+    canonical = to_canonical(samples, CLIENT_RATE, 1)
+    active = handler.gate_silence(canonical, CANONICAL_SAMPLE_RATE)
+    features = handler.analyze_clip(active, CANONICAL_SAMPLE_RATE)
+    scream_frames = (
+        (features['frame_loudness'] > handler.loud_threshold()) &
+        (features['frame_scream_ratio'] > handler.SCREAM_BAND_RATIO_THRESHOLD) &
+        (features['frame_scream_flatness'] < handler.SCREAM_MAX_FLATNESS)
+    )
+    return (
+        features, float(np.mean(scream_frames)), handler.feature_threat_bonus(features),
+        handler.calculate_audio_threat_score(None, None, features)
+    )
+
+
+def check_noise_rejection(rng):
+    failures = []
+    for name, (samples, is_noise) in test_clips(rng).items():
+        features, scream_share, bonus, score = score_clip(samples)
+        print(f"  {name:<37} ratio {features['scream_ratio_mean']:.2f}, flatness "
+              f"{np.mean(features['frame_scream_flatness']):.2f} | scream frames {scream_share:4.0%} | "
+              f"bonus {bonus:.2f} | threat score {score:.2f}")
+        if is_noise and (scream_share > 0 or bonus > 0 or score >= handler.THREAT_SCORE_TRIGGER_THRESHOLD):
+            failures.append(f'{name} looks like screaming')
+        if is_noise is False and scream_share < MIN_SCREAM_FRAMES:
+            failures.append(f'{name} has only {scream_share:.0%} scream frames')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    print(f"Clips at {CLIENT_RATE} Hz through the handler (ratio > {handler.SCREAM_BAND_RATIO_THRESHOLD}, "
+          f"flatness < {handler.SCREAM_MAX_FLATNESS}):")
+    failures = check_noise_rejection(rng)
+
+    for sample_rate in (CANONICAL_SAMPLE_RATE, 16000):
+        noise = (rng.standard_normal(int(sample_rate * args.seconds)) * 3000).astype(np.int16)
+        compute_frame_features(noise, sample_rate)
+        started = time.perf_counter()
+        for _ in range(args.repeats):
+            compute_frame_features(noise, sample_rate)
+        per_second = (time.perf_counter() - started) / args.repeats / args.seconds * 1e3
+        print(f"{sample_rate} Hz: frame features {per_second:.2f} ms per second of audio")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        get_band_mask.__wrapped__(FRAME_LENGTH, CANONICAL_SAMPLE_RATE)
+    built = (time.perf_counter() - started) * 1e3
+    started = time.perf_counter()
+    for _ in range(1000):
+        get_band_mask(FRAME_LENGTH, CANONICAL_SAMPLE_RATE)
+    cached = (time.perf_counter() - started) * 1e3
+    print(f"Band mask: {built:.1f} us to build, {cached:.2f} us from the cache")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
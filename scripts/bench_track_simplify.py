@@ -0,0 +1,79 @@
+"""
+Measures how far track_simplify.simplify_track shrinks GPS tracks and how well they rebuild.
+
+    python scripts/bench_track_simplify.py [--tolerance METERS ...]   # default: 5 10
+
+Synthetic tracks with GPS noise: a 30-minute city walk, a 20-minute drive with turns, a
+phone lying still, the 64-fix motion ring over a walk then a car ride, and a 2-hour walk
+at 1 Hz. For each tolerance it prints fixes kept, the size reduction of the stored
+attribute, the largest synchronized rebuild error (which must stay within the tolerance)
+and the time taken. Finally an 80-reading batch goes through /motion-input on in-memory
+tables, and the rows that kept coordinates are used to rebuild every reading's position.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from motion_scenarios import motion_handler, readings, track
+
+handler, _, _ = motion_handler()
+
+from track_simplify import interpolate_track, simplify_track, track_error_meters, track_to_attribute  # noqa: E402
+from trajectory import TRAJECTORY_POINTS, haversine_meters  # noqa: E402
+
+# (speed m/s, seconds, heading, turn degrees per second) legs, fix interval, GPS noise (m)
+TRACKS = {
+    'walk 30 min @5 s, city blocks, 3 m noise': (
+        [(1.3, 240, 0), (1.3, 10, None, 9), (1.3, 300), (1.3, 10, None, -9), (1.3, 600), (1.3, 10, None, 9), (1.3, 630)], 5, 3),
+    'drive 20 min @1 s, turns, 3 m noise': (
+        [(12, 300, 0), (8, 10, None, 9), (14, 400), (6, 20, None, -4.5), (12, 470, None, 0.2)], 1, 3),
+    'still 15 min @15 s, 5 m noise': ([(0, 900, 0)], 15, 5),
+    # Fills the motion state's ring exactly: 40 walking fixes, then 24 in a car
+    f'walk -> car ring of {TRAJECTORY_POINTS} @15 s': ([(1.3, 600, 0, 0.5), (12, 360, None, 0)], 15, 3),
+    'walk 2 h @1 s, gentle curve, 2 m noise': ([(1.3, 7200, 0, 0.05)], 1, 2)
+}
+
+
+def attribute_bytes(fixes):
+    return len(json.dumps(track_to_attribute(fixes), default=str))
+
+
+def check_batched_rows(rng):
+    """Sends a walk-then-drive batch and rebuilds every reading from the rows that kept coordinates."""
+    fixes = track([(1.3, 600, 90), (1.3, 300, 0), (12, 300, 95)], noise_meters=3, rng=rng)
+    handler.lambda_handler({'body': json.dumps({'user_id': 'simplify', 'readings': readings(fixes)})}, None)
+    rows = sorted(handler.motion_analysis_table.items.values(), key=lambda item: item['created_at_epoch'])
+    kept = np.array([
+        (int(row['created_at_epoch']), float(row['location']['latitude']), float(row['location']['longitude']))
+        for row in rows if 'latitude' in row['location']
+    ])
+    rebuilt = interpolate_track(kept, fixes[:, 0])
+    error = haversine_meters(fixes[:, 1], fixes[:, 2], rebuilt[:, 1], rebuilt[:, 2]).max()
+    print(f"Batch of {len(rows)} readings: {len(kept)} rows keep coordinates, "
+          f"accuracy kept on all: {all('accuracy' in row['location'] for row in rows)}, largest rebuild error {error:.2f} m")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tolerance', type=float, nargs='+', default=[5.0, 10.0])
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(7)
+    tracks = {name: track(legs, interval=interval, noise_meters=noise, rng=rng) for name, (legs, interval, noise) in TRACKS.items()}
+    for tolerance in args.tolerance:
+        print(f"Tolerance {tolerance:g} m:")
+        for name, fixes in tracks.items():
+            started = time.perf_counter()
+            kept = simplify_track(fixes, tolerance)
+            elapsed = (time.perf_counter() - started) * 1e3
+            print(f"  {name:<42}{len(fixes):>6} -> {len(kept):>4} fixes ({len(fixes) / len(kept):5.1f}x, "
+                  f"{attribute_bytes(fixes) / attribute_bytes(fixes[kept]):5.1f}x bytes), "
+                  f"max error {track_error_meters(fixes, kept):5.2f} m, {elapsed:6.1f} ms")
+    check_batched_rows(rng)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
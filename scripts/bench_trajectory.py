@@ -0,0 +1,85 @@
+"""
+Checks the walking-to-vehicle detector on synthetic trips and times the trajectory maths.
+
+    python scripts/bench_trajectory.py
+
+Five trips are sent to /motion-input one fix every 15 s, each as a new user: walking then
+driving off at night and by day, driving throughout, walking with one 550 m GPS glitch, and
+walking then jogging. Only the two walk-to-car trips should score, and the night one
+higher. Then trajectory.segment_kinematics and analyze_trajectory are timed on a
+10,000-point random-walk track, against a plain Python haversine loop over the same
+segments, and the largest distance difference between the two is printed.
+"""
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from motion_scenarios import local_time_epoch, motion_handler, readings, track
+
+handler, _, _ = motion_handler()
+
+from trajectory import EARTH_RADIUS_METERS, analyze_trajectory, segment_kinematics  # noqa: E402
+
+TRACK_POINTS = 10_000
+WALK_THEN_CAR = [(1.3, 300, 90), (12.0, 60, 95)]
+TRIPS = {
+    'walk -> car, night': (22, WALK_THEN_CAR, None),
+    'walk -> car, day': (12, WALK_THEN_CAR, None),
+    'car throughout': (22, [(12.0, 300, 90)], None),
+    'walk, one glitch': (22, [(1.3, 360, 90)], 21),
+    'walk -> jog': (22, [(1.3, 300, 90), (3.5, 60, 90)], None)
+}
+
+
+def trip_scores(user_id, hour, legs, glitch_index):
+    """Threat scores of a trip sent one reading at a time."""
+    fixes = track(legs, start=local_time_epoch(hour))
+    if glitch_index is not None:
+        fixes[glitch_index, 1] += 0.005
+    scores = []
+    for reading in readings(fixes):
+        response = handler.lambda_handler(dict(reading, user_id=user_id), None)
+        scores.append(json.loads(response['body'])['threat_score'])
+    return scores
+
+
+def python_distances(points):
+    """Segment distances from math.* one segment at a time: the scalar equivalent of segment_kinematics."""
+    distances = []
+    for (_, latitude1, longitude1), (_, latitude2, longitude2) in zip(points[:-1], points[1:]):
+        a = (math.sin(math.radians(latitude2 - latitude1) / 2) ** 2 +
+             math.cos(math.radians(latitude1)) * math.cos(math.radians(latitude2)) *
+             math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+        distances.append(2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a)))
+    return distances
+
+
+def main():
+    for index, (name, (hour, legs, glitch_index)) in enumerate(TRIPS.items()):
+        scores = trip_scores(f'trip-{index}', hour, legs, glitch_index)
+        print(f"{name:<20} max score {max(scores):.2f}, last six {[round(score, 2) for score in scores[-6:]]}")
+
+    rng = np.random.default_rng(0)
+    random_walk = np.column_stack([
+        1.7e9 + np.cumsum(rng.uniform(5, 20, TRACK_POINTS)),
+        28.6 + np.cumsum(rng.normal(0, 1e-4, TRACK_POINTS)),
+        77.2 + np.cumsum(rng.normal(0, 1e-4, TRACK_POINTS))
+    ])
+    for function in (segment_kinematics, analyze_trajectory):
+        function(random_walk)
+        started = time.perf_counter()
+        for _ in range(100):
+            function(random_walk)
+        print(f"{function.__name__}: {(time.perf_counter() - started) * 10:.2f} ms per {TRACK_POINTS:,}-point track")
+    started = time.perf_counter()
+    distances = python_distances(random_walk.tolist())
+    print(f"Python haversine loop: {(time.perf_counter() - started) * 1e3:.1f} ms, max difference "
+          f"{np.abs(np.array(distances) - segment_kinematics(random_walk)['distances']).max():.1e} m")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Builds the distress keyword template library, lambdas/audio_processor/keyword_templates.npz.
+
+    python scripts/build_keyword_templates.py RECORDINGS_DIR [OUTPUT]
+
+RECORDINGS_DIR holds 16-bit PCM WAV files (any supported rate, mono or stereo):
+
+    train/<keyword>/*.wav     clean recordings of one keyword each; every one becomes a template
+    heldout/<keyword>/*.wav   other recordings containing the keyword, for calibration
+    heldout/_none/*.wav       speech without any keyword, for calibration
+
+Recordings go through the same path as a clip on the server: resample.to_canonical, the
+VAD, then mfcc.compute_mfcc. Each keyword's threshold is set from the held-out distances:
+halfway between the farthest held-out match and the nearest non-match when they separate,
+otherwise just under the nearest non-match, so calibration clips never false-match.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from local_env import REPO_ROOT, use_lambda
+from synthetic import read_wav
+
+use_lambda('audio_processor')
+
+from keyword_spotting import (  # noqa: E402
+    DEFAULT_MATCH_THRESHOLD,
+    load_template_library,
+    save_template_library,
+    spot_keywords
+)
+from mfcc import compute_mfcc  # noqa: E402
+from resample import CANONICAL_SAMPLE_RATE, to_canonical  # noqa: E402
+from vad import drop_silent_blocks, voice_activity_mask  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, 'lambdas', 'audio_processor', 'keyword_templates.npz')
+# Threshold used while measuring held-out distances, so every window reaches DTW
+UNBOUNDED_THRESHOLD = 1e6
+
+
+def recording_mfcc(samples, sample_rate, channels=1):
+    """MFCCs of a recording's voice-active audio at the canonical rate, as the handler computes them."""
+    samples = to_canonical(samples, sample_rate, channels)
+    samples = drop_silent_blocks(samples, voice_activity_mask(samples, CANONICAL_SAMPLE_RATE))
+    return compute_mfcc(samples, CANONICAL_SAMPLE_RATE)
+
+
+def load_recordings(directory):
+    """{label: [(path, mfcc), ...]} for directory/<label>/*.wav."""
+    recordings = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*', '*.wav'))):
+        label = os.path.basename(os.path.dirname(path))
+        recordings.setdefault(label, []).append((path, recording_mfcc(*read_wav(path))))
+    return recordings
+
+
+def best_distances(library_path, mfcc):
+    """{label: best DTW distance} of one clip against every keyword in an unthresholded library."""
+    library = load_template_library(library_path)
+    return {match['keyword']: match['distance'] for match in spot_keywords(mfcc, library)}
+
+
+def calibrate_thresholds(labels, heldout_distances):
+    """
+    Per-keyword thresholds from held-out distances. `heldout_distances` is a list of
+    (true label, {keyword: distance}). Returns ({keyword: threshold}, report lines).
+    """
+    thresholds, report = {}, []
+    for keyword in sorted(set(labels)):
+        # A clip too short to hold a template window has no distance; it counts as a miss
+        positives = [distances.get(keyword, np.inf) for label, distances in heldout_distances if label == keyword]
+        negatives = [distances[keyword] for label, distances in heldout_distances if label != keyword and keyword in distances]
+        if not positives:
+            threshold = DEFAULT_MATCH_THRESHOLD
+        elif not negatives:
+            threshold = max(distance for distance in positives if np.isfinite(distance)) * 1.1
+        elif max(positives) < min(negatives):
+            threshold = (max(positives) + min(negatives)) / 2.0
+        else:
+            threshold = min(negatives) * 0.99
+        thresholds[keyword] = threshold
+        recall = np.mean([distance <= threshold for distance in positives]) if positives else float('nan')
+        report.append(
+            f"{keyword}: threshold {threshold:.3f}, held-out recall {recall:.2f} ({len(positives)} clips), "
+            f"nearest non-match {min(negatives) if negatives else float('nan'):.3f}"
+        )
+    return thresholds, report
+
+
+def build_library(recordings_dir, output_path):
+    """Builds, calibrates and writes the library. Returns the calibration report lines."""
+    train = load_recordings(os.path.join(recordings_dir, 'train'))
+    heldout = load_recordings(os.path.join(recordings_dir, 'heldout'))
+    if not train:
+        raise SystemExit(f"No training recordings under {recordings_dir}/train/<keyword>/")
+
+    labels = [label for label, clips in train.items() for _ in clips]
+    sequences = [mfcc for clips in train.values() for _, mfcc in clips]
+    short = [path for clips in train.values() for path, mfcc in clips if len(mfcc) < 2]
+    if short:
+        raise SystemExit(f"No voice activity found in {', '.join(short)}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        unbounded_path = os.path.join(scratch, 'unbounded.npz')
+        save_template_library(unbounded_path, labels, sequences, [UNBOUNDED_THRESHOLD] * len(labels))
+        heldout_distances = [
+            (label, best_distances(unbounded_path, mfcc))
+            for label, clips in heldout.items() for _, mfcc in clips
+        ]
+    thresholds, report = calibrate_thresholds(labels, heldout_distances)
+    save_template_library(output_path, labels, sequences, [thresholds[label] for label in labels])
+    return [f"Wrote {len(labels)} templates for {len(thresholds)} keywords to {output_path}"] + report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings_dir')
+    parser.add_argument('output', nargs='?', default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+    for line in build_library(args.recordings_dir, args.output):
+        print(line)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Checks that keyword spotting finds known keywords and nothing else.
+
+    python scripts/check_keyword_spotting.py
+    python scripts/check_keyword_spotting.py --library PATH --clip help.wav --expect help [--clip other.wav --expect none]
+
+Without arguments it runs end to end on a synthetic corpus (see synthetic.py): WAV files
+for "help" and "bachao" from a dozen synthetic speakers are written to a scratch directory,
+build_keyword_templates builds and calibrates a library from them, and clips from speakers
+the library has never heard must match their keyword, while clips of other words must match
+nothing. With --clip, the given recordings are checked against a real library instead.
+Exits non-zero on any mismatch.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from build_keyword_templates import DEFAULT_OUTPUT, build_library, recording_mfcc
+from synthetic import random_speaker, read_wav, say_word, silence, to_pcm16, write_wav
+
+from keyword_spotting import load_template_library, spot_keywords  # noqa: E402  (path set by build_keyword_templates)
+
+KEYWORDS = ('help', 'bachao')
+OTHER_WORDS = ('hello', 'namaste', 'okay', 'mera', 'lunch', 'water')
+# Recorded at 16 kHz, the default client rate, so the resampler is part of the check
+CORPUS_SAMPLE_RATE = 16000
+SPEAKERS_PER_SPLIT = {'train': 4, 'heldout': 4, 'test': 4}
+NOISE_LEVEL = 0.003
+
+
+def sentence(words, speaker, rng):
+    """Words separated by short pauses, as int16 with light background noise."""
+    parts = [silence(0.2, CORPUS_SAMPLE_RATE)]
+    for word in words:
+        parts += [say_word(word, speaker, rng, sample_rate=CORPUS_SAMPLE_RATE), silence(rng.uniform(0.1, 0.25), CORPUS_SAMPLE_RATE)]
+    return to_pcm16(np.concatenate(parts), NOISE_LEVEL, rng)
+
+
+def write_corpus(root, seed=7):
+    """Writes the train/heldout/test splits; returns the test clips as [(path, expected keyword or None)]."""
+    rng = np.random.default_rng(seed)
+    test_clips = []
+    for split, n_speakers in SPEAKERS_PER_SPLIT.items():
+        for speaker_index in range(n_speakers):
+            speaker = random_speaker(rng)
+            clips = []
+            for keyword in KEYWORDS:
+                if split == 'train':
+                    clips.append((keyword, f'{speaker_index}', [keyword]))
+                else:
+                    # The keyword between two other words, as it would be in a longer clip
+                    for take in range(2):
+                        context = list(rng.choice(OTHER_WORDS, 2, replace=False))
+                        clips.append((keyword, f'{speaker_index}_{take}', [context[0], keyword, context[1]]))
+            if split != 'train':
+                for take in range(2):
+                    clips.append(('_none', f'{speaker_index}_{take}', list(rng.choice(OTHER_WORDS, 3, replace=False))))
+            for label, name, words in clips:
+                directory = os.path.join(root, split, label)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f'{name}.wav')
+                write_wav(path, sentence(words, speaker, rng), CORPUS_SAMPLE_RATE)
+                if split == 'test':
+                    test_clips.append((path, None if label == '_none' else label))
+    return test_clips
+
+
+def check_clips(library_path, clips):
+    """Prints one line per clip; returns the number of clips whose matches were not exactly the expected keyword."""
+    library = load_template_library(library_path)
+    if library is None:
+        raise SystemExit(f"No keyword template library at {library_path}")
+    failures = 0
+    for path, expected in clips:
+        matches = spot_keywords(recording_mfcc(*read_wav(path)), library)
+        found = [match['keyword'] for match in matches]
+        ok = found == ([expected] if expected else [])
+        failures += not ok
+        detail = ', '.join(f"{match['keyword']} ({match['distance']:.2f})" for match in matches) or 'no match'
+        print(f"{'ok  ' if ok else 'FAIL'} {os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}: "
+              f"expected {expected or 'none'}, got {detail}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--library', default=DEFAULT_OUTPUT)
+    parser.add_argument('--clip', action='append', default=[])
+    parser.add_argument('--expect', action='append', default=[], help="keyword each --clip must match, or 'none'")
+    args = parser.parse_args(argv)
+
+    if args.clip:
+        if len(args.clip) != len(args.expect):
+            parser.error('give one --expect per --clip')
+        clips = [(path, None if expected == 'none' else expected) for path, expected in zip(args.clip, args.expect)]
+        failures = check_clips(args.library, clips)
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            test_clips = write_corpus(scratch)
+            library_path = os.path.join(scratch, 'keyword_templates.npz')
+            for line in build_library(scratch, library_path):
+                print(line)
+            failures = check_clips(library_path, test_clips)
+            total = len(test_clips)
+    print(f"{failures} of {len(args.clip) or total} clips failed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
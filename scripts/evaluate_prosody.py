@@ -0,0 +1,194 @@
+"""
+Evaluates the prosody valence estimate against labelled clips.
+
+    python scripts/evaluate_prosody.py                 # the synthetic fixture
+    python scripts/evaluate_prosody.py --wav-dir DIR   # DIR/<style>/*.wav recordings
+    python scripts/evaluate_prosody.py --regenerate-fixture
+
+scripts/fixtures/prosody_clips.json lists labelled synthetic utterances: one speaker, speaking
+style and seed per clip, rendered by synthetic.speak. The styles are neutral and happy (not
+distress) and angry and fear (distress); each sets pitch level, pitch range and contour,
+jitter, loudness and syllable rate after the usual acoustic descriptions of those emotions.
+For real recordings, a directory per style works the same way (angry, fear, sad, scream and
+cry count as distress; any other name does not).
+
+Each clip is classified as distress when its valence is below -COMPREHEND_SENTIMENT_THRESHOLD,
+the point where the audio threat score starts counting sentiment. The report compares the
+current valence per style with two earlier formulas: -arousal scaled by irregularity, and
+the signed valence without the high-arousal lean. The script exits with status 1 when the
+current valence finds fewer than --min-recall of the distress clips.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from local_env import FIXTURES_DIR, use_lambda
+from synthetic import WORDS, random_speaker, read_wav, silence, speak, to_pcm16
+
+use_lambda('audio_processor')
+
+from prosody import AROUSAL_NEGATIVE_LEAN_FROM, estimate_prosody  # noqa: E402
+from resample import CANONICAL_SAMPLE_RATE, to_canonical  # noqa: E402
+from vad import drop_silent_blocks, voice_activity_mask  # noqa: E402
+
+FIXTURE_PATH = os.path.join(FIXTURES_DIR, 'prosody_clips.json')
+# The handler's default COMPREHEND_SENTIMENT_THRESHOLD
+DISTRESS_VALENCE = -0.2
+DISTRESS_STYLES = {'angry', 'fear', 'sad', 'scream', 'cry'}
+# A missed distress clip costs more than a false alarm
+MIN_DISTRESS_RECALL = 0.95
+
+# Speaking styles: pitch relative to the speaker's, pitch range and contour, jitter (semitones),
+# peak loudness and syllables per second
+STYLES = {
+    'neutral': {'f0_scale': 1.0, 'range_semitones': 2.0, 'contour': 'declining', 'jitter': 0.1, 'loudness': 0.12, 'syllable_rate': 4.0},
+    'happy': {'f0_scale': 1.3, 'range_semitones': 7.0, 'contour': 'melodic', 'jitter': 0.15, 'loudness': 0.35, 'syllable_rate': 5.0},
+    'angry': {'f0_scale': 1.35, 'range_semitones': 4.0, 'contour': 'stepped', 'jitter': 0.7, 'loudness': 0.7, 'syllable_rate': 5.5},
+    'fear': {'f0_scale': 1.8, 'range_semitones': 4.0, 'contour': 'tremor', 'jitter': 1.2, 'loudness': 0.6, 'syllable_rate': 6.0}
+}
+CLIP_SECONDS = 4.0
+
+
+def contour(style, rng):
+    """Pitch offset in semitones as a function of relative time 0..1 over the utterance."""
+    half_range = style['range_semitones'] / 2.0
+    if style['contour'] == 'declining':
+        return lambda t: half_range * (1.0 - 2.0 * t)
+    if style['contour'] == 'melodic':
+        cycles, phase = rng.uniform(1.5, 3.0), rng.uniform(0, 2 * np.pi)
+        return lambda t: half_range * np.sin(2 * np.pi * cycles * t + phase)
+    if style['contour'] == 'stepped':
+        # A new level every ~0.4 s, held: abrupt rather than gliding
+        levels = rng.uniform(-half_range, half_range, 12)
+        return lambda t: levels[np.minimum((np.asarray(t) * 10).astype(int), 11)]
+    if style['contour'] == 'tremor':
+        rate = rng.uniform(6.0, 9.0)
+        return lambda t: half_range * np.sin(2 * np.pi * rate * CLIP_SECONDS * np.asarray(t))
+    raise ValueError(f"Unknown contour {style['contour']}")
+
+
+def render_clip(spec):
+    """int16 samples at CANONICAL_SAMPLE_RATE for one fixture entry."""
+    rng = np.random.default_rng(spec['seed'])
+    style = STYLES[spec['style']]
+    speaker = spec['speaker']
+    f0 = speaker['f0_hz'] * style['f0_scale']
+    offset = contour(style, rng)
+    parts, elapsed = [], 0.0
+    while elapsed < CLIP_SECONDS:
+        word = str(rng.choice(sorted(WORDS)))
+        duration = len(WORDS[word]) / 2.0 / style['syllable_rate'] * rng.uniform(0.85, 1.15)
+        start = elapsed
+        parts.append(speak(
+            WORDS[word], duration,
+            lambda t, start=start, duration=duration: f0 * 2.0 ** (offset(np.minimum(1.0, (start + t * duration) / CLIP_SECONDS)) / 12.0),
+            speaker['formant_scale'], loudness=style['loudness'] * rng.uniform(0.8, 1.0), jitter=style['jitter'], rng=rng
+        ))
+        gap = rng.uniform(0.05, 0.2)
+        parts.append(silence(gap))
+        elapsed += duration + gap
+    return to_pcm16(np.concatenate(parts), 0.002, rng)
+
+
+def regenerate_fixture(path=FIXTURE_PATH, speakers=8, clips_per_style=2, seed=11):
+    rng = np.random.default_rng(seed)
+    clips = []
+    for speaker_index in range(speakers):
+        speaker = {key: round(value, 3) for key, value in random_speaker(rng).items()}
+        for style in STYLES:
+            for _ in range(clips_per_style):
+                clips.append({
+                    'name': f'speaker{speaker_index}_{style}_{len(clips)}',
+                    'style': style,
+                    'distress': style in DISTRESS_STYLES,
+                    'speaker': speaker,
+                    'seed': int(rng.integers(2 ** 31))
+                })
+    with open(path, 'w') as f:
+        json.dump({'styles': STYLES, 'clips': clips}, f, indent=1)
+    print(f"Wrote {len(clips)} clips to {path}")
+
+
+def previous_valence(prosody):
+    """The first valence formula: negative for any aroused speech."""
+    return -prosody['arousal'] * (0.3 + 0.7 * prosody['pitch_irregularity'])
+
+
+def unleaned_valence(prosody):
+    """The current valence without the high-arousal lean, which missed angry speech at a steady pitch."""
+    return float(np.clip(prosody['valence'] + max(0.0, prosody['arousal'] - AROUSAL_NEGATIVE_LEAN_FROM), -1.0, 1.0))
+
+
+def labelled_clips(wav_dir):
+    """(name, style, distress, canonical voice-active samples) from the fixture or a WAV directory."""
+    if wav_dir:
+        for path in sorted(glob.glob(os.path.join(wav_dir, '*', '*.wav'))):
+            style = os.path.basename(os.path.dirname(path))
+            samples = to_canonical(*read_wav(path))
+            yield path, style, style in DISTRESS_STYLES, samples
+        return
+    with open(FIXTURE_PATH) as f:
+        fixture = json.load(f)
+    for spec in fixture['clips']:
+        yield spec['name'], spec['style'], spec['distress'], render_clip(spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wav-dir')
+    parser.add_argument('--regenerate-fixture', action='store_true')
+    parser.add_argument('--min-recall', type=float, default=MIN_DISTRESS_RECALL,
+                        help='share of distress clips the current valence must flag')
+    args = parser.parse_args(argv)
+    if args.regenerate_fixture:
+        regenerate_fixture()
+        return 0
+
+    rows, elapsed, audio_seconds = [], 0.0, 0.0
+    for name, style, distress, samples in labelled_clips(args.wav_dir):
+        samples = drop_silent_blocks(samples, voice_activity_mask(samples, CANONICAL_SAMPLE_RATE))
+        started = time.perf_counter()
+        prosody = estimate_prosody(samples)
+        elapsed += time.perf_counter() - started
+        audio_seconds += len(samples) / CANONICAL_SAMPLE_RATE
+        if prosody is None:
+            print(f"{name}: too little voiced speech, skipped")
+            continue
+        rows.append((style, distress, prosody, {
+            'current': prosody['valence'], 'previous': previous_valence(prosody), 'unleaned': unleaned_valence(prosody)
+        }))
+
+    print(f"{'style':<10}{'clips':>6}{'arousal':>9}{'irregular':>10}{'valence':>9}{'previous':>10}{'unleaned':>10}")
+    for style in dict.fromkeys(row[0] for row in rows):
+        selected = [row for row in rows if row[0] == style]
+        print(f"{style:<10}{len(selected):>6}"
+              f"{np.mean([row[2]['arousal'] for row in selected]):>9.2f}"
+              f"{np.mean([row[2]['pitch_irregularity'] for row in selected]):>10.2f}"
+              f"{np.mean([row[3]['current'] for row in selected]):>9.2f}"
+              f"{np.mean([row[3]['previous'] for row in selected]):>10.2f}"
+              f"{np.mean([row[3]['unleaned'] for row in selected]):>10.2f}")
+
+    truth = np.array([row[1] for row in rows])
+    recall = {}
+    for label in ('current', 'previous', 'unleaned'):
+        predicted = np.array([row[3][label] for row in rows]) < DISTRESS_VALENCE
+        false_alarms = np.count_nonzero(predicted & ~truth)
+        misses = np.count_nonzero(~predicted & truth)
+        recall[label] = 1.0 - misses / max(1, np.count_nonzero(truth))
+        print(f"{label} valence: distress accuracy {np.mean(predicted == truth):.2f}, recall {recall[label]:.2f}, "
+              f"{false_alarms} of {np.count_nonzero(~truth)} calm clips flagged, "
+              f"{misses} of {np.count_nonzero(truth)} distress clips missed")
+    print(f"estimate_prosody: {elapsed / audio_seconds * 4000:.1f} ms per 4 s of voice-active audio")
+    if recall['current'] < args.min_recall:
+        print(f"FAIL distress recall {recall['current']:.2f} is below {args.min_recall:.2f}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
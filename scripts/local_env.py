@@ -0,0 +1,34 @@
+"""
+Puts one Lambda's code and the shared layer on sys.path, the way the deployed function
+sees them, so the scripts in this directory import handler modules directly.
+
+Handlers create their boto3 clients at import; with the placeholder table names and region
+set here that needs no credentials, and scripts swap the tables for in-memory ones before
+making any call.
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_ROOT, 'scripts', 'fixtures')
+
+# Names only; nothing is sent to AWS
+PLACEHOLDER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AUDIO_ANALYSIS_TABLE_NAME': 'local-audio-analysis',
+    'MOTION_ANALYSIS_TABLE_NAME': 'local-motion-analysis',
+    'USER_STATE_TABLE_NAME': 'local-user-state',
+    'USERS_TABLE_NAME': 'local-users',
+    'RISK_ASSESSMENT_LAMBDA_NAME': 'local-risk-assessor',
+    'AUDIO_TEMP_BUCKET_NAME': 'local-audio-uploads',
+    'LOG_LEVEL': 'WARNING'
+}
+
+
+def use_lambda(name):
+    """Makes lambdas/<name> and lambdas/shared importable and sets placeholder configuration."""
+    for path in (os.path.join(REPO_ROOT, 'lambdas', 'shared'), os.path.join(REPO_ROOT, 'lambdas', name)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    for key, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(key, value)
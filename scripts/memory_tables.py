@@ -0,0 +1,139 @@
+"""
+In-memory stand-ins for the DynamoDB tables, DynamoDB resource and Lambda client the handlers
+use, for offline runs of the scripts in this directory. They support exactly the calls and
+condition expressions the handlers make, with DynamoDB's semantics (a failed condition raises
+ConditionalCheckFailedException, optionally carrying the old item in wire format; binary
+attributes come back wrapped in Binary).
+"""
+from decimal import Decimal
+
+from boto3.dynamodb.types import Binary, TypeSerializer
+from botocore.exceptions import ClientError
+
+_serializer = TypeSerializer()
+
+
+def _stored(item):
+    return {key: Binary(value) if isinstance(value, (bytes, bytearray)) else value for key, value in item.items()}
+
+
+class MemoryTable:
+    def __init__(self, key_names=('user_id', 'state_key')):
+        self.key_names = key_names
+        self.items = {}
+        self.calls = {'get_item': 0, 'put_item': 0, 'update_item': 0, 'delete_item': 0}
+
+    def _key(self, item):
+        return tuple(item[name] for name in self.key_names if name in item)
+
+    def _condition_holds(self, condition, old, values, names):
+        if condition is None:
+            return True
+        if condition == 'attribute_not_exists(user_id)':
+            return old is None
+        if condition == 'attribute_exists(user_id)':
+            return old is not None
+        if condition == 'version = :version':
+            return old is not None and old.get('version') == values[':version']
+        if condition == 'last_sequence = :previous_sequence':
+            return old is not None and old.get('last_sequence') == values[':previous_sequence']
+        if condition.startswith('attribute_not_exists(user_id) OR (#status = :in_progress'):
+            return old is None or (old.get(names['#status']) == values[':in_progress'] and old['claimed_at'] < values[':stale_before'])
+        raise NotImplementedError(f'Unsupported condition: {condition}')
+
+    def _check(self, operation, condition, old, values, names, return_old):
+        if self._condition_holds(condition, old, values or {}, names or {}):
+            return
+        response = {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}
+        if return_old == 'ALL_OLD' and old is not None:
+            response['Item'] = {key: _serializer.serialize(value) for key, value in old.items()}
+        raise ClientError(response, operation)
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        self.calls['get_item'] += 1
+        item = self.items.get(self._key(Key))
+        return {'Item': dict(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None,
+                 ExpressionAttributeNames=None, ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self.calls['put_item'] += 1
+        key = self._key(Item)
+        self._check('PutItem', ConditionExpression, self.items.get(key), ExpressionAttributeValues,
+                    ExpressionAttributeNames, ReturnValuesOnConditionCheckFailure)
+        self.items[key] = _stored(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ReturnValues=None, **kwargs):
+        """SET name = :value and ADD name :number clauses, in that order, as the handlers write them."""
+        self.calls['update_item'] += 1
+        key = self._key(Key)
+        old = self.items.get(key)
+        values = ExpressionAttributeValues or {}
+        self._check('UpdateItem', ConditionExpression, old, values, ExpressionAttributeNames, None)
+        new = dict(old or Key)
+        set_part, _, add_part = UpdateExpression.partition('ADD ')
+        changed = []
+        for clause in filter(None, (clause.strip() for clause in set_part.replace('SET ', '', 1).split(','))):
+            name, value = (part.strip() for part in clause.split('='))
+            new[name] = values[value]
+            changed.append(name)
+        for clause in filter(None, (clause.strip() for clause in add_part.split(','))):
+            name, value = clause.split()
+            new[name] = Decimal(str(old.get(name, 0) if old else 0)) + Decimal(str(values[value]))
+            changed.append(name)
+        self.items[key] = _stored(new)
+        if ReturnValues == 'UPDATED_OLD':
+            return {'Attributes': {name: old[name] for name in changed if old and name in old}}
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self.calls['delete_item'] += 1
+        self.items.pop(self._key(Key), None)
+        return {}
+
+
+class MemoryDynamoDB:
+    """The service resource's batch_write_item over named MemoryTables (items in plain Python types)."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.batch_calls = 0
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self.batch_calls += 1
+        for table_name, requests in RequestItems.items():
+            table = self.tables[table_name]
+            for request in requests:
+                item = request['PutRequest']['Item']
+                table.items[table._key(item)] = _stored(item)
+        return {'UnprocessedItems': {}}
+
+
+class RecordingLambdaClient:
+    """Records Lambda invocations (the Risk Assessor calls) instead of making them."""
+
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {'StatusCode': 202}
+
+
+def install_memory_backends(module, tables):
+    """
+    Points a handler module at in-memory backends: `tables` maps each table attribute
+    (e.g. 'user_state_table') to (table name, key attribute names). Replaces the module's
+    dynamodb resource and lambda_client too; returns (MemoryDynamoDB, RecordingLambdaClient).
+    """
+    memory_tables = {}
+    for attribute, (table_name, key_names) in tables.items():
+        memory_tables[table_name] = MemoryTable(key_names)
+        setattr(module, attribute, memory_tables[table_name])
+    module.dynamodb = MemoryDynamoDB(memory_tables)
+    module.lambda_client = RecordingLambdaClient()
+    return module.dynamodb, module.lambda_client
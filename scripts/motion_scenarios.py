@@ -0,0 +1,75 @@
+"""
+Synthetic movement for the motion benchmark scripts: tracks built from legs of constant
+speed and heading, /motion-input readings for them, and the Motion Analyzer handler wired
+to in-memory tables.
+"""
+import numpy as np
+
+from local_env import use_lambda
+from memory_tables import install_memory_backends
+
+METERS_PER_DEGREE = 111195.0
+START_LATITUDE, START_LONGITUDE = 28.6, 77.2
+IST_OFFSET_SECONDS = 330 * 60
+
+
+def local_time_epoch(hour, day_epoch=1_700_000_000):
+    """Epoch seconds of `hour`:00 IST on the day containing day_epoch."""
+    local_midnight = day_epoch - (day_epoch + IST_OFFSET_SECONDS) % 86400
+    return local_midnight + hour * 3600
+
+
+def offset_degrees(latitude, north_meters, east_meters):
+    """(dlatitude, dlongitude) for a small move north and east of a point."""
+    return north_meters / METERS_PER_DEGREE, east_meters / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+
+
+def track(legs, interval=15.0, start=None, latitude=START_LATITUDE, longitude=START_LONGITUDE,
+          noise_meters=0.0, rng=None):
+    """
+    (n, 3) array of (epoch seconds, latitude, longitude), one fix every `interval` seconds.
+    `legs` are (speed m/s, duration s, heading degrees, turn degrees per second) tuples; the
+    last two may be omitted. Gaussian noise of noise_meters is added to every fix.
+    """
+    rows, t = [], local_time_epoch(22) if start is None else start
+    heading = None
+    for leg in legs:
+        speed, seconds = leg[0], leg[1]
+        heading = leg[2] if len(leg) > 2 and leg[2] is not None else (heading or 0.0)
+        turn = leg[3] if len(leg) > 3 else 0.0
+        for _ in range(int(round(seconds / interval))):
+            t += interval
+            heading += turn * interval
+            dlat, dlon = offset_degrees(latitude, speed * interval * np.cos(np.radians(heading)), speed * interval * np.sin(np.radians(heading)))
+            latitude, longitude = latitude + dlat, longitude + dlon
+            rows.append((t, latitude, longitude))
+    fixes = np.array(rows)
+    if noise_meters:
+        rng = rng or np.random.default_rng(0)
+        dlat, dlon = offset_degrees(fixes[:, 1], *rng.normal(0, noise_meters, (2, len(fixes))))
+        fixes[:, 1] += dlat
+        fixes[:, 2] += dlon
+    return fixes
+
+
+def readings(fixes, accuracy=10.0, motion_activity=0.05):
+    """/motion-input readings (without user_id) for the fixes of a track."""
+    return [
+        {
+            'created_at_epoch': int(t), 'motion_activity': motion_activity, 'is_stationary': False,
+            'location': {'latitude': float(latitude), 'longitude': float(longitude), 'accuracy': accuracy}
+        }
+        for t, latitude, longitude in fixes
+    ]
+
+
+def motion_handler():
+    """The Motion Analyzer handler module on in-memory tables; returns (handler, dynamodb, lambda_client)."""
+    use_lambda('motion_analyzer')
+    import handler
+    dynamodb, lambda_client = install_memory_backends(handler, {
+        'motion_analysis_table': (handler.MOTION_ANALYSIS_TABLE_NAME, ('user_id', 'created_at_epoch')),
+        'user_state_table': (handler.USER_STATE_TABLE_NAME, ('user_id', 'state_key')),
+        'users_table': (handler.USERS_TABLE_NAME, ('user_id',))
+    })
+    return handler, dynamodb, lambda_client
@@ -0,0 +1,135 @@
+"""
+Runs the whole large-recording upload flow offline, through the audio handler.
+
+    python scripts/run_local_upload.py [RECORDING.wav] [--bucket-dir DIR]
+
+The handler runs with AUDIO_LOCAL_BUCKET_DIR set, so S3 is local_bucket.LocalDirectoryS3
+over a directory (a scratch one unless --bucket-dir is given), and DynamoDB and Lambda are
+the in-memory stand-ins from memory_tables. The script makes the same calls a client and
+S3 would: POST /audio-upload, a PUT of every part to its presigned URL, the completion
+request, then the ObjectCreated notification. It prints the stored summary item and the
+peak Python allocations (tracemalloc) while the notification is processed.
+
+Without a recording it uploads a synthetic one: 16 kHz speech with a shouted, irregular
+stretch in the middle. The same audio is also sent as one /audio-input clip for comparison.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from local_env import use_lambda
+from memory_tables import install_memory_backends
+from synthetic import WORDS, random_speaker, read_wav, silence, speak, to_pcm16
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_recording(seed=3, seconds=20.0):
+    """Calm speech, then about 4 s of loud, high and unsteady speech, then calm speech again."""
+    rng = np.random.default_rng(seed)
+    speaker = random_speaker(rng)
+    parts, elapsed = [], 0.0
+    while elapsed < seconds:
+        distressed = seconds * 0.4 <= elapsed < seconds * 0.6
+        word = str(rng.choice(list(WORDS)))
+        duration = float(rng.uniform(0.5, 0.8))
+        f0 = speaker['f0_hz'] * (2.0 if distressed else 1.0)
+        parts.append(speak(
+            WORDS[word], duration, lambda t, f0=f0: f0 * (1.1 - 0.2 * t), speaker['formant_scale'],
+            loudness=0.9 if distressed else 0.2, jitter=1.5 if distressed else 0.0, rng=rng, sample_rate=SAMPLE_RATE
+        ))
+        gap = float(rng.uniform(0.1, 0.3))
+        parts.append(silence(gap, SAMPLE_RATE))
+        elapsed += duration + gap
+    return to_pcm16(np.concatenate(parts), 0.002, rng)
+
+
+def call(handler, body, resource=None):
+    event = {'body': json.dumps(body)}
+    if resource:
+        event['resource'] = resource
+    response = handler.lambda_handler(event, None)
+    body = json.loads(response['body'])
+    if response['statusCode'] != 200:
+        raise SystemExit(f"{resource or '/audio-input'} returned {response['statusCode']}: {body}")
+    return body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording', nargs='?', help='16-bit PCM WAV file')
+    parser.add_argument('--bucket-dir', help='directory for the local bucket (default: a scratch directory)')
+    parser.add_argument('--user-id', default='local-user')
+    parser.add_argument('--seconds', type=float, default=20.0, help='length of the synthetic recording')
+    args = parser.parse_args(argv)
+
+    scratch = None if args.bucket_dir else tempfile.TemporaryDirectory()
+    os.environ['AUDIO_LOCAL_BUCKET_DIR'] = args.bucket_dir or scratch.name
+    use_lambda('audio_processor')
+    import handler
+    from local_bucket import object_created_event
+
+    _, lambda_client = install_memory_backends(handler, {
+        'audio_analysis_table': (handler.AUDIO_ANALYSIS_TABLE_NAME, ('user_id', 'timestamp')),
+        'user_state_table': (handler.USER_STATE_TABLE_NAME, ('user_id', 'state_key'))
+    })
+
+    if args.recording:
+        samples, sample_rate, channels = read_wav(args.recording)
+    else:
+        samples, sample_rate, channels = synthetic_recording(seconds=args.seconds), SAMPLE_RATE, 1
+    data = samples.tobytes()
+    print(f"Recording: {len(data)} bytes, {len(samples) / channels / sample_rate:.1f} s at {sample_rate} Hz, {channels} channel(s)")
+
+    upload = call(handler, {
+        'user_id': args.user_id, 'timestamp': 1700000000, 'content_length': len(data),
+        'sample_rate': sample_rate, 'channels': channels
+    }, handler.AUDIO_UPLOAD_PATH)
+    part_bytes = upload['part_bytes']
+    parts = [
+        {'part_number': number, 'etag': handler.s3.put_presigned_url(url, data[(number - 1) * part_bytes:number * part_bytes])}
+        for number, url in enumerate(upload['part_urls'], start=1)
+    ]
+    call(handler, {
+        'action': 'complete', 'user_id': args.user_id, 'key': upload['key'],
+        'upload_id': upload['upload_id'], 'parts': parts
+    }, handler.AUDIO_UPLOAD_PATH)
+    print(f"Uploaded {len(parts)} part(s) to {upload['key']}; the handler reads it in "
+          f"{-(-len(data) // handler.AUDIO_UPLOAD_RANGE_BYTES)} ranges of {handler.AUDIO_UPLOAD_RANGE_BYTES} bytes")
+
+    tracemalloc.start()
+    result = handler.lambda_handler(object_created_event(handler.AUDIO_TEMP_BUCKET_NAME, upload['key'], len(data)), None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"S3 trigger: {json.loads(result['body'])['results']}")
+    print(f"Peak allocations while analysing the upload: {peak / 2 ** 20:.1f} MB")
+    summary = next(iter(handler.audio_analysis_table.items.values()))
+    print("Stored summary item:")
+    for name, value in sorted(summary.items()):
+        print(f"  {name}: {value}")
+    print(f"Risk Assessor invocations: {len(lambda_client.invocations)}")
+    try:
+        handler.s3.get_object(Bucket=handler.AUDIO_TEMP_BUCKET_NAME, Key=upload['key'])
+        print("Uploaded object still present")
+    except handler.ClientError:
+        print("Uploaded object deleted after analysis")
+
+    if len(data) <= handler.MAX_AUDIO_PAYLOAD_BYTES:
+        clip = call(handler, {
+            'user_id': f'{args.user_id}-clip', 'timestamp': 1700000000,
+            'audio_data_base64': base64.b64encode(data).decode(), 'sample_rate': sample_rate, 'channels': channels
+        })
+        print(f"Same audio as one /audio-input clip: threat score {clip['threat_score']:.3f}")
+    if scratch:
+        scratch.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Simulates a day of one client following the Motion Analyzer's sampling recommendations.
+
+    python scripts/simulate_sampling.py [--days N]
+
+Each simulated day has 8 hours asleep, three trips (commute there and back and an evening
+outing) during which the motion state keeps the active tier as the floor, six 20-second
+false alarms scoring 0.6 at random waking times, and one 10-minute incident scoring 0.7
+that starts at a random waking time. Other readings score 0.05, or 0.15 during a trip.
+The client samples `batch_size` readings `interval_seconds` apart, sends them, and
+follows the `sampling` object of the response, echoing `hold_until`. The handler's own
+sampling_policy is used, so the SAMPLING_* variables apply.
+
+Requests and readings per day are compared with fixed rates. The latency is the time from
+the start of the incident until the request carrying its first reading is sent.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from motion_scenarios import motion_handler
+
+handler, _, _ = motion_handler()
+
+from sampling import SAMPLING_ACTIVE, SAMPLING_IDLE, SAMPLING_TIERS, SamplingPolicy  # noqa: E402
+
+DAY = 86400
+WAKING_HOURS = (7, 23)
+TRIPS = [(8.5 * 3600, 9.25 * 3600), (18 * 3600, 18.75 * 3600), (21 * 3600, 21.5 * 3600)]
+FALSE_ALARMS, FALSE_ALARM_SECONDS, FALSE_ALARM_SCORE = 6, 20, 0.6
+INCIDENT_SECONDS, INCIDENT_SCORE = 600, 0.7
+# (interval seconds, readings per request) for the fixed-rate clients compared against
+FIXED_RATES = {'fixed 5 s, sent singly': (5.0, 1), 'fixed 5 s, batches of 6': (5.0, 6), 'fixed 1 s, batches of 2': (1.0, 2)}
+
+
+def scripted_day(rng):
+    """score(t) and floor(t) for one day, and the incident's start."""
+    false_alarms = rng.uniform(WAKING_HOURS[0] * 3600, WAKING_HOURS[1] * 3600, FALSE_ALARMS)
+    incident = rng.uniform(WAKING_HOURS[0] * 3600, WAKING_HOURS[1] * 3600 - INCIDENT_SECONDS)
+
+    def on_trip(t):
+        return any(start <= t < end for start, end in TRIPS)
+
+    def score(t):
+        if incident <= t < incident + INCIDENT_SECONDS:
+            return INCIDENT_SCORE
+        if any(start <= t < start + FALSE_ALARM_SECONDS for start in false_alarms):
+            return FALSE_ALARM_SCORE
+        return 0.15 if on_trip(t) else 0.05
+
+    def floor(t):
+        return SAMPLING_ACTIVE if on_trip(t) else SAMPLING_IDLE
+
+    return score, floor, incident
+
+
+def simulate(policy, score, floor, incident):
+    """(requests, readings, seconds per tier, incident latency) for a client following `policy`."""
+    recommendation = policy.recommend(0.0, None, SAMPLING_IDLE, now=0.0)
+    t, requests, readings, latency = 0.0, 0, 0, None
+    tier_seconds = dict.fromkeys(policy.tiers, 0.0)
+    while t < DAY:
+        interval, batch_size = recommendation['interval_seconds'], recommendation['batch_size']
+        times = t + interval * np.arange(1, batch_size + 1)
+        t = times[-1]
+        requests += 1
+        readings += batch_size
+        tier_seconds[recommendation['tier']] += interval * batch_size
+        if latency is None and times[-1] >= incident:
+            latency = t - incident
+        recommendation = policy.recommend(max(map(score, times)), recommendation['hold_until'], floor(t), now=t)
+    return requests, readings, tier_seconds, latency
+
+
+def fixed_policy(interval, batch_size):
+    return SamplingPolicy(dict.fromkeys(SAMPLING_TIERS, (interval, batch_size)), float('inf'), float('inf'), 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=50, help='days simulated, each with its own false alarms and incident')
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(7)
+    days = [scripted_day(rng) for _ in range(args.days)]
+
+    policies = {'adaptive': handler.sampling_policy, **{name: fixed_policy(*rate) for name, rate in FIXED_RATES.items()}}
+    for name, policy in policies.items():
+        runs = [simulate(policy, *day) for day in days]
+        requests = [run[0] for run in runs]
+        latencies = [run[3] for run in runs]
+        print(f"{name:<24} requests/day {min(requests):6d}-{max(requests):<6d} (mean {np.mean(requests):6.0f}) readings/day {np.mean([run[1] for run in runs]):7.0f} | "
+              f"incident latency mean {np.mean(latencies):5.1f} s, worst {max(latencies):5.1f} s")
+        if name == 'adaptive':
+            hours = {tier: np.mean([run[2][tier] for run in runs]) / 3600 for tier in policy.tiers}
+            print('  hours per tier: ' + ', '.join(f"{tier} {value:.1f}" for tier, value in hours.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
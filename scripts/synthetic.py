@@ -0,0 +1,168 @@
+"""
+Deterministic synthetic signals for the scripts in this directory.
+
+Speech is a formant synthesizer: a harmonic source at a given pitch contour shaped by the
+first three formants of each phone, with shaped noise for fricatives and bursts. It is not
+natural speech, but it has what the analysis looks at (formant transitions for MFCCs, pitch
+and loudness contours for prosody), so results are reproducible without a recording corpus.
+"""
+import io
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 8000
+
+# (F1, F2, F3) in Hz for an adult male voice; each speaker scales them
+VOICED_PHONES = {
+    'a': (730, 1090, 2440),
+    'e': (530, 1840, 2480),
+    'i': (270, 2290, 3010),
+    'o': (570, 840, 2410),
+    'u': (300, 870, 2240),
+    'l': (360, 1300, 2700),
+    'm': (250, 1200, 2200),
+    'n': (250, 1700, 2600),
+    'r': (450, 1250, 1650),
+    'w': (300, 700, 2200)
+}
+FORMANT_BANDWIDTHS_HZ = (90.0, 120.0, 170.0)
+# Noise phones as the band (Hz) their energy sits in; '-' is a stop closure (silence)
+NOISE_PHONES = {
+    'h': (300.0, 3500.0),
+    's': (2800.0, 3950.0),
+    'ch': (1800.0, 3950.0),
+    'p': (500.0, 3900.0),
+    't': (2000.0, 3950.0),
+    'k': (1200.0, 3000.0)
+}
+
+# Words as (phone, relative duration)
+WORDS = {
+    'help': (('h', 1.0), ('e', 3.0), ('l', 2.0), ('-', 1.0), ('p', 0.6)),
+    'bachao': (('-', 0.5), ('a', 2.5), ('ch', 1.5), ('a', 2.0), ('o', 3.0)),
+    'hello': (('h', 1.0), ('e', 2.0), ('l', 1.5), ('o', 3.5)),
+    'namaste': (('n', 1.0), ('a', 1.5), ('m', 1.0), ('a', 1.5), ('s', 1.5), ('t', 0.5), ('e', 2.0)),
+    'okay': (('o', 2.5), ('k', 0.8), ('e', 2.0), ('i', 1.5)),
+    'mera': (('m', 1.0), ('e', 2.0), ('r', 1.0), ('a', 3.0)),
+    'lunch': (('l', 1.0), ('a', 2.5), ('n', 1.0), ('ch', 2.0)),
+    'water': (('w', 1.0), ('o', 2.0), ('t', 0.6), ('e', 1.5), ('r', 2.0))
+}
+
+
+def random_speaker(rng):
+    """Pitch, formant scale (vocal tract length) and tempo of one synthetic speaker."""
+    female = rng.random() < 0.5
+    return {
+        'f0_hz': float(rng.uniform(170.0, 240.0) if female else rng.uniform(95.0, 150.0)),
+        'formant_scale': float(rng.uniform(1.08, 1.2) if female else rng.uniform(0.92, 1.05)),
+        'tempo': float(rng.uniform(0.85, 1.15))
+    }
+
+
+def _phone_formants(phones):
+    """Formant targets per phone; noise phones and closures take the nearest voiced phone's."""
+    voiced = [index for index, (phone, _) in enumerate(phones) if phone in VOICED_PHONES]
+    targets = []
+    for index, (phone, _) in enumerate(phones):
+        nearest = min(voiced, key=lambda v: abs(v - index)) if phone not in VOICED_PHONES else index
+        targets.append(VOICED_PHONES[phones[nearest][0]])
+    return np.asarray(targets, dtype=np.float64)
+
+
+def _band_noise(n, band, rng, sample_rate):
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    freqs = np.fft.rfftfreq(n, 1.0 / sample_rate)
+    spectrum[(freqs < band[0]) | (freqs > band[1])] = 0.0
+    noise = np.fft.irfft(spectrum, n)
+    return noise / (np.abs(noise).max() + 1e-9)
+
+
+def speak(phones, duration, f0_contour, formant_scale=1.0, loudness=0.3, jitter=0.0, rng=None,
+          sample_rate=SAMPLE_RATE):
+    """
+    Float samples (peak about `loudness`) for a phone sequence lasting `duration` seconds.
+    `f0_contour` is a callable of relative time 0..1 returning pitch in Hz (vectorized);
+    `jitter` is the standard deviation of random per-period pitch perturbation, in semitones.
+    """
+    rng = rng if rng is not None else np.random.default_rng(0)
+    weights = np.array([weight for _, weight in phones], dtype=np.float64)
+    lengths = np.maximum(1, np.round(weights / weights.sum() * duration * sample_rate)).astype(int)
+    n = int(lengths.sum())
+    phone_index = np.repeat(np.arange(len(phones)), lengths)
+    time = np.arange(n)
+
+    # Formants glide linearly between phone centres
+    centres = np.cumsum(lengths) - lengths / 2.0
+    targets = _phone_formants(phones) * formant_scale
+    formants = np.stack([np.interp(time, centres, targets[:, k]) for k in range(3)], axis=1)
+
+    f0 = np.asarray(f0_contour(time / max(1, n - 1)), dtype=np.float64) * np.ones(n)
+    if jitter:
+        # Pitch perturbation held for one ~8 ms period at a time
+        steps = rng.normal(0.0, jitter, n // 64 + 1)
+        f0 = f0 * 2.0 ** (np.repeat(steps, 64)[:n] / 12.0)
+    n_harmonics = int(sample_rate / 2 / f0.min())
+    harmonics = np.arange(1, n_harmonics + 1)
+    phase = 2.0 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = np.zeros(n)
+    for start in range(0, n, 2048):
+        block = slice(start, min(n, start + 2048))
+        freqs = f0[block, None] * harmonics
+        envelope = sum(
+            1.0 / (1.0 + ((freqs - formants[block, k, None]) / FORMANT_BANDWIDTHS_HZ[k]) ** 2) * 0.6 ** k
+            for k in range(3)
+        ) * (freqs < sample_rate / 2) / np.sqrt(harmonics)
+        voiced[block] = np.einsum('ij,ij->i', envelope, np.sin(phase[block, None] * harmonics))
+
+    is_voiced = np.array([phone in VOICED_PHONES for phone, _ in phones])[phone_index]
+    # 10 ms ramps so phone boundaries do not click
+    ramp = np.hanning(2 * (sample_rate // 100) + 1)
+    ramp /= ramp.sum()
+    signal = voiced / (np.abs(voiced).max() + 1e-9) * np.convolve(is_voiced, ramp, mode='same')
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    for index, (phone, _) in enumerate(phones):
+        if phone in NOISE_PHONES:
+            segment = slice(offsets[index], offsets[index + 1])
+            signal[segment] += 0.35 * _band_noise(lengths[index], NOISE_PHONES[phone], rng, sample_rate) * np.hanning(lengths[index])
+    return loudness * signal / (np.abs(signal).max() + 1e-9)
+
+
+def say_word(word, speaker, rng, loudness=0.3, sample_rate=SAMPLE_RATE):
+    """One word from WORDS, about 0.65-0.8 s long, with a falling pitch contour."""
+    duration = float(rng.uniform(0.65, 0.8)) * speaker['tempo']
+    f0 = speaker['f0_hz'] * float(rng.uniform(0.95, 1.1))
+    return speak(
+        WORDS[word], duration, lambda t: f0 * (1.1 - 0.2 * t), speaker['formant_scale'],
+        loudness=loudness, rng=rng, sample_rate=sample_rate
+    )
+
+
+def to_pcm16(signal, noise_level=0.0, rng=None):
+    """Float samples in -1..1 as int16, with optional white background noise (fraction of full scale)."""
+    if noise_level:
+        rng = rng if rng is not None else np.random.default_rng(0)
+        signal = signal + rng.normal(0.0, noise_level, len(signal))
+    return np.clip(np.rint(signal * 32767.0), -32768, 32767).astype('<i2')
+
+
+def silence(seconds, sample_rate=SAMPLE_RATE):
+    return np.zeros(int(seconds * sample_rate))
+
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE, channels=1):
+    """Writes int16 samples (interleaved when channels > 1) as a PCM WAV file."""
+    with wave.open(path, 'wb') as output:
+        output.setnchannels(channels)
+        output.setsampwidth(2)
+        output.setframerate(sample_rate)
+        output.writeframes(np.asarray(samples, dtype='<i2').tobytes())
+
+
+def read_wav(source):
+    """(int16 samples, sample_rate, channels) from a 16-bit PCM WAV path or bytes."""
+    with wave.open(io.BytesIO(source) if isinstance(source, bytes) else source, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f'{source}: only 16-bit PCM WAV is supported')
+        frames = wav.readframes(wav.getnframes())
+        return np.frombuffer(frames, dtype='<i2'), wav.getframerate(), wav.getnchannels()
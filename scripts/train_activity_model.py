@@ -0,0 +1,196 @@
+"""
+Trains the activity classifier and exports lambdas/motion_analyzer/activity_model.npy.
+
+    python scripts/train_activity_model.py [OUTPUT] [--per-class N] [--seed S]
+
+Labelled windows are synthesised for each class in activity.ACTIVITY_CLASSES: gravity plus
+a class-specific dynamic acceleration (gait harmonics for walking and running, slow sway,
+road noise and engine vibration for a vehicle, smoothed random bursts with a few sharp
+blows for struggling), seen through a random phone orientation at 25, 50 or 100 Hz with
+jittered timestamps. They go through motion_features.extract_motion_features like a
+client's window, a multinomial logistic model is fitted to activity.feature_matrix by
+gradient descent, and activity.save_activity_model writes it. The script then reports
+train and held-out accuracy with the held-out confusion matrix, and the time to classify
+100 windows in one batch against one at a time.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from local_env import REPO_ROOT, use_lambda
+
+use_lambda('motion_analyzer')
+
+from activity import (  # noqa: E402
+    ACTIVITY_CLASSES,
+    classify_activity,
+    feature_matrix,
+    load_activity_model,
+    save_activity_model
+)
+from motion_features import STANDARD_GRAVITY, extract_motion_features  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(REPO_ROOT, 'lambdas', 'motion_analyzer', 'activity_model.npy')
+SAMPLE_RATES_HZ = (25, 50, 100)
+WINDOW_SECONDS = (4.0, 10.0)
+TIMESTAMP_JITTER_SECONDS = 0.002
+# Gradient descent on the mean cross-entropy with a small L2 penalty on the weights
+ITERATIONS = 3000
+LEARNING_RATE = 0.5
+L2_PENALTY = 1e-3
+
+
+def random_rotation(rng):
+    """A uniformly random 3x3 rotation matrix, from a random unit quaternion."""
+    quaternion = rng.normal(size=4)
+    a, b, c, d = quaternion / np.linalg.norm(quaternion)
+    return np.array([
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a - b * b + c * c - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a - b * b - c * c + d * d]
+    ])
+
+
+def dynamic_acceleration(kind, t, sample_rate, rng):
+    """(n, 3) acceleration without gravity, in the body frame, and the gyroscope noise scale (rad/s)."""
+    n = len(t)
+    if kind == 'still':
+        dynamic = rng.normal(0, rng.uniform(0.01, 0.08), (n, 3))
+        if rng.random() < 0.3:
+            # Fidgeting with the phone for half a second
+            start, length = rng.integers(0, n - sample_rate), sample_rate // 2
+            dynamic[start:start + length] += rng.normal(0, 0.8, (length, 3))
+        return dynamic, rng.uniform(0.005, 0.05)
+    if kind == 'walking':
+        step_hz, amplitude = rng.uniform(1.5, 2.3), rng.uniform(1.5, 4.0)
+        phase = 2 * np.pi * step_hz * t + rng.uniform(0, 2 * np.pi)
+        step = amplitude * np.sin(phase) + 0.4 * amplitude * np.sin(2 * phase)
+        axes = [rng.uniform(0.1, 0.4), rng.uniform(0.1, 0.4), 1.0]
+        return np.outer(step, axes) + rng.normal(0, 0.3, (n, 3)), rng.uniform(0.2, 0.8)
+    if kind == 'running':
+        step_hz, amplitude = rng.uniform(2.4, 3.2), rng.uniform(6.0, 14.0)
+        # Sharp foot strikes rather than a sine, centred on zero
+        step = amplitude * np.maximum(np.sin(2 * np.pi * step_hz * t + rng.uniform(0, 2 * np.pi)), 0) ** 2 - amplitude * 0.35
+        axes = [rng.uniform(0.2, 0.5), rng.uniform(0.1, 0.4), 1.0]
+        return np.outer(step, axes) + rng.normal(0, 0.8, (n, 3)), rng.uniform(1.0, 3.0)
+    if kind == 'vehicle':
+        sway = np.outer(
+            rng.uniform(0.3, 1.5) * np.sin(2 * np.pi * rng.uniform(0.05, 0.4) * t + rng.uniform(0, 2 * np.pi)),
+            [1.0, rng.uniform(0.3, 1.0), 0.1]
+        )
+        road = rng.normal(0, rng.uniform(0.1, 0.6), (n, 3))
+        engine = np.outer(rng.uniform(0.05, 0.3) * np.sin(2 * np.pi * rng.uniform(15, 40) * t), [0.3, 0.3, 1.0])
+        dynamic = sway + road + engine
+        for _ in range(rng.integers(0, 4)):
+            start = rng.integers(0, n - 5)
+            dynamic[start:start + 3, 2] += rng.uniform(1, 4)
+        return dynamic, rng.uniform(0.02, 0.15)
+    if kind == 'struggling':
+        bursts = rng.normal(0, rng.uniform(3, 12), (n, 3)) * (rng.random((n, 1)) < rng.uniform(0.4, 1.0))
+        # Pulls and shoves, smoothed a little by the body, plus a few sharp blows
+        width = max(1, sample_rate // 25)
+        kernel = np.ones(width) / width
+        dynamic = np.column_stack([np.convolve(bursts[:, axis], kernel, mode='same') for axis in range(3)])
+        for _ in range(rng.integers(1, 6)):
+            dynamic[rng.integers(0, n - 3)] += rng.normal(0, 20, 3)
+        return dynamic, rng.uniform(2.0, 6.0)
+    raise ValueError(f'Unknown activity {kind}')
+
+
+def synthetic_window(kind, rng):
+    """One sensor window in motion_features.WINDOW_COLUMNS order, as a client would send it."""
+    sample_rate = int(rng.choice(SAMPLE_RATES_HZ))
+    n = int(sample_rate * rng.uniform(*WINDOW_SECONDS))
+    t = np.sort(np.arange(n) / sample_rate + rng.normal(0, TIMESTAMP_JITTER_SECONDS, n))
+    t -= t[0]
+    dynamic, gyro_scale = dynamic_acceleration(kind, t, sample_rate, rng)
+    acceleration = (np.array([0.0, 0.0, STANDARD_GRAVITY]) + dynamic) @ random_rotation(rng).T
+    gyroscope = rng.normal(0, gyro_scale, (n, 3))
+    return np.column_stack([t, acceleration, gyroscope]).astype(np.float32)
+
+
+def labelled_features(per_class, seed):
+    """Feature dicts and class indices for per_class synthetic windows of every class."""
+    rng = np.random.default_rng(seed)
+    features, labels = [], []
+    for label, kind in enumerate(ACTIVITY_CLASSES):
+        for _ in range(per_class):
+            features.append(extract_motion_features(synthetic_window(kind, rng)))
+            labels.append(label)
+    return features, np.array(labels)
+
+
+def fit_logistic(matrix, labels):
+    """Standardisation and multinomial logistic weights: (mean, scale, weights, bias)."""
+    matrix = matrix.astype(np.float64)
+    mean, scale = matrix.mean(axis=0), matrix.std(axis=0)
+    standardized = (matrix - mean) / scale
+    targets = np.eye(len(ACTIVITY_CLASSES))[labels]
+    weights = np.zeros((len(ACTIVITY_CLASSES), matrix.shape[1]))
+    bias = np.zeros(len(ACTIVITY_CLASSES))
+    for _ in range(ITERATIONS):
+        logits = standardized @ weights.T + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        gradient = (probabilities - targets) / len(standardized)
+        weights -= LEARNING_RATE * (gradient.T @ standardized + L2_PENALTY * weights)
+        bias -= LEARNING_RATE * gradient.sum(axis=0)
+    return mean, scale, weights, bias
+
+
+def evaluate(model, features, labels):
+    """(accuracy, confusion matrix with rows the true class)."""
+    predicted, _ = classify_activity(features, model)
+    predicted = np.array([ACTIVITY_CLASSES.index(label) for label in predicted])
+    confusion = np.zeros((len(ACTIVITY_CLASSES), len(ACTIVITY_CLASSES)), dtype=int)
+    np.add.at(confusion, (labels, predicted), 1)
+    return float(np.mean(predicted == labels)), confusion
+
+
+def classify_timing(model, features, repeats=50):
+    """Milliseconds to classify features in one batch, and one window at a time."""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        classify_activity(features, model)
+    batch = (time.perf_counter() - started) / repeats * 1e3
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for window_features in features:
+            classify_activity([window_features], model)
+    single = (time.perf_counter() - started) / repeats * 1e3
+    return batch, single
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', nargs='?', default=DEFAULT_OUTPUT)
+    parser.add_argument('--per-class', type=int, default=400, help='training windows per class (half as many are held out)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    train_features, train_labels = labelled_features(args.per_class, args.seed)
+    heldout_features, heldout_labels = labelled_features(args.per_class // 2, args.seed + 1)
+    save_activity_model(args.output, *fit_logistic(feature_matrix(train_features), train_labels))
+    model = load_activity_model(args.output)
+    print(f"Wrote {args.output} ({np.load(args.output).nbytes} bytes of float32)")
+
+    train_accuracy, _ = evaluate(model, train_features, train_labels)
+    heldout_accuracy, confusion = evaluate(model, heldout_features, heldout_labels)
+    print(f"Accuracy: train {train_accuracy:.3f}, held-out {heldout_accuracy:.3f}")
+    print("Held-out confusion (rows true, columns predicted):")
+    width = max(len(name) for name in ACTIVITY_CLASSES) + 2
+    print(' ' * width + ''.join(f'{name:>{width}}' for name in ACTIVITY_CLASSES))
+    for name, row in zip(ACTIVITY_CLASSES, confusion):
+        print(f'{name:<{width}}' + ''.join(f'{count:>{width}}' for count in row))
+
+    batch_ms, single_ms = classify_timing(model, heldout_features[:100])
+    print(f"Classifying 100 windows: {batch_ms:.2f} ms in one batch, {single_ms:.2f} ms one at a time")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())